@@ -1,8 +1,8 @@
 """
 LangGraph Studio entrypoint.
 """
-from graph import build_graph
+from runtime import get_graph
 
 def agent():
-    """Compiled graph for LangGraph CLI/Studio."""
-    return build_graph()
+    """Compiled graph for LangGraph CLI/Studio; the server handles persistence itself."""
+    return get_graph(persistent=False)
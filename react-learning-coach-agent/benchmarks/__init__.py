@@ -0,0 +1,5 @@
+"""
+Offline benchmarks. Run from the project directory, e.g.:
+
+    python -m benchmarks.retrieval
+"""
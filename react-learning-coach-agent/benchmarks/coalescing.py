@@ -0,0 +1,102 @@
+"""
+Request coalescing benchmark: a classroom of learners on the same stage and
+level asks for exercises at the same moment. Half of them run the sync graph
+on a thread pool and half the async graph on an event loop, at once; with
+LLM_COALESCE off every click reaches the model, with it on identical
+requests share the one already in flight (singleflight.py). The response
+cache is off, so only coalescing can save calls. Reports model requests,
+coalesced calls and turn latency.
+
+    python -m benchmarks.coalescing --learners 40 --first-token 0.5
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+os.environ["LLM_CACHE"] = "off"
+os.environ["PREFETCH"] = "off"
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+import runtime
+from benchmarks.suite import onboarded_state
+from fake_llm import FakeChatModel
+from graph import build_graph
+from singleflight import SingleFlight
+
+CLICK = "give me exercises"
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+
+
+def run(learners: int, coalesce: bool, first_token: float, token: float) -> Dict[str, Any]:
+    model = FakeChatModel(model_name=runtime.DEFAULT_MODEL, first_token_latency=first_token, token_latency=token)
+    runtime.set_llm_factory(lambda name: model)
+    runtime._single_flight = SingleFlight(enabled=coalesce)
+    graph = build_graph(InMemorySaver())
+    configs = [{"configurable": {"thread_id": f"learner-{n}"}} for n in range(learners)]
+    for config in configs:
+        graph.invoke(onboarded_state(), config)
+    calls_before = model.calls
+
+    latencies: List[float] = []
+    ready = threading.Barrier(2)
+
+    def click(config: Dict[str, Any]) -> None:
+        start = time.perf_counter()
+        graph.invoke({"messages": [HumanMessage(content=CLICK)]}, config)
+        latencies.append(time.perf_counter() - start)
+
+    async def aclick(config: Dict[str, Any]) -> None:
+        start = time.perf_counter()
+        await graph.ainvoke({"messages": [HumanMessage(content=CLICK)]}, config)
+        latencies.append(time.perf_counter() - start)
+
+    async def async_half(half: List[Dict[str, Any]]) -> None:
+        ready.wait()
+        await asyncio.gather(*(aclick(config) for config in half))
+
+    sync_half, async_half_configs = configs[::2], configs[1::2]
+    loop_thread = threading.Thread(target=lambda: asyncio.run(async_half(async_half_configs)))
+    start = time.perf_counter()
+    loop_thread.start()
+    with ThreadPoolExecutor(max_workers=len(sync_half)) as pool:
+        ready.wait()
+        list(pool.map(click, sync_half))
+    loop_thread.join()
+    wall = time.perf_counter() - start
+    stats = runtime.get_single_flight().stats()
+    return {
+        "model_calls": model.calls - calls_before,
+        "coalesced": stats["coalesced"],
+        "wall_s": wall,
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--learners", type=int, default=40)
+    parser.add_argument("--first-token", type=float, default=0.5, help="simulated first-token latency (s)")
+    parser.add_argument("--token", type=float, default=0.002, help="simulated per-token latency (s)")
+    args = parser.parse_args()
+
+    print(f"{args.learners} learners click '{CLICK}' at once (half sync threads, half asyncio tasks), "
+          f"{args.first_token}s first token")
+    for label, coalesce in (("off", False), ("on", True)):
+        result = run(args.learners, coalesce, args.first_token, args.token)
+        print(f"  coalescing {label:<3}  model calls {result['model_calls']:>4}  coalesced {result['coalesced']:>4}  "
+              f"p50 {result['p50_ms']:6.0f} ms  p95 {result['p95_ms']:6.0f} ms  wall {result['wall_s']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Concurrency benchmark: many simulated learners in one process, async graph
+(ainvoke on one event loop) vs the sync graph on a bounded thread pool,
+against a fake chat model with fixed per-call latency.
+
+    python -m benchmarks.concurrency --sessions 200 --turns 4 --latency 0.5 --threads 16
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+os.environ["LLM_CACHE"] = "off"  # identical sessions would otherwise be served from the cache
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+import fake_llm
+import runtime
+from checkpoints import thread_config
+from graph import build_graph
+from main import create_initial_state
+
+PROMPTS = ["I want to build a todo app", "continue", "give me exercises", "how do props work?"]
+
+
+def _input(turn: int) -> dict:
+    message = HumanMessage(content=PROMPTS[turn % len(PROMPTS)])
+    if turn:
+        return {"messages": [message]}
+    state = create_initial_state()
+    state["messages"].append(message)
+    return state
+
+
+def run_sync(graph, sessions: int, turns: int, threads: int) -> List[float]:
+    def session(n: int) -> List[float]:
+        config, latencies = thread_config(f"sync-{n}"), []
+        for turn in range(turns):
+            start = time.perf_counter()
+            graph.invoke(_input(turn), config)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return [t for result in pool.map(session, range(sessions)) for t in result]
+
+
+async def run_async(graph, sessions: int, turns: int) -> List[float]:
+    async def session(n: int) -> List[float]:
+        config, latencies = thread_config(f"async-{n}"), []
+        for turn in range(turns):
+            start = time.perf_counter()
+            await graph.ainvoke(_input(turn), config)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    results = await asyncio.gather(*(session(n) for n in range(sessions)))
+    return [t for result in results for t in result]
+
+
+def report(label: str, wall: float, latencies: List[float]) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(
+        f"{label:<22} wall {wall:7.2f}s  {len(latencies) / wall:7.1f} turns/s  "
+        f"p50 {statistics.median(ordered) * 1000:7.0f} ms  p95 {p95 * 1000:7.0f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per LLM call")
+    parser.add_argument("--threads", type=int, default=16, help="thread pool size for the sync run")
+    args = parser.parse_args()
+
+    runtime.set_llm_factory(fake_llm.factory(first_token_latency=args.latency))
+    graph = build_graph(checkpointer=InMemorySaver())
+    print(f"{args.sessions} sessions x {args.turns} turns, {args.latency}s per LLM call")
+
+    start = time.perf_counter()
+    latencies = asyncio.run(run_async(graph, args.sessions, args.turns))
+    report("async (1 event loop)", time.perf_counter() - start, latencies)
+
+    start = time.perf_counter()
+    latencies = run_sync(graph, args.sessions, args.turns, args.threads)
+    report(f"sync ({args.threads} threads)", time.perf_counter() - start, latencies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+CorpusStore benchmark: ingest time, cold-open cost as the corpus grows, and
+incremental re-sync after editing one file.
+
+    python -m benchmarks.corpus --sizes 1000 10000 50000
+"""
+import argparse
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.retrieval import VOCAB
+from corpus import CorpusStore
+
+PASSAGES_PER_FILE = 50
+
+# Runs in a fresh interpreter so RSS reflects only opening the store.
+# (ru_maxrss survives exec on Linux, so read the new process's own VmHWM.)
+COLD_OPEN = """
+import sys, time
+start = time.perf_counter()
+from corpus import CorpusStore
+store = CorpusStore(sys.argv[1])
+store[len(store) // 2]
+elapsed = time.perf_counter() - start
+hwm = [l for l in open("/proc/self/status") if l.startswith("VmHWM")][0].split()[1]
+print(elapsed, hwm)
+"""
+
+
+def write_docs(root: Path, passages: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    for f in range(max(1, passages // PASSAGES_PER_FILE)):
+        sections = []
+        for p in range(PASSAGES_PER_FILE):
+            words = " ".join(rng.choices(VOCAB, k=rng.randint(40, 120)))
+            sections.append(f"# {rng.choice(VOCAB)} {p}\n\n{words}\n")
+        (root / f"doc-{f:05d}.md").write_text("\n".join(sections))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    args = parser.parse_args()
+
+    print(f"{'passages':>9} {'ingest s':>9} {'resync 1 file ms':>17} {'cold open ms':>13} {'cold open RSS MB':>17}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            docs, root = Path(tmp) / "docs", Path(tmp) / "store"
+            docs.mkdir()
+            write_docs(docs, size)
+
+            start = time.perf_counter()
+            store = CorpusStore(root)
+            store.sync(docs)
+            ingest_s = time.perf_counter() - start
+
+            edited = docs / "doc-00000.md"
+            edited.write_text(edited.read_text() + "\n# extra\n\nuseMemo memoizes values.\n")
+            start = time.perf_counter()
+            store.sync(docs)
+            resync_ms = (time.perf_counter() - start) * 1000
+            store.close()
+
+            out = subprocess.run([sys.executable, "-c", COLD_OPEN, str(root)],
+                                 capture_output=True, text=True, check=True).stdout.split()
+            open_ms, rss_mb = float(out[0]) * 1000, int(out[1]) / 1024
+            print(f"{size:>9} {ingest_s:>9.2f} {resync_ms:>17.1f} {open_ms:>13.2f} {rss_mb:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
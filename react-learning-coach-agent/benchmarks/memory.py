@@ -0,0 +1,58 @@
+"""
+Session memory benchmark: conversation footprint as a session grows, with
+the history manager compacting old turns into the rolling summary.
+Runs the real graph against a canned fake chat model (no API calls).
+
+    python -m benchmarks.memory --turns 500
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import HumanMessage
+
+import runtime
+from main import create_initial_state
+
+ONBOARDING = json.dumps({"project_summary": "todo app", "features": ["add", "filter"], "assumed_level": "beginner"})
+PLAN = json.dumps({"stages": [
+    {"name": f"Stage {i}", "goal": "goal", "tasks": ["task"], "fundamentals": ["jsx", "props"],
+     "docs": [], "features": []}
+    for i in range(1, 6)
+]})
+COACHING = "## 📋 Instructions\n" + "Step with some explanation. " * 40
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CHECKPOINT_DB"] = os.path.join(tmp, "bench.sqlite")
+        responses = [ONBOARDING, PLAN] + [COACHING] * (args.turns + 1)
+        runtime.set_llm_factory(lambda model: FakeListChatModel(responses=responses))
+        from checkpoints import open_checkpointer, thread_config
+        from graph import build_graph
+
+        graph = build_graph(checkpointer=open_checkpointer(os.environ["CHECKPOINT_DB"]))
+        config = thread_config("bench")
+        from memory import memory_stats
+
+        state = create_initial_state()
+        state["messages"].append(HumanMessage(content="I want to build a todo app"))
+        graph.invoke(state, config)
+
+        print(f"{'turn':>6} {'messages':>9} {'msg KB':>8} {'summary KB':>11} {'total KB':>9}")
+        for turn in range(1, args.turns + 1):
+            state = graph.invoke({"messages": [HumanMessage(content=f"question {turn} about props")]}, config)
+            if turn in (1, 10, 50) or turn % 100 == 0:
+                s = memory_stats(state)
+                print(f"{turn:>6} {s['messages']:>9} {s['message_bytes'] / 1024:>8.1f} "
+                      f"{s['summary_bytes'] / 1024:>11.1f} {s['total_bytes'] / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
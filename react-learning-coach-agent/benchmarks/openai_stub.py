@@ -0,0 +1,112 @@
+"""
+Local OpenAI-compatible chat completions server for load tests: answers
+POST /v1/chat/completions (streamed or not) with fake_llm's canned coach
+replies, after a configurable first-token latency (plus uniform jitter) and
+per-token delay, and fails a configurable share of requests with HTTP 500.
+ChatOpenAI talks to it unchanged via base_url.
+
+    python -m benchmarks.openai_stub --port 8100 --latency 0.5 --jitter 0.2 --error-rate 0.01
+    # ChatOpenAI(base_url="http://127.0.0.1:8100/v1", api_key="stub")
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List
+
+from langchain_core.messages import convert_to_messages
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from fake_llm import coach_responder, split_tokens
+
+
+def _usage(messages: List[Dict[str, Any]], tokens: List[str]) -> Dict[str, int]:
+    # Roughly 4 characters per prompt token
+    prompt = sum(len(str(m.get("content") or "")) for m in messages) // 4
+    return {"prompt_tokens": prompt, "completion_tokens": len(tokens), "total_tokens": prompt + len(tokens)}
+
+
+def create_app(latency: float = 0.5, per_token: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+               seed: int = 0) -> Starlette:
+    rng = random.Random(seed)
+    counts = {"requests": 0, "errors": 0}
+
+    def first_token_delay() -> float:
+        return max(0.0, latency + rng.uniform(-jitter, jitter))
+
+    async def completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "stub")
+        counts["requests"] += 1
+        await asyncio.sleep(first_token_delay())
+        if rng.random() < error_rate:
+            counts["errors"] += 1
+            return JSONResponse({"error": {"message": "injected failure", "type": "server_error"}}, status_code=500)
+
+        tokens = split_tokens(coach_responder(convert_to_messages(messages)))
+        completion_id, created = f"chatcmpl-{uuid.uuid4().hex[:12]}", int(time.time())
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": _usage(messages, tokens),
+            })
+
+        def chunk(delta: Dict[str, Any], finish: Any = None, **extra: Any) -> str:
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **extra}
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def events() -> AsyncIterator[str]:
+            for i, token in enumerate(tokens):
+                if i and per_token:
+                    await asyncio.sleep(per_token)
+                yield chunk({"role": "assistant", "content": token} if i == 0 else {"content": token})
+            yield chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                usage = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [], "usage": _usage(messages, tokens)}
+                yield f"data: {json.dumps(usage)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def models(request: Request) -> JSONResponse:
+        return JSONResponse({"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "local"}]})
+
+    async def health(request: Request) -> JSONResponse:
+        return JSONResponse({"status": "ok", **counts})
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", completions, methods=["POST"]),
+        Route("/v1/models", models, methods=["GET"]),
+        Route("/health", health, methods=["GET"]),
+    ])
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--per-token", type=float, default=0.0, help="seconds between further tokens")
+    parser.add_argument("--jitter", type=float, default=0.0, help="first-token latency varies by +/- this (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 500")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.per_token, args.jitter, args.error_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
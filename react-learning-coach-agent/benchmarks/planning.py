@@ -0,0 +1,75 @@
+"""
+Planning benchmark: the single-call planner (every stage in full, one long
+completion) vs the map-reduce planning subgraph (short outline, then each
+stage expanded concurrently via Send), on a fake model whose latency grows
+with output length. Sync (thread pool) and async (event loop) runs.
+
+    python -m benchmarks.planning --first-token 0.3 --per-token 0.01
+"""
+import argparse
+import asyncio
+import copy
+import os
+import statistics
+import time
+
+os.environ["LLM_CACHE"] = "off"
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+import fake_llm
+import nodes
+import runtime
+from graph import build_planning_graph
+
+
+def make_state() -> dict:
+    spec = fake_llm.ONBOARDING_JSON
+    return {
+        "messages": [HumanMessage(content="I want to build a todo app"), AIMessage(content="✅ Project Confirmed")],
+        "summary": "",
+        "learner_profile": {"assumed_level": spec["assumed_level"]},
+        "project_spec": {"summary": spec["project_summary"], "features": list(spec["features"])},
+        "stages": [],
+        "plan_basis": {},
+        "current_stage_index": 0,
+        "status": "onboarding_complete",
+    }
+
+
+def run(graph, fanout: bool, reps: int, use_async: bool) -> dict:
+    nodes.PLAN_FANOUT = fanout
+    latencies, result = [], None
+    for _ in range(reps):
+        state = copy.deepcopy(make_state())
+        start = time.perf_counter()
+        result = asyncio.run(graph.ainvoke(state)) if use_async else graph.invoke(state)
+        latencies.append(time.perf_counter() - start)
+    stages = result["stages"]
+    return {"latency": statistics.median(latencies), "stages": len(stages),
+            "tasks": sum(len(s.get("tasks", [])) for s in stages)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--first-token", type=float, default=0.3)
+    parser.add_argument("--per-token", type=float, default=0.01)
+    parser.add_argument("--reps", type=int, default=3)
+    args = parser.parse_args()
+
+    fake = fake_llm.factory(first_token_latency=args.first_token, token_latency=args.per_token)
+    runtime.set_llm_factory(fake)
+    graph = build_planning_graph()
+
+    print(f"{len(fake_llm.STAGE_NAMES)}-stage plan, {args.first_token}s first token, {args.per_token * 1000:.0f} ms/token")
+    print(f"{'':<18} {'latency ms':>11} {'stages':>7} {'tasks':>6}")
+    for mode, use_async in (("sync", False), ("async", True)):
+        single = run(graph, False, args.reps, use_async)
+        fanout = run(graph, True, args.reps, use_async)
+        for label, r in ((f"single call {mode}", single), (f"fan-out {mode}", fanout)):
+            print(f"{label:<18} {r['latency'] * 1000:>11.0f} {r['stages']:>7} {r['tasks']:>6}")
+        print(f"fan-out {mode}: {single['latency'] / fanout['latency']:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Prefetch benchmark: a learner clicking through quick actions ("continue",
+"give me exercises", "done", occasionally a question), pausing to read
+between turns, with and without speculative prefetch, on a fake model with
+per-call latency. Reports per-action latency and the prefetches wasted.
+
+    python -m benchmarks.prefetch --first-token 0.5 --think 1.0
+"""
+import argparse
+import os
+import statistics
+import time
+from collections import defaultdict
+
+os.environ["LLM_CACHE"] = "off"  # measure prefetch alone
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+import fake_llm
+import runtime
+from graph import build_graph
+from main import create_initial_state
+from prefetch import Prefetcher
+
+SCRIPT = ["continue", "give me exercises", "done", "continue", "how do props work?", "done", "continue", "give me exercises"]
+
+
+def session(prefetcher: Prefetcher, think: float) -> dict:
+    graph = build_graph(InMemorySaver())
+    config = {"configurable": {"thread_id": "learner"}}
+    state = create_initial_state()
+    state["messages"].append(HumanMessage(content="I want to build a todo app"))
+    state = graph.invoke(state, config)
+
+    latencies = defaultdict(list)
+    for text in SCRIPT:
+        if prefetcher.enabled:
+            prefetcher.schedule("learner", state)
+        time.sleep(think)
+        prefetcher.on_input("learner", text)
+        start = time.perf_counter()
+        state = graph.invoke({"messages": [HumanMessage(content=text)]}, config)
+        latencies[text].append(time.perf_counter() - start)
+    prefetcher.cancel("learner")
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--first-token", type=float, default=0.5)
+    parser.add_argument("--per-token", type=float, default=0.002)
+    parser.add_argument("--think", type=float, default=1.0, help="seconds the learner reads before the next click")
+    args = parser.parse_args()
+
+    runtime.set_llm_factory(fake_llm.factory(first_token_latency=args.first_token, token_latency=args.per_token))
+    results = {}
+    for label, enabled in (("no prefetch", False), ("prefetch", True)):
+        prefetcher = Prefetcher(enabled=enabled)
+        runtime._prefetcher = prefetcher
+        results[label] = (session(prefetcher, args.think), prefetcher)
+
+    print(f"{args.first_token}s first token, {args.think}s reading between clicks")
+    print(f"{'action':<20} {'no prefetch ms':>15} {'prefetch ms':>12}")
+    for text in dict.fromkeys(SCRIPT):
+        row = [statistics.median(results[label][0][text]) * 1000 for label in ("no prefetch", "prefetch")]
+        print(f"{text:<20} {row[0]:>15.0f} {row[1]:>12.0f}")
+    prefetcher = results["prefetch"][1]
+    stats = prefetcher.stats()
+    print(
+        f"prefetch: {stats.get('scheduled', 0)} generated, {stats.get('hits', 0)} used, "
+        f"{stats.get('wasted', 0)} wasted, {stats.get('cancelled', 0)} cancelled, "
+        f"{prefetcher.token_budget - prefetcher.budget_left('learner')} of {prefetcher.token_budget} wasted-token budget spent"
+    )
+
+
+if __name__ == "__main__":
+    main()
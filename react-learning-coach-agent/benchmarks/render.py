@@ -0,0 +1,92 @@
+"""
+Streamlit render benchmark: script run time of the web UI for a long
+session (history compaction off), drawing every message vs the latest
+CHAT_PAGE_SIZE window, plus loading one older page and sending a message.
+Uses streamlit.testing's AppTest (no browser) and a zero-latency fake model.
+
+    python -m benchmarks.render --messages 1000 --page 20
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ["LLM_CACHE"] = "off"
+os.environ["PREFETCH"] = "off"
+
+from langchain_core.messages import AIMessage, HumanMessage
+from streamlit.testing.v1 import AppTest
+
+import fake_llm
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+
+
+def long_session(messages: int) -> dict:
+    history = []
+    for i in range(messages // 2):
+        history.append(HumanMessage(content=f"question {i}: how do I use props here?"))
+        history.append(AIMessage(content=fake_llm.COACHING_TEXT))
+    spec = fake_llm.ONBOARDING_JSON
+    return {
+        "messages": history,
+        "summary": "",
+        "learner_profile": {"assumed_level": spec["assumed_level"]},
+        "project_spec": {"summary": spec["project_summary"], "features": list(spec["features"])},
+        "stages": fake_llm.PLAN_JSON["stages"],
+        "plan_basis": {},
+        "current_stage_index": 1,
+        "status": "coaching",
+    }
+
+
+def app(thread_id: str) -> AppTest:
+    at = AppTest.from_file(APP, default_timeout=600)
+    at.session_state["thread_id"] = thread_id
+    return at
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--page", type=int, default=20)
+    parser.add_argument("--reps", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CHECKPOINT_DB"] = os.path.join(tmp, "checkpoints.sqlite")
+        os.environ["LLM_CACHE_DB"] = os.path.join(tmp, "llm_cache.sqlite")
+        os.environ["HISTORY_MAX_TURNS"] = str(args.messages)
+        import runtime
+        from checkpoints import thread_config
+
+        runtime.set_llm_factory(fake_llm.factory())
+        session = long_session(args.messages)
+
+        print(f"{args.messages}-message session")
+        print(f"{'':<28} {'run ms':>8} {'messages drawn':>15}")
+        for label, page in (("all messages", 0), (f"window of {args.page}", args.page)):
+            os.environ["CHAT_PAGE_SIZE"] = str(page)
+            thread_id = f"render-{page}"
+            runtime.get_graph().update_state(thread_config(thread_id), session, as_node="memory")
+
+            at = app(thread_id)
+            at.run()
+            full = statistics.median(timed(at.run) for _ in range(args.reps))
+            print(f"{label + ', page load':<28} {full * 1000:>8.0f} {len(at.chat_message):>15}")
+            if page:
+                older = timed(at.button(key="btn_older").click().run)
+                print(f"{label + ', load older':<28} {older * 1000:>8.0f} {len(at.chat_message):>15}")
+            send = timed(at.chat_input[0].set_value("how do props work?").run)
+            print(f"{label + ', send message':<28} {send * 1000:>8.0f} {len(at.chat_message):>15}")
+
+
+if __name__ == "__main__":
+    main()
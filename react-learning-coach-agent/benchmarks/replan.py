@@ -0,0 +1,110 @@
+"""
+Replanning benchmark: regenerating the whole plan vs the incremental
+replanner (done stages frozen, unchanged stages referenced by number), on
+a long plan with the learner part-way through. Tokens are the fake model's
+estimate (words + punctuation); latency is simulated per output token.
+
+    python -m benchmarks.replan --stages 12 --current 8 --per-token 0.01
+"""
+import argparse
+import copy
+import json
+import os
+import statistics
+import time
+
+os.environ["LLM_CACHE"] = "off"
+
+from langchain_core.callbacks import get_usage_metadata_callback
+from langchain_core.messages import HumanMessage
+
+import fake_llm
+import replan
+import runtime
+from nodes import planning_node
+
+FEATURES = ["add todos", "filter todos", "persist to localStorage", "due dates", "drag and drop reordering"]
+
+
+def make_plan(n: int, extra_feature: str = None) -> list:
+    stages = []
+    for i in range(n):
+        features = [FEATURES[i % len(FEATURES)]]
+        if extra_feature and i == n - 1:
+            features.append(extra_feature)
+        stages.append({
+            "name": f"Stage {i + 1}: {FEATURES[i % len(FEATURES)].title()} part {i // len(FEATURES) + 1}",
+            "goal": f"Implement and test {features[0]} with typed components and hooks",
+            "tasks": [f"Build the {features[0]} component", "Type its props and state", "Write a quick manual test"],
+            "fundamentals": ["jsx", "props", "useState hook", "TypeScript interfaces"],
+            "docs": ["https://react.dev/learn", "https://react.dev/reference/react/useState"],
+            "features": features,
+        })
+    return stages
+
+
+def make_state(stages: list, current: int, feature: str) -> dict:
+    return {
+        "messages": [HumanMessage(content=f"add feature: {feature}")],
+        "summary": "",
+        "learner_profile": {"assumed_level": "intermediate"},
+        "project_spec": {"summary": "A todo app with TypeScript", "features": FEATURES + [feature]},
+        "plan_basis": {"level": "intermediate", "features": list(FEATURES)},
+        "stages": stages,
+        "current_stage_index": current,
+        "status": "replan",
+    }
+
+
+def run(incremental: bool, base: dict, reps: int) -> dict:
+    replan.INCREMENTAL = incremental
+    latencies, usage = [], None
+    for _ in range(reps):
+        state = copy.deepcopy(base)
+        with get_usage_metadata_callback() as cb:
+            start = time.perf_counter()
+            state = planning_node(state)
+            latencies.append(time.perf_counter() - start)
+        usage = next(iter(cb.usage_metadata.values()))
+    return {"latency": statistics.median(latencies), "prompt": usage["input_tokens"],
+            "completion": usage["output_tokens"], "stages": len(state["stages"])}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stages", type=int, default=12)
+    parser.add_argument("--current", type=int, default=8, help="1-based stage the learner is on")
+    parser.add_argument("--first-token", type=float, default=0.2)
+    parser.add_argument("--per-token", type=float, default=0.01)
+    parser.add_argument("--reps", type=int, default=3)
+    args = parser.parse_args()
+
+    feature = "dark mode"
+    full_plan = json.dumps({"stages": make_plan(args.stages, feature)})
+
+    def responder(messages):
+        system = str(messages[0].content)
+        if "planner" in system and "replanner" not in system:
+            return full_plan
+        return fake_llm.coach_responder(messages)
+
+    runtime.set_llm_factory(fake_llm.factory(
+        responder=responder, first_token_latency=args.first_token, token_latency=args.per_token
+    ))
+    base = make_state(make_plan(args.stages), args.current - 1, feature)
+
+    full = run(False, base, args.reps)
+    incremental = run(True, base, args.reps)
+    print(f"{args.stages}-stage plan, learner on stage {args.current}, adding '{feature}'")
+    print(f"{'':<12} {'prompt tok':>10} {'completion tok':>15} {'latency ms':>11} {'stages':>7}")
+    for label, r in (("full", full), ("incremental", incremental)):
+        print(f"{label:<12} {r['prompt']:>10} {r['completion']:>15} {r['latency'] * 1000:>11.0f} {r['stages']:>7}")
+    print(
+        f"incremental: {1 - incremental['prompt'] / full['prompt']:.0%} fewer prompt tokens, "
+        f"{1 - incremental['completion'] / full['completion']:.0%} fewer completion tokens, "
+        f"{full['latency'] / incremental['latency']:.1f}x faster"
+    )
+
+
+if __name__ == "__main__":
+    main()
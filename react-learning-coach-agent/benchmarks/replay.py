@@ -0,0 +1,237 @@
+"""
+Load test: replay recorded sessions (recorder.py, SESSION_RECORD=path)
+concurrently against the async coach graph, with ChatOpenAI pointed at the
+local OpenAI-compatible stub (benchmarks/openai_stub.py, started here unless
+--stub-url is given). Each level of --sessions runs that many learners at
+once, cycling through the recorded sessions, and reports turn latency
+percentiles, throughput and errors, to show where one deployment slows down.
+Without --recording, every learner runs the concurrency benchmark's script.
+
+    python -m benchmarks.replay --recording sessions.jsonl --sessions 10,50,100,200 \\
+        --latency 0.5 --jitter 0.2 --error-rate 0.01
+    python -m benchmarks.replay --sessions 50 --think-scale 1.0 --stream
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+os.environ["LLM_CACHE"] = "off"  # replayed sessions repeat each other; every call must reach the model
+os.environ["PREFETCH"] = "off"
+os.environ["SESSION_RECORD"] = ""  # don't record the replay
+# Read when checkpoints/llm_cache are imported, so set before anything imports them
+TMP = tempfile.mkdtemp(prefix="coach-replay-")
+os.environ["CHECKPOINT_DB"] = os.path.join(TMP, "checkpoints.sqlite")
+os.environ["LLM_CACHE_DB"] = os.path.join(TMP, "llm_cache.sqlite")
+
+from langchain_core.messages import HumanMessage
+
+import runtime
+from benchmarks.concurrency import PROMPTS
+from checkpoints import open_async_checkpointer, thread_config
+from graph import build_graph
+from main import create_initial_state
+from streaming import TurnStream
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One recorded session: (learner input, seconds since the previous turn ended)
+Session = List[Tuple[str, Optional[float]]]
+
+
+def load_recording(path: str) -> List[Session]:
+    """Recorded sessions in the order they started, each as its turns in order."""
+    turns: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                turns[record["session"]].append(record)
+    sessions = sorted(turns.values(), key=lambda records: min(r["ts"] for r in records))
+    return [[(r["input"], r.get("gap_s")) for r in sorted(records, key=lambda r: r["ts"])] for records in sessions]
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 1) if ordered else None
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _stub_stats(base_url: str) -> Dict[str, int]:
+    try:
+        with urllib.request.urlopen(base_url.rsplit("/v1", 1)[0] + "/health", timeout=2) as resp:
+            return json.load(resp)
+    except OSError:
+        return {}
+
+
+def start_stub(args) -> Tuple[subprocess.Popen, str]:
+    """Run openai_stub in its own process (so it doesn't compete for the GIL) and wait until it answers."""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.openai_stub", "--port", str(port), "--latency", str(args.latency),
+         "--per-token", str(args.per_token), "--jitter", str(args.jitter), "--error-rate", str(args.error_rate),
+         "--seed", str(args.seed)],
+        cwd=ROOT,
+    )
+    base_url = f"http://127.0.0.1:{port}/v1"
+    deadline = time.time() + 30
+    while not _stub_stats(base_url):
+        if proc.poll() is not None or time.time() > deadline:
+            proc.kill()
+            raise RuntimeError("openai_stub did not start")
+        time.sleep(0.1)
+    return proc, base_url
+
+
+async def _turn_input(graph, config: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """As the server builds it: the full initial state until the session has one (e.g. its first turn failed)."""
+    message = HumanMessage(content=text)
+    if (await graph.aget_state(config)).values:
+        return {"messages": [message]}
+    state = create_initial_state()
+    state["messages"].append(message)
+    return state
+
+
+async def run_level(graph, recorded: List[Session], sessions: int, level: int, args) -> Dict[str, Any]:
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    errors: Counter = Counter()
+
+    async def learner(n: int) -> None:
+        config = thread_config(f"replay-{level}-{n}")
+        for turn, (text, gap) in enumerate(recorded[n % len(recorded)][:args.turns or None]):
+            if turn and gap and args.think_scale:
+                await asyncio.sleep(gap * args.think_scale)
+            start = time.perf_counter()
+            try:
+                graph_input = await _turn_input(graph, config, text)
+                if args.stream:
+                    stream = TurnStream(graph, graph_input, config)
+                    async for _ in stream:
+                        pass
+                    if stream.ttft is not None:
+                        ttfts.append(stream.ttft)
+                else:
+                    await graph.ainvoke(graph_input, config)
+            except Exception as exc:
+                errors[type(exc).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(learner(n) for n in range(sessions)))
+    wall = time.perf_counter() - start
+    result = {
+        "sessions": sessions,
+        "turns": len(latencies) + sum(errors.values()),
+        "errors": sum(errors.values()),
+        "error_types": dict(errors),
+        "wall_s": round(wall, 2),
+        "turns_per_s": round(len(latencies) / wall, 2),
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+    }
+    if args.stream:
+        result.update(ttft_p50_ms=percentile(ttfts, 0.5), ttft_p95_ms=percentile(ttfts, 0.95))
+    return result
+
+
+async def run(args, recorded: List[Session], base_url: str) -> List[Dict[str, Any]]:
+    from langchain_openai import ChatOpenAI
+
+    runtime.set_llm_factory(lambda model: ChatOpenAI(
+        model=model, base_url=base_url, api_key="stub", max_retries=args.max_retries,
+        timeout=args.timeout, stream_usage=True,
+    ))
+    saver = await open_async_checkpointer(os.environ["CHECKPOINT_DB"])
+    try:
+        graph = build_graph(checkpointer=saver)
+        results = []
+        for level, sessions in enumerate(args.sessions):
+            before = _stub_stats(base_url)
+            result = await run_level(graph, recorded, sessions, level, args)
+            after = _stub_stats(base_url)
+            result["llm_requests"] = after.get("requests", 0) - before.get("requests", 0)
+            result["llm_errors"] = after.get("errors", 0) - before.get("errors", 0)
+            results.append(result)
+            print_row(result, args.stream)
+        return results
+    finally:
+        await saver.conn.close()
+
+
+def print_row(result: Dict[str, Any], stream: bool) -> None:
+    ttft = f" {result['ttft_p50_ms'] or 0:>9.0f} {result['ttft_p95_ms'] or 0:>9.0f}" if stream else ""
+    print(
+        f"{result['sessions']:>8} {result['turns']:>6} {result['errors']:>6} {result['wall_s']:>8.1f} "
+        f"{result['turns_per_s']:>8.1f} {result['p50_ms'] or 0:>8.0f} {result['p95_ms'] or 0:>8.0f} "
+        f"{result['p99_ms'] or 0:>8.0f}{ttft} {result['llm_requests']:>8} {result['llm_errors']:>7}",
+        flush=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recording", help="JSONL written with SESSION_RECORD (default: a built-in script)")
+    parser.add_argument("--sessions", type=lambda s: [int(n) for n in s.split(",")], default=[10, 50, 100],
+                        help="concurrent learners; comma-separated levels run one after another")
+    parser.add_argument("--turns", type=int, default=0, help="replay at most this many turns per session (0 = all)")
+    parser.add_argument("--think-scale", type=float, default=0.0,
+                        help="wait this times the recorded gap between turns (0 = back to back)")
+    parser.add_argument("--stream", action="store_true", help="stream turns (TurnStream) and report time to first token")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub: seconds before the first token")
+    parser.add_argument("--per-token", type=float, default=0.005, help="stub: seconds between further tokens")
+    parser.add_argument("--jitter", type=float, default=0.1, help="stub: +/- seconds on the first-token latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stub: share of requests failing with HTTP 500")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub-url", help="use this OpenAI-compatible endpoint instead of starting the stub")
+    parser.add_argument("--max-retries", type=int, default=0,
+                        help="ChatOpenAI's own retries per call, on top of resilience.py's (LLM_RETRIES)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="ChatOpenAI request timeout (s)")
+    parser.add_argument("--json", help="write results here")
+    args = parser.parse_args()
+
+    recorded = load_recording(args.recording) if args.recording else [[(text, None) for text in PROMPTS]]
+    proc, base_url = (None, args.stub_url) if args.stub_url else start_stub(args)
+    print(f"{len(recorded)} recorded session(s); model at {base_url}, {args.latency}s +/- {args.jitter}s first token, "
+          f"{args.error_rate:.1%} errors")
+    ttft = f" {'ttft p50':>9} {'ttft p95':>9}" if args.stream else ""
+    print(f"{'sessions':>8} {'turns':>6} {'errors':>6} {'wall s':>8} {'turns/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8}{ttft} {'llm reqs':>8} {'llm err':>7}")
+    try:
+        results = asyncio.run(run(args, recorded, base_url))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+        shutil.rmtree(TMP, ignore_errors=True)
+
+    failures = Counter()
+    for result in results:
+        failures.update(result["error_types"])
+    if failures:
+        print("turn errors: " + ", ".join(f"{name} x{count}" for name, count in failures.most_common()))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k != "json"}, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
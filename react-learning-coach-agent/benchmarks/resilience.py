@@ -0,0 +1,97 @@
+"""
+Resilience benchmark: model calls against a fault-injecting fake model
+(a share of slow calls, a share of failures), made directly (LLM_RESILIENCE=off)
+and through resilience.py's retries, hedging and circuit breaker.
+
+- tail: code review calls (a hedgeable node) one after another; latency
+  percentiles, and calls that failed outright or were answered degraded.
+- outage: every request fails; how long each call takes to give up once
+  the breaker has opened, versus retrying every call.
+
+    python -m benchmarks.resilience --calls 500 --slow-rate 0.03 --slow 1.0 --error-rate 0.02
+"""
+import argparse
+import os
+import time
+from typing import Any, Dict, List
+
+os.environ["LLM_CACHE"] = "off"  # every call must reach the model
+os.environ["PREFETCH"] = "off"
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+import runtime
+from fake_llm import FakeChatModel
+from llm_calls import call_llm
+from resilience import Resilience
+
+REVIEW = [
+    SystemMessage(content="React/TS code reviewer. Don't rewrite the solution. JSON only."),
+    HumanMessage(content="```\nuseEffect(() => { setCount(count + 1) })\n```\nStage 2: State with useState"),
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+
+
+def run(calls: int, resilience: Resilience, **faults: Any) -> Dict[str, Any]:
+    runtime.set_llm_factory(lambda model: FakeChatModel(model_name=model, **faults))
+    runtime._resilience = resilience
+    latencies: List[float] = []
+    failed = degraded = 0
+    for _ in range(calls):
+        start = time.perf_counter()
+        try:
+            resp = call_llm("code_review", REVIEW)
+            degraded += bool(resp.response_metadata.get("degraded"))
+        except Exception:
+            failed += 1
+        latencies.append(time.perf_counter() - start)
+    return {
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": max(latencies) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "failed": failed,
+        "degraded": degraded,
+        "stats": resilience.stats(),
+    }
+
+
+def print_row(label: str, result: Dict[str, Any]) -> None:
+    stats = result["stats"]
+    print(f"  {label:<10} p50 {result['p50_ms']:6.0f}  p95 {result['p95_ms']:6.0f}  p99 {result['p99_ms']:6.0f}  "
+          f"max {result['max_ms']:6.0f}  mean {result['mean_ms']:6.0f} ms  failed {result['failed']:>3}  "
+          f"degraded {result['degraded']:>3}  retries {stats['retries']:>3}  hedges {stats['hedges']:>3} "
+          f"(won {stats['hedge_wins']})  short-circuited {stats['short_circuits']:>3}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02, help="usual first-token latency (s)")
+    parser.add_argument("--slow-rate", type=float, default=0.03, help="share of slow calls")
+    parser.add_argument("--slow", type=float, default=1.0, help="extra latency of a slow call (s)")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="share of failing calls")
+    parser.add_argument("--outage-calls", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    faults = dict(first_token_latency=args.latency, slow_rate=args.slow_rate, slow_latency=args.slow,
+                  error_rate=args.error_rate, seed=args.seed)
+    print(f"tail: {args.calls} code review calls, {args.latency * 1000:.0f} ms usual latency, "
+          f"{args.slow_rate:.0%} slow by {args.slow}s, {args.error_rate:.0%} failing")
+    print_row("direct", run(args.calls, Resilience(enabled=False), **faults))
+    print_row("resilient", run(args.calls, Resilience(backoff=0.05), **faults))
+
+    outage = dict(first_token_latency=args.latency, error_rate=1.0)
+    print(f"outage: {args.outage_calls} calls while every request fails")
+    print_row("retrying", run(args.outage_calls, Resilience(backoff=0.05, breaker_failures=10 ** 9), **outage))
+    print_row("breaker", run(args.outage_calls, Resilience(backoff=0.05), **outage))
+
+
+if __name__ == "__main__":
+    main()
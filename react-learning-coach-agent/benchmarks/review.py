@@ -0,0 +1,72 @@
+"""
+Multi-block code review benchmark: a paste with several components,
+reviewed one block after another vs by review.review_code (bounded thread
+pool, merged result), on a fake model with per-call latency.
+
+    python -m benchmarks.review --blocks 5 --first-token 0.5 --workers 4
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ["LLM_CACHE"] = "off"
+
+import fake_llm
+import runtime
+import tools
+from review import review_chunks, review_code
+
+STAGE_INFO = "Stage: Components & JSX\nGoal: Build the todo UI\nFundamentals: jsx, props"
+
+
+def component(i: int, lines: int = 12) -> str:
+    body = "\n".join(f"      <li key={{'{i}-{n}'}}>{{items[{n}]}}</li>" for n in range(lines))
+    return (
+        f"export function Panel{i}({{ items }}: {{ items: string[] }}) {{\n"
+        f"  const [open{i}, setOpen{i}] = useState(false);\n"
+        f"  return (\n    <ul onClick={{() => setOpen{i}(!open{i})}}>\n{body}\n    </ul>\n  );\n}}"
+    )
+
+
+def paste(blocks: int) -> str:
+    return "Can you review these?\n\n" + "\n\n".join(f"```tsx\n{component(i)}\n```" for i in range(blocks))
+
+
+def timed(fn, reps: int) -> float:
+    samples = []
+    for _ in range(reps):
+        tools._review_memo.clear()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=5)
+    parser.add_argument("--first-token", type=float, default=0.5)
+    parser.add_argument("--per-token", type=float, default=0.005)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--reps", type=int, default=3)
+    args = parser.parse_args()
+
+    runtime.set_llm_factory(fake_llm.factory(first_token_latency=args.first_token, token_latency=args.per_token))
+    message = paste(args.blocks)
+    chunks = review_chunks(message)
+
+    sequential = timed(lambda: [tools.analyze_code_snippet(code, STAGE_INFO) for _, code in chunks], args.reps)
+    parallel = timed(lambda: review_code(message, STAGE_INFO, workers=args.workers), args.reps)
+    big = "```tsx\n" + "\n\n".join(component(i, lines=30) for i in range(args.blocks)) + "\n```"
+    big_chunks = review_chunks(big)
+    big_parallel = timed(lambda: review_code(big, STAGE_INFO, workers=args.workers), args.reps)
+
+    print(f"{args.blocks} blocks, {args.first_token}s first token, {args.workers} workers")
+    print(f"sequential review:        {sequential * 1000:8.0f} ms")
+    print(f"parallel review_code:     {parallel * 1000:8.0f} ms  ({sequential / parallel:.1f}x)")
+    print(f"one {big.count(chr(10))}-line file -> {len(big_chunks)} chunks: {big_parallel * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Memory per session: many simulated learners in one process (as Streamlit
+serves them), sharing runtime's graph, LLM client, docs index and response
+cache vs each session holding its own copies (compiled graph, client,
+corpus + BM25 index, cache), as when they lived in st.session_state.
+Python heap measured with tracemalloc; sessions keep only their GraphState.
+
+    python -m benchmarks.sessions --sessions 200 --threads 16
+"""
+import argparse
+import gc
+import os
+import shutil
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ["LLM_CACHE"] = "off"
+os.environ["PREFETCH"] = "off"
+# Read when checkpoints/llm_cache are imported, so set before anything imports them
+TMP = tempfile.mkdtemp(prefix="coach-sessions-")
+os.environ["CHECKPOINT_DB"] = os.path.join(TMP, "checkpoints.sqlite")
+os.environ["LLM_CACHE_DB"] = os.path.join(TMP, "llm_cache.sqlite")
+
+import fake_llm
+import runtime
+from benchmarks.concurrency import _input
+
+
+def heap() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def private_resources() -> dict:
+    """What one session held when it built its own resources."""
+    from graph import build_graph
+    from llm_cache import ResponseCache
+    from tools import open_corpus
+
+    corpus = open_corpus()
+    corpus.lexical_index()
+    return {
+        "graph": build_graph(checkpointer=runtime.get_checkpointer()),
+        "llm": fake_llm.FakeChatModel(),
+        "corpus": corpus,
+        "cache": ResponseCache(path=None),
+    }
+
+
+def run_sessions(prefix: str, sessions: int, turns: int, threads: int, private: bool) -> list:
+    from checkpoints import thread_config
+
+    def session(n: int) -> dict:
+        held = {"resources": private_resources()} if private else {}
+        config = thread_config(f"{prefix}-{n}")
+        for turn in range(turns):
+            held["state"] = runtime.get_graph().invoke(_input(turn), config)
+        return held
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(session, range(sessions)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    runtime.set_llm_factory(fake_llm.factory())
+    # Imports and first-call setup are not part of any session
+    run_sessions("warm", 1, args.turns, 1, private=True)
+
+    tracemalloc.start()
+    results = {}
+    for label, private in (("shared runtime", False), ("per-session copies", True)):
+        before = heap()
+        held = run_sessions(label.split()[0], args.sessions, args.turns, args.threads, private)
+        results[label] = (heap() - before) / args.sessions
+        del held
+    tracemalloc.stop()
+    shutil.rmtree(TMP, ignore_errors=True)
+
+    print(f"{args.sessions} sessions x {args.turns} turns, {args.threads} threads")
+    for label, per_session in results.items():
+        print(f"{label:<20} {per_session / 1024:>8.1f} KB/session  ({per_session * args.sessions / 2**20:.1f} MB total)")
+    shared, private = results["shared runtime"], results["per-session copies"]
+    print(f"shared runtime: {private / shared:.1f}x less memory per session")
+
+
+if __name__ == "__main__":
+    main()
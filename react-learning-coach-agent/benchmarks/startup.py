@@ -0,0 +1,68 @@
+"""
+Cold-start benchmark: per-module import time, time until the CLI shows its
+first prompt, and the work runtime.py defers off that path.
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = ["runtime", "tools", "nodes", "graph", "main"]
+
+TIMED = "import time; t = time.perf_counter(); {code}; print(time.perf_counter() - t)"
+
+DEFERRED = {
+    "langchain_openai import + ChatOpenAI()": "from langchain_openai import ChatOpenAI; ChatOpenAI(model='gpt-4o-mini')",
+    "runtime.get_graph() (import + compile)": "import runtime; runtime.get_graph()",
+}
+
+
+def _env() -> dict:
+    # A placeholder key lets ChatOpenAI construct; nothing here makes a request.
+    return {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-benchmark")}
+
+
+def time_snippet(code: str) -> float:
+    out = subprocess.run([sys.executable, "-c", TIMED.format(code=code)],
+                         capture_output=True, text=True, check=True, env=_env())
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def time_to_first_prompt() -> float:
+    """Spawn the CLI and wait for its 'You:' prompt."""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-u", "main.py"], stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=_env())
+    buf = b""
+    while b"You:" not in buf:
+        chunk = proc.stdout.read1(4096)
+        if not chunk:
+            raise RuntimeError("main.py exited before prompting")
+        buf += chunk
+    elapsed = time.perf_counter() - start
+    proc.communicate(b"quit\n", timeout=30)
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    med = lambda fn: statistics.median(fn() for _ in range(args.runs)) * 1000
+    print(f"median of {args.runs} fresh interpreters\n")
+    print("import time:")
+    for module in MODULES:
+        print(f"  import {module:<10} {med(lambda: time_snippet(f'import {module}')):8.1f} ms")
+    print(f"\ntime to first CLI prompt: {med(time_to_first_prompt):8.1f} ms")
+    print("\ndeferred off the startup path:")
+    for label, code in DEFERRED.items():
+        print(f"  {label:<40} {med(lambda: time_snippet(code)):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
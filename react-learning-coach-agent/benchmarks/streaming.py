@@ -0,0 +1,61 @@
+"""
+Time-to-first-token benchmark: how long a learner waits before seeing any
+of the coach's reply, blocking invoke vs streaming, on a fake model with
+configurable first-token and per-token latency.
+
+    python -m benchmarks.streaming --turns 10 --first-token 0.5 --per-token 0.02
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ["LLM_CACHE"] = "off"  # every turn must reach the model
+
+import fake_llm
+import runtime
+from checkpoints import open_checkpointer, thread_config
+from graph import build_graph
+from main import turn_input
+from streaming import TurnStream
+
+PROMPTS = ["continue", "give me exercises", "how do props work?"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--first-token", type=float, default=0.5)
+    parser.add_argument("--per-token", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = build_graph(checkpointer=open_checkpointer(os.path.join(tmp, "bench.sqlite")))
+        runtime.set_llm_factory(fake_llm.factory())
+        config = thread_config("bench")
+        graph.invoke(turn_input(graph, config, "I want to build a todo app"), config)
+        runtime.set_llm_factory(fake_llm.factory(first_token_latency=args.first_token, token_latency=args.per_token))
+
+        blocking, ttft, streamed_total = [], [], []
+        for turn in range(args.turns):
+            prompt = PROMPTS[turn % len(PROMPTS)]
+            start = time.perf_counter()
+            graph.invoke(turn_input(graph, config, prompt), config)
+            blocking.append(time.perf_counter() - start)
+
+            stream = TurnStream(graph, turn_input(graph, config, prompt), config)
+            for _ in stream:
+                pass
+            ttft.append(stream.ttft)
+            streamed_total.append(stream.elapsed)
+
+    p50 = lambda xs: statistics.median(xs) * 1000
+    print(f"{args.turns} coaching turns, first token {args.first_token}s, {args.per_token}s/token")
+    print(f"blocking invoke: first visible text after {p50(blocking):8.1f} ms (p50, whole reply)")
+    print(f"streaming:       first token after       {p50(ttft):8.1f} ms (p50)")
+    print(f"streaming:       full reply after        {p50(streamed_total):8.1f} ms (p50)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Deterministic benchmark suite: no API calls, the fake chat model
+(fake_llm.py) with canned JSON and configurable latency stands in for
+ChatOpenAI in every node and tool.
+
+    node_overhead   onboarding/planning/coaching node time beyond the simulated model latency
+    turn_latency    full turns through build_graph().invoke (onboarding+plan, coaching, exercises)
+    fetch_docs      ms/query as the corpus grows (synthetic passages)
+    state_growth    conversation and checkpoint size over a 500-turn session
+    state_codec     size and encode/decode time of a planned state: JSON, LangGraph msgpack, state_codec.py
+    instrumentation per-turn cost of the metrics callback (metrics.py), JSONL trace included
+
+Results are written as JSON (--json) and checked against regression
+thresholds (benchmarks/thresholds.json: {"metric": {"max": x} or {"min": x}});
+the exit status is 1 if any threshold is crossed. The checked-in thresholds
+are for the default settings (no simulated latency, 500 turns, 1k/5k/20k docs).
+
+    python -m benchmarks.suite --json results.json
+    python -m benchmarks.suite --only fetch_docs,turn_latency --first-token 0.05
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+os.environ["LLM_CACHE"] = "off"  # every call must reach the (fake) model
+os.environ["PREFETCH"] = "off"
+# Read when checkpoints/llm_cache are imported, so set before anything imports them
+TMP = tempfile.mkdtemp(prefix="coach-suite-")
+os.environ["CHECKPOINT_DB"] = os.path.join(TMP, "checkpoints.sqlite")
+os.environ["LLM_CACHE_DB"] = os.path.join(TMP, "llm_cache.sqlite")
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+import fake_llm
+import runtime
+from benchmarks.retrieval import make_docs, make_queries
+
+THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+
+
+def median_ms(fn: Callable[[], Any], reps: int) -> float:
+    samples = []
+    for _ in range(reps):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def onboarded_state() -> Dict[str, Any]:
+    spec = fake_llm.ONBOARDING_JSON
+    return {
+        "messages": [HumanMessage(content="I want to build a todo app"), AIMessage(content="✅ Project Confirmed")],
+        "summary": "",
+        "learner_profile": {"assumed_level": spec["assumed_level"]},
+        "project_spec": {"summary": spec["project_summary"], "features": list(spec["features"])},
+        "stages": [],
+        "plan_basis": {},
+        "current_stage_index": 0,
+        "status": "onboarding_complete",
+    }
+
+
+def node_overhead(args) -> Dict[str, float]:
+    """Median node time minus the model latency the fake simulates for that call."""
+    from nodes import coaching_node, onboarding_node, planning_node
+
+    def simulated_ms(reply: str) -> float:
+        tokens = len(fake_llm.split_tokens(reply))
+        return (args.first_token + args.per_token * max(0, tokens - 1)) * 1000
+
+    onboarding = {"messages": [HumanMessage(content="I want to build a todo app")], "status": "onboarding"}
+    planned = planning_node(copy.deepcopy(onboarded_state()))
+    coaching = {**planned, "messages": [HumanMessage(content="how do props work?")]}
+    cases = {
+        "onboarding_node": (onboarding_node, onboarding, json.dumps(fake_llm.ONBOARDING_JSON)),
+        "planning_node": (planning_node, onboarded_state(), json.dumps(fake_llm.PLAN_JSON)),
+        "coaching_node": (coaching_node, coaching, fake_llm.COACHING_TEXT),
+    }
+    results = {}
+    for name, (node, state, reply) in cases.items():
+        elapsed = median_ms(lambda: node(copy.deepcopy(state)), args.reps)
+        results[f"{name}_ms"] = round(elapsed - simulated_ms(reply), 3)
+    return results
+
+
+def turn_latency(args) -> Dict[str, float]:
+    """Wall time of whole turns (graph, checkpointer, memory node included)."""
+    from graph import build_graph
+    from main import create_initial_state
+
+    graph = build_graph(InMemorySaver())
+    results: Dict[str, List[float]] = {"onboarding_turn_ms": [], "coaching_turn_ms": [], "exercises_turn_ms": []}
+    for rep in range(args.reps):
+        config = {"configurable": {"thread_id": f"suite-{rep}"}}
+        state = create_initial_state()
+        state["messages"].append(HumanMessage(content="I want to build a todo app"))
+        results["onboarding_turn_ms"].append(median_ms(lambda: graph.invoke(state, config), 1))
+        for key, text in (("coaching_turn_ms", "continue"), ("exercises_turn_ms", "give me exercises")):
+            results[key].append(median_ms(lambda: graph.invoke({"messages": [HumanMessage(content=text)]}, config), 1))
+    return {key: round(statistics.median(values), 3) for key, values in results.items()}
+
+
+def fetch_docs_scaling(args) -> Dict[str, float]:
+    """fetch_docs ms/query on growing synthetic corpora; BM25 should stay far from linear."""
+    from corpus import ListCorpus
+    from tools import fetch_docs
+
+    queries = make_queries(200)
+    results = {}
+    try:
+        for size in args.corpus_sizes:
+            runtime.set_corpus(ListCorpus(make_docs(size)))
+            fetch_docs(queries[0])  # index build is a one-off, not per query
+            start = time.perf_counter()
+            for q in queries:
+                fetch_docs(q)
+            results[f"fetch_docs_{size}_ms"] = round((time.perf_counter() - start) / len(queries) * 1000, 4)
+    finally:
+        runtime.set_corpus(None)
+    smallest, largest = min(args.corpus_sizes), max(args.corpus_sizes)
+    results["fetch_docs_scaling_ratio"] = round(
+        results[f"fetch_docs_{largest}_ms"] / results[f"fetch_docs_{smallest}_ms"], 2
+    )
+    return results
+
+
+def state_growth(args) -> Dict[str, float]:
+    """Conversation bytes (memory_stats) and serialized checkpoint size as a session runs `--turns` turns."""
+    from graph import build_graph
+    from main import create_initial_state
+    from memory import memory_stats
+
+    saver = InMemorySaver()
+    graph = build_graph(saver)
+    config = {"configurable": {"thread_id": "suite-growth"}}
+    state = create_initial_state()
+    state["messages"].append(HumanMessage(content="I want to build a todo app"))
+    graph.invoke(state, config)
+
+    sizes = {}
+    checkpoints = {}
+    marks = {max(1, args.turns // 5), args.turns}
+    for turn in range(1, args.turns + 1):
+        state = graph.invoke({"messages": [HumanMessage(content=f"question {turn} about props")]}, config)
+        if turn in marks:
+            sizes[turn] = memory_stats(state)["total_bytes"]
+            checkpoints[turn] = len(saver.serde.dumps_typed(state)[1])
+    early, last = min(marks), args.turns
+    return {
+        f"state_bytes_turn_{early}": sizes[early],
+        f"state_bytes_turn_{last}": sizes[last],
+        f"checkpoint_bytes_turn_{last}": checkpoints[last],
+        "state_growth_ratio": round(sizes[last] / sizes[early], 3),
+    }
+
+
+def state_codec(args) -> Dict[str, float]:
+    """
+    One planned session's state (onboarding, plan, 20 coaching turns) as
+    JSON (messages via message_to_dict), LangGraph's msgpack serializer and
+    state_codec.py: bytes, encode and decode µs each.
+    """
+    from langchain_core.messages import message_to_dict, messages_from_dict
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    from graph import build_graph
+    from main import create_initial_state
+    from state_codec import decode_state, encode_state
+
+    graph = build_graph(InMemorySaver())
+    config = {"configurable": {"thread_id": "suite-codec"}}
+    state = create_initial_state()
+    state["messages"].append(HumanMessage(content="I want to build a todo app"))
+    graph.invoke(state, config)
+    for turn in range(20):
+        graph.invoke({"messages": [HumanMessage(content=f"question {turn} about props")]}, config)
+    state = graph.get_state(config).values
+
+    def json_dumps(value: Dict[str, Any]) -> bytes:
+        return json.dumps(dict(value, messages=[message_to_dict(m) for m in value["messages"]])).encode()
+
+    def json_loads(data: bytes) -> Dict[str, Any]:
+        value = json.loads(data)
+        return dict(value, messages=messages_from_dict(value["messages"]))
+
+    serde = JsonPlusSerializer()
+    codecs = {
+        "json": (json_dumps, json_loads),
+        "msgpack": (lambda value: serde.dumps_typed(value)[1], lambda data: serde.loads_typed(("msgpack", data))),
+        "compact": (encode_state, decode_state),
+    }
+    reps = max(args.reps * 40, 200)
+    results: Dict[str, float] = {}
+    for name, (dumps, loads) in codecs.items():
+        data = dumps(state)
+        results[f"codec_{name}_bytes"] = len(data)
+        results[f"codec_{name}_encode_us"] = round(median_ms(lambda: dumps(state), reps) * 1000, 1)
+        results[f"codec_{name}_decode_us"] = round(median_ms(lambda: loads(data), reps) * 1000, 1)
+    results["codec_compact_size_ratio"] = round(results["codec_compact_bytes"] / results["codec_json_bytes"], 3)
+    results["codec_compact_decode_ratio"] = round(
+        results["codec_compact_decode_us"] / results["codec_json_decode_us"], 3
+    )
+    return results
+
+
+def instrumentation(args) -> Dict[str, float]:
+    """
+    Coaching turns on graphs built with and without the metrics callback
+    (tracing to a temp file), alternated so both see the same history growth.
+    """
+    from graph import build_graph
+    from main import create_initial_state
+
+    metrics = runtime.get_metrics()
+    enabled, trace_path = metrics.enabled, metrics.trace_path
+    sessions = {}
+    try:
+        for label, on in (("plain", False), ("instrumented", True)):
+            metrics.enabled = on
+            metrics.trace_path = os.path.join(TMP, "trace.jsonl") if on else None
+            config = {"configurable": {"thread_id": f"suite-{label}"}}
+            sessions[label] = (build_graph(InMemorySaver()), config)
+            state = create_initial_state()
+            state["messages"].append(HumanMessage(content="I want to build a todo app"))
+            sessions[label][0].invoke(state, config)
+        metrics.trace_path = os.path.join(TMP, "trace.jsonl")
+        samples: Dict[str, List[float]] = {label: [] for label in sessions}
+        for _ in range(max(args.reps * 40, 100)):
+            for label, (graph, config) in sessions.items():
+                samples[label].append(median_ms(
+                    lambda: graph.invoke({"messages": [HumanMessage(content="how do props work?")]}, config), 1
+                ))
+    finally:
+        metrics.enabled, metrics.trace_path = enabled, trace_path
+    plain, instrumented = (statistics.median(samples[label]) for label in ("plain", "instrumented"))
+    return {
+        "instrumentation_overhead_ms": round(instrumented - plain, 3),
+        "instrumentation_overhead_pct": round((instrumented - plain) / plain * 100, 2),
+    }
+
+
+BENCHMARKS: Dict[str, Callable[[Any], Dict[str, float]]] = {
+    "node_overhead": node_overhead,
+    "turn_latency": turn_latency,
+    "fetch_docs": fetch_docs_scaling,
+    "state_growth": state_growth,
+    "state_codec": state_codec,
+    "instrumentation": instrumentation,
+}
+
+
+def check(metrics: Dict[str, float], thresholds: Dict[str, Dict[str, float]]) -> List[str]:
+    """Threshold violations, as readable lines; metrics that weren't run are skipped."""
+    failures = []
+    for name, bound in thresholds.items():
+        if name not in metrics:
+            continue
+        value = metrics[name]
+        if "max" in bound and value > bound["max"]:
+            failures.append(f"{name} = {value} > max {bound['max']}")
+        if "min" in bound and value < bound["min"]:
+            failures.append(f"{name} = {value} < min {bound['min']}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--first-token", type=float, default=0.0, help="simulated seconds before the first token")
+    parser.add_argument("--per-token", type=float, default=0.0, help="simulated seconds per further token")
+    parser.add_argument("--reps", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=500, help="session length for state_growth")
+    parser.add_argument("--corpus-sizes", type=lambda s: [int(n) for n in s.split(",")], default=[1_000, 5_000, 20_000])
+    parser.add_argument("--json", help="write results here ('-' for stdout)")
+    parser.add_argument("--thresholds", default=THRESHOLDS)
+    args = parser.parse_args()
+
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    runtime.set_llm_factory(fake_llm.factory(first_token_latency=args.first_token, token_latency=args.per_token))
+    metrics: Dict[str, float] = {}
+    for name in selected:
+        start = time.perf_counter()
+        results = BENCHMARKS[name](args)
+        metrics.update(results)
+        print(f"{name} ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+        for key, value in results.items():
+            print(f"  {key:<32} {value:>12}", file=sys.stderr)
+
+    with open(args.thresholds) as f:
+        thresholds = json.load(f)
+    failures = check(metrics, thresholds)
+    report = {
+        "metrics": metrics,
+        "failures": failures,
+        "config": {"first_token": args.first_token, "per_token": args.per_token, "reps": args.reps,
+                   "turns": args.turns, "corpus_sizes": args.corpus_sizes},
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    for line in failures:
+        print(f"REGRESSION: {line}", file=sys.stderr)
+    shutil.rmtree(TMP, ignore_errors=True)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
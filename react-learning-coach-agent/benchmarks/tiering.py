@@ -0,0 +1,83 @@
+"""
+Model tiering benchmark: coaching turns while the declared model is degraded
+(slow first token), with every node pinned to it vs routed by model_router
+with a latency budget, so slow calls fall back to the faster tier and the
+declared model is probed again after the cooldown. Fake models; reports
+turn latency, calls per tier and their cost.
+
+    python -m benchmarks.tiering --slow 2.0 --fast 0.3 --budget 1.0 --turns 16
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+os.environ["LLM_CACHE"] = "off"  # repeated questions must reach the model
+os.environ["PREFETCH"] = "off"
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+import runtime
+from benchmarks.suite import onboarded_state
+from fake_llm import FakeChatModel
+from graph import build_graph
+from model_router import ModelRouter, load_config
+
+PRIMARY, FAST = "gpt-4o-mini", "gpt-4.1-nano"
+
+
+def routes(budget) -> str:
+    """MODEL_ROUTES-style JSON: two tiers, every node on PRIMARY with `budget` (None = never fall back)."""
+    nodes = {node: {"model": PRIMARY, "budget_s": budget} for node in ("planning", "stage_details", "coaching")}
+    return json.dumps({"tiers": [PRIMARY, FAST], "nodes": nodes})
+
+
+def run(router: ModelRouter, turns: int) -> list:
+    runtime._router = router
+    graph = build_graph(InMemorySaver())
+    config = {"configurable": {"thread_id": "tiering"}}
+    graph.invoke(onboarded_state(), config)
+    samples = []
+    for turn in range(turns):
+        before = router.stats()["tiers"].get(PRIMARY, {}).get("calls", 0)
+        start = time.perf_counter()
+        graph.invoke({"messages": [HumanMessage(content=f"question {turn}: how do props work?")]}, config)
+        elapsed = time.perf_counter() - start
+        # One model call per coaching turn: PRIMARY's call count tells which tier served it
+        used = PRIMARY if router.stats()["tiers"].get(PRIMARY, {}).get("calls", 0) > before else FAST
+        samples.append((elapsed, used))
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--slow", type=float, default=2.0, help=f"{PRIMARY} first-token latency (degraded)")
+    parser.add_argument("--fast", type=float, default=0.3, help=f"{FAST} first-token latency")
+    parser.add_argument("--budget", type=float, default=1.0, help="planning/coaching latency budget (s)")
+    parser.add_argument("--cooldown", type=float, default=3.0, help="seconds before the slow tier is tried again")
+    parser.add_argument("--turns", type=int, default=16)
+    args = parser.parse_args()
+
+    latency = {PRIMARY: args.slow, FAST: args.fast}
+    runtime.set_llm_factory(lambda model: FakeChatModel(model_name=model, first_token_latency=latency.get(model, 0.0)))
+    results = {}
+    for label, budget in (("pinned", None), ("tiered", args.budget)):
+        router = ModelRouter(load_config(routes(budget)), cooldown=args.cooldown)
+        results[label] = (run(router, args.turns), router.stats())
+
+    print(f"{PRIMARY} (P) at {args.slow}s, {FAST} (F) at {args.fast}s first token; budget {args.budget}s, "
+          f"cooldown {args.cooldown}s")
+    for label, (samples, stats) in results.items():
+        seconds = sorted(s for s, _ in samples)
+        path = " ".join("F" if model == FAST else "P" for _, model in samples)
+        print(f"{label:<7} mean {statistics.mean(seconds) * 1000:6.0f} ms  "
+              f"p95 {seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))] * 1000:6.0f} ms  model per turn: {path}")
+        for model, tier in stats["tiers"].items():
+            print(f"        {model:<14} {tier['calls']:>3} calls  p50 {tier['p50_ms']:>7.0f} ms  "
+                  f"${tier['cost_usd']:.6f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Durable sessions: a SQLite (WAL) checkpointer keyed by thread_id, plus
+pruning/compaction so the database stays bounded under many long sessions.
+Checkpoints are written with state_codec's compact format
+(CHECKPOINT_CODEC=compact, the default) or LangGraph's own (=msgpack); either
+setting reads both.
+"""
+import os
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from state_codec import CompactSerializer
+
+CHECKPOINT_DB = os.getenv(
+    "CHECKPOINT_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".checkpoints.sqlite")
+)
+# Checkpoints kept per thread; older ones only matter for time travel.
+KEEP_PER_THREAD = int(os.getenv("CHECKPOINT_KEEP", "5"))
+# Threads idle this long are deleted outright.
+SESSION_TTL_DAYS = float(os.getenv("CHECKPOINT_TTL_DAYS", "30"))
+CHECKPOINT_CODEC = os.getenv("CHECKPOINT_CODEC", "compact").lower()
+
+# 100ns intervals between the UUID epoch (1582-10-15) and the Unix epoch.
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+def thread_config(thread_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def new_thread_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def checkpoint_serde() -> CompactSerializer:
+    return CompactSerializer(compact=CHECKPOINT_CODEC != "msgpack")
+
+
+def open_checkpointer(path: str = CHECKPOINT_DB, prune: bool = True) -> SqliteSaver:
+    """SqliteSaver on a WAL-mode database, shared across threads; prunes on open by default."""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    saver = SqliteSaver(conn, serde=checkpoint_serde())
+    saver.setup()
+    if prune:
+        prune_checkpoints(saver)
+    return saver
+
+
+async def open_async_checkpointer(path: str = CHECKPOINT_DB, prune: bool = True):
+    """
+    AsyncSqliteSaver on the same database, for ainvoke/astream. Bound to the
+    running event loop; close it with `await saver.conn.close()`.
+    """
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    if prune:
+        sync_saver = open_checkpointer(path, prune=True)
+        sync_saver.conn.close()
+    conn = await aiosqlite.connect(path)
+    await conn.execute("PRAGMA journal_mode=WAL")
+    await conn.execute("PRAGMA synchronous=NORMAL")
+    saver = AsyncSqliteSaver(conn, serde=checkpoint_serde())
+    await saver.setup()
+    return saver
+
+
+def _checkpoint_time(checkpoint_id: str) -> float:
+    """Unix time encoded in a LangGraph (uuid6) checkpoint id."""
+    u = uuid.UUID(checkpoint_id)
+    ticks = (u.time_low << 28) | (u.time_mid << 12) | (u.time_hi_version & 0x0FFF)
+    return (ticks - _UUID_EPOCH_OFFSET) / 1e7
+
+
+def prune_checkpoints(
+    saver: SqliteSaver,
+    keep_per_thread: int = KEEP_PER_THREAD,
+    ttl_days: float = SESSION_TTL_DAYS,
+    vacuum_threshold: int = 1000,
+) -> Dict[str, int]:
+    """
+    Delete threads idle longer than ttl_days, keep only the newest
+    keep_per_thread checkpoints of the rest, drop orphaned writes, then
+    truncate the WAL (and VACUUM once enough rows were freed).
+    """
+    keep_per_thread = max(1, keep_per_thread)
+    conn = saver.conn
+    with saver.lock:
+        cutoff = time.time() - ttl_days * 86400
+        expired = [
+            thread_id
+            for thread_id, latest in conn.execute("SELECT thread_id, MAX(checkpoint_id) FROM checkpoints GROUP BY thread_id")
+            if _checkpoint_time(latest) < cutoff
+        ]
+        conn.executemany("DELETE FROM checkpoints WHERE thread_id = ?", [(t,) for t in expired])
+        conn.executemany("DELETE FROM writes WHERE thread_id = ?", [(t,) for t in expired])
+
+        # uuid6 ids sort by creation time, so newest-first is a plain DESC.
+        old = conn.execute(
+            """
+            DELETE FROM checkpoints WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, ROW_NUMBER() OVER (
+                        PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                    ) AS rn FROM checkpoints
+                ) WHERE rn > ?
+            )
+            """,
+            (keep_per_thread,),
+        ).rowcount
+        orphaned = conn.execute(
+            """
+            DELETE FROM writes WHERE NOT EXISTS (
+                SELECT 1 FROM checkpoints c
+                WHERE c.thread_id = writes.thread_id
+                  AND c.checkpoint_ns = writes.checkpoint_ns
+                  AND c.checkpoint_id = writes.checkpoint_id
+            )
+            """
+        ).rowcount
+        conn.commit()
+
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if old + orphaned >= vacuum_threshold:
+            conn.execute("VACUUM")
+    return {"expired_threads": len(expired), "checkpoints": old, "writes": orphaned}
+
+
+def list_threads(saver: SqliteSaver) -> Dict[str, float]:
+    """thread_id -> last activity (unix time), most recent first."""
+    with saver.lock:
+        rows = saver.conn.execute("SELECT thread_id, MAX(checkpoint_id) FROM checkpoints GROUP BY thread_id").fetchall()
+    latest = {thread_id: _checkpoint_time(cid) for thread_id, cid in rows}
+    return dict(sorted(latest.items(), key=lambda item: item[1], reverse=True))
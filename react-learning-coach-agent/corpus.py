@@ -0,0 +1,480 @@
+"""
+Docs corpus backends for fetch_docs.
+
+`ListCorpus` wraps the built-in docs_store.DOCS list. `CorpusStore` ingests
+a directory of markdown/JSONL files into passages kept in append-only shard
+files plus a fixed-width offset table, so a passage is read from disk by id
+only when it is needed. Syncing the directory again only touches files that
+were added, changed or removed (or just the paths given): their passages are
+appended or tombstoned, and the BM25 changes are appended to a delta log
+instead of rewriting the index. The manifest holds one id range per file.
+Shards are rewritten without tombstoned passages once those make up half of
+them, and recent syncs' added/removed ids are kept for `changes_since`, so the
+dense index is patched rather than rebuilt.
+
+The BM25 index is still unpickled whole (snapshot plus deltas) on first
+search; the snapshot is only rewritten when the delta log grows past half
+its size.
+"""
+import hashlib
+import json
+import os
+import pickle
+import re
+import struct
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from retrieval import BM25Index, tokenize
+
+# Offset table record: shard number, byte offset, byte length, live flag.
+OFFSET_RECORD = struct.Struct("<IQIB")
+SHARD_BYTES = 64 * 1024 * 1024
+PASSAGE_CHARS = 1200
+
+MANIFEST_FILE = "manifest.json"
+OFFSETS_FILE = "offsets.bin"
+INDEX_FILE = "bm25.pkl"
+DELTA_FILE = "bm25.delta"
+# Delta log record: byte length of the pickled (generation, changes) that follows.
+DELTA_HEADER = struct.Struct("<I")
+# Snapshot rewritten once the delta log is this large relative to it
+DELTA_COMPACT_RATIO = 0.5
+# Shards rewritten once tombstoned passages are this share of their bytes
+DEAD_COMPACT_RATIO = 0.5
+# Syncs whose added/removed ids are kept for changes_since
+CHANGE_LOG_SYNCS = 16
+SOURCE_SUFFIXES = (".md", ".markdown", ".mdx", ".jsonl")
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$")
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+FRONT_MATTER_RE = re.compile(r"\A---\s*\n(.*?)\n---\s*\n", re.DOTALL)
+
+
+def passage_text(doc: Dict[str, str]) -> str:
+    """The text a passage is indexed under."""
+    return doc["topic"] + " " + doc["content"]
+
+
+# --- Chunking ---
+def _split_paragraphs(text: str, max_chars: int) -> List[str]:
+    """Greedily pack blank-line separated paragraphs into chunks of at most max_chars."""
+    chunks, current = [], ""
+    for para in re.split(r"\n\s*\n", text):
+        para = para.strip()
+        if not para:
+            continue
+        while len(para) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(para[:max_chars])
+            para = para[max_chars:]
+        if current and len(current) + len(para) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{para}" if current else para
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _slug(heading: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", heading.lower()).strip("-")
+
+
+def chunk_markdown(text: str, source: str, max_chars: int = PASSAGE_CHARS) -> List[Dict[str, str]]:
+    """One passage per heading section (split further when long). Front matter `link:` sets the base link."""
+    base_link = source
+    front = FRONT_MATTER_RE.match(text)
+    if front:
+        text = text[front.end():]
+        for line in front.group(1).splitlines():
+            key, _, value = line.partition(":")
+            if key.strip() == "link" and value.strip():
+                base_link = value.strip()
+
+    topic, anchor, lines, passages = Path(source).stem.replace("-", " "), "", [], []
+
+    def flush():
+        link = f"{base_link}#{anchor}" if anchor else base_link
+        for chunk in _split_paragraphs("\n".join(lines), max_chars):
+            passages.append({"topic": topic, "content": chunk, "link": link})
+
+    fence = None  # the open code fence's marker; "# ..." inside one is code, not a heading
+    for line in text.splitlines():
+        marker = FENCE_RE.match(line)
+        if marker and (fence is None or (marker.group(1)[0] == fence[0] and len(marker.group(1)) >= len(fence))):
+            fence = marker.group(1) if fence is None else None
+        match = HEADING_RE.match(line) if fence is None else None
+        if match:
+            flush()
+            topic, anchor, lines = match.group(2).strip(), _slug(match.group(2)), []
+        else:
+            lines.append(line)
+    flush()
+    return passages
+
+
+def chunk_jsonl(text: str, source: str, max_chars: int = PASSAGE_CHARS) -> List[Dict[str, str]]:
+    """Each line is a {"topic", "content", "link"} object; long content is split."""
+    passages = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        for chunk in _split_paragraphs(record.get("content", ""), max_chars):
+            passages.append({
+                "topic": record.get("topic", Path(source).stem),
+                "content": chunk,
+                "link": record.get("link", source),
+            })
+    return passages
+
+
+def load_passages(path: Path, source: str) -> List[Dict[str, str]]:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".jsonl":
+        return chunk_jsonl(text, source)
+    return chunk_markdown(text, source)
+
+
+# --- Backends ---
+class ListCorpus:
+    """The built-in in-memory DOCS list; ids are list positions."""
+
+    def __init__(self, docs: List[Dict[str, str]]):
+        self.docs = docs
+        self._lock = threading.Lock()
+        self._index: Optional[BM25Index] = None
+        self._fingerprint: Optional[str] = None
+
+    def __getitem__(self, doc_id: int) -> Dict[str, str]:
+        return self.docs[doc_id]
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def live_ids(self) -> Iterator[int]:
+        return iter(range(len(self.docs)))
+
+    def lexical_index(self) -> BM25Index:
+        with self._lock:
+            if self._index is None:
+                self._index = BM25Index.from_texts(passage_text(doc) for doc in self.docs)
+        return self._index
+
+    def fingerprint(self) -> str:
+        if self._fingerprint is None:
+            text = "\0".join(passage_text(d) for d in self.docs)
+            self._fingerprint = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return self._fingerprint
+
+
+class CorpusStore:
+    """
+    Sharded on-disk passage store. Opening it reads only the manifest; the
+    offset table and shards are read per lookup, and the BM25 index is
+    unpickled on first search.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._shards: Dict[int, object] = {}
+        self._offsets = None
+        self._index: Optional[BM25Index] = None
+        manifest_path = self.root / MANIFEST_FILE
+        if manifest_path.exists():
+            self.manifest = json.loads(manifest_path.read_text())
+        else:
+            self.manifest = {
+                "next_id": 0, "live": 0, "dead_bytes": 0, "bytes": 0, "generation": 0,
+                "shard": 0, "first_shard": 0, "files": {}, "changes": [],
+            }
+
+    # --- Reads ---
+    def _offsets_file(self):
+        if self._offsets is None:
+            (self.root / OFFSETS_FILE).touch()
+            self._offsets = open(self.root / OFFSETS_FILE, "r+b")
+        return self._offsets
+
+    def _shard_path(self, shard: int) -> Path:
+        return self.root / f"shard-{shard:05d}.dat"
+
+    def _shard_file(self, shard: int):
+        if shard not in self._shards:
+            self._shards[shard] = open(self._shard_path(shard), "a+b")
+        return self._shards[shard]
+
+    def _record(self, doc_id: int):
+        if not 0 <= doc_id < self.manifest["next_id"]:
+            raise KeyError(doc_id)
+        f = self._offsets_file()
+        f.seek(doc_id * OFFSET_RECORD.size)
+        return OFFSET_RECORD.unpack(f.read(OFFSET_RECORD.size))
+
+    def _read(self, shard: int, offset: int, length: int) -> bytes:
+        f = self._shard_file(shard)
+        f.seek(offset)
+        return f.read(length)
+
+    def __getitem__(self, doc_id: int) -> Dict[str, str]:
+        with self._lock:
+            shard, offset, length, live = self._record(doc_id)
+            if not live:
+                raise KeyError(doc_id)
+            return json.loads(self._read(shard, offset, length))
+
+    def __len__(self) -> int:
+        return self.manifest["live"]
+
+    def live_ids(self) -> Iterator[int]:
+        for entry in self.manifest["files"].values():
+            yield from range(entry["first_id"], entry["first_id"] + entry["count"])
+
+    def lexical_index(self) -> BM25Index:
+        with self._lock:
+            if self._index is None:
+                self._index = self._load_index()
+        return self._index
+
+    def _load_index(self) -> BM25Index:
+        """The snapshot plus the delta log's newer changes; compacted into a new snapshot once the log is large."""
+        index_path, delta_path = self.root / INDEX_FILE, self.root / DELTA_FILE
+        index, generation = BM25Index(), -1
+        if index_path.exists():
+            with open(index_path, "rb") as f:
+                index, generation = pickle.load(f)
+        for batch_generation, changes in self._read_deltas():
+            if batch_generation > generation:
+                _apply(index, changes)
+                generation = batch_generation
+        delta_bytes = delta_path.stat().st_size if delta_path.exists() else 0
+        snapshot_bytes = index_path.stat().st_size if index_path.exists() else 0
+        if delta_bytes > DELTA_COMPACT_RATIO * snapshot_bytes:
+            self._write_atomic(INDEX_FILE, pickle.dumps((index, generation), protocol=pickle.HIGHEST_PROTOCOL))
+            # Batches another process appended meanwhile are newer than the snapshot and stay
+            if delta_path.stat().st_size == delta_bytes:
+                delta_path.unlink()
+        return index
+
+    def _read_deltas(self) -> Iterator[Tuple[int, list]]:
+        """The delta log's batches in order; a batch cut short by a crash (and anything after it) is dropped."""
+        path = self.root / DELTA_FILE
+        if not path.exists():
+            return
+        with open(path, "r+b") as f:
+            good = 0
+            while True:
+                header = f.read(DELTA_HEADER.size)
+                if len(header) < DELTA_HEADER.size:
+                    break
+                (length,) = DELTA_HEADER.unpack(header)
+                data = f.read(length)
+                if len(data) < length:
+                    break
+                good = f.tell()
+                yield pickle.loads(data)
+            f.truncate(good)
+
+    def fingerprint(self) -> str:
+        return f"{self.root.resolve()}:{self.manifest['generation']}"
+
+    def changes_since(self, fingerprint: str) -> Optional[Tuple[Set[int], Set[int]]]:
+        """
+        (ids added, ids removed) since the store had `fingerprint`, or None
+        when that is another store or older than the change log. Ids are
+        never reused, so an id both added and removed in the span is in both.
+        """
+        root, _, generation = fingerprint.rpartition(":")
+        if root != str(self.root.resolve()) or not generation.isdigit():
+            return None
+        generation = int(generation)
+        changes = [c for c in self.manifest["changes"] if c["generation"] > generation]
+        if len(changes) != self.manifest["generation"] - generation:
+            return None
+        added: Set[int] = set()
+        removed: Set[int] = set()
+        for change in changes:
+            added.update(_expand(change["added"]))
+            removed.update(_expand(change["removed"]))
+        return added, removed
+
+    # --- Writes ---
+    def _write_blob(self, data: bytes) -> Tuple[int, int]:
+        """Append to the current shard (starting a new one when full); (shard, offset)."""
+        shard = self.manifest["shard"]
+        f = self._shard_file(shard)
+        f.seek(0, os.SEEK_END)
+        if f.tell() and f.tell() + len(data) > SHARD_BYTES:
+            shard = self.manifest["shard"] = shard + 1
+            f = self._shard_file(shard)
+            f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        f.write(data)
+        self.manifest["bytes"] += len(data)
+        return shard, offset
+
+    def _set_record(self, doc_id: int, shard: int, offset: int, length: int, live: int) -> None:
+        offsets = self._offsets_file()
+        offsets.seek(doc_id * OFFSET_RECORD.size)
+        offsets.write(OFFSET_RECORD.pack(shard, offset, length, live))
+
+    def _append(self, doc: Dict[str, str]) -> int:
+        data = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+        shard, offset = self._write_blob(data)
+        doc_id = self.manifest["next_id"]
+        self._set_record(doc_id, shard, offset, len(data), 1)
+        self.manifest["next_id"] = doc_id + 1
+        self.manifest["live"] += 1
+        return doc_id
+
+    def _tombstone(self, doc_id: int) -> Dict[str, str]:
+        """Mark a passage dead; returns it (its text is needed to unindex it)."""
+        shard, offset, length, _ = self._record(doc_id)
+        doc = json.loads(self._read(shard, offset, length))
+        self._set_record(doc_id, shard, offset, length, 0)
+        self.manifest["live"] -= 1
+        self.manifest["dead_bytes"] += length
+        return doc
+
+    def _scan(self, docs_root: Path, paths: Optional[Iterable[str]]) -> Dict[str, Tuple[Path, int, int]]:
+        """source -> (path, mtime_ns, size) of the source files to compare with the manifest."""
+        if paths is None:
+            candidates = (p for p in sorted(docs_root.rglob("*")) if p.is_file())
+        else:
+            candidates = (docs_root / p if not Path(p).is_absolute() else Path(p) for p in paths)
+        seen = {}
+        for path in candidates:
+            if path.suffix in SOURCE_SUFFIXES and path.is_file():
+                st = path.stat()
+                seen[path.relative_to(docs_root).as_posix()] = (path, st.st_mtime_ns, st.st_size)
+        return seen
+
+    def sync(self, docs_dir: str, paths: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Bring the store in line with docs_dir: new/changed files are chunked
+        and appended, changed/removed files have their passages tombstoned,
+        and the BM25 changes are appended to the delta log. With `paths`
+        (e.g. from a file watcher) only those files are checked instead of
+        scanning the whole directory; a path that no longer exists is removed.
+        """
+        docs_root = Path(docs_dir)
+        seen = self._scan(docs_root, paths)
+        files = self.manifest["files"]
+        if paths is None:
+            checked = list(files)
+        else:
+            checked = [
+                (docs_root / p if not Path(p).is_absolute() else Path(p)).relative_to(docs_root).as_posix()
+                for p in paths
+            ]
+        stale = [src for src in checked if src in files
+                 and (src not in seen or [files[src]["mtime_ns"], files[src]["size"]] != list(seen[src][1:]))]
+        fresh = [src for src in seen if src not in files or src in stale]
+        stats = {"added": 0, "removed": 0, "files_changed": len(set(stale) | set(fresh))}
+        if not stale and not fresh:
+            return stats
+
+        with self._lock:
+            changes: list = []
+            added, removed = [], []
+            for src in stale:
+                entry = files.pop(src)
+                ids = range(entry["first_id"], entry["first_id"] + entry["count"])
+                for doc_id in ids:
+                    doc = self._tombstone(doc_id)
+                    changes.append(("-", doc_id, list(set(tokenize(passage_text(doc))))))
+                if entry["count"]:
+                    removed.append([entry["first_id"], entry["count"]])
+                stats["removed"] += entry["count"]
+            for src in fresh:
+                path, mtime_ns, size = seen[src]
+                first_id = self.manifest["next_id"]
+                for doc in load_passages(path, src):
+                    doc_id = self._append(doc)
+                    tokens = tokenize(passage_text(doc))
+                    changes.append(("+", doc_id, len(tokens), dict(Counter(tokens))))
+                count = self.manifest["next_id"] - first_id
+                files[src] = {"mtime_ns": mtime_ns, "size": size, "first_id": first_id, "count": count}
+                if count:
+                    added.append([first_id, count])
+                stats["added"] += count
+            self.manifest["generation"] += 1
+            self.manifest["changes"] = (self.manifest["changes"] + [
+                {"generation": self.manifest["generation"], "added": added, "removed": removed}
+            ])[-CHANGE_LOG_SYNCS:]
+            if self._index is not None:
+                _apply(self._index, changes)
+            self._flush(changes)
+            if self.manifest["dead_bytes"] > DEAD_COMPACT_RATIO * self.manifest["bytes"]:
+                self._compact()
+        return stats
+
+    def _compact(self) -> None:
+        """Rewrite the live passages into new shards and delete the old ones; ids stay the same."""
+        old_shards = range(self.manifest["first_shard"], self.manifest["shard"] + 1)
+        first_shard = self.manifest["shard"] = self.manifest["shard"] + 1
+        self.manifest["bytes"] = 0
+        for doc_id in list(self.live_ids()):
+            shard, offset, length, live = self._record(doc_id)
+            new_shard, new_offset = self._write_blob(self._read(shard, offset, length))
+            self._set_record(doc_id, new_shard, new_offset, length, live)
+        self.manifest["first_shard"] = first_shard
+        self.manifest["dead_bytes"] = 0
+        self._flush(None)
+        for shard in old_shards:
+            f = self._shards.pop(shard, None)
+            if f is not None:
+                f.close()
+            self._shard_path(shard).unlink(missing_ok=True)
+
+    def _flush(self, changes: Optional[list]) -> None:
+        for f in list(self._shards.values()) + [self._offsets_file()]:
+            f.flush()
+        if changes:
+            data = pickle.dumps((self.manifest["generation"], changes), protocol=pickle.HIGHEST_PROTOCOL)
+            with open(self.root / DELTA_FILE, "ab") as f:
+                f.write(DELTA_HEADER.pack(len(data)) + data)
+        self._write_atomic(MANIFEST_FILE, json.dumps(self.manifest).encode("utf-8"))
+
+    def _write_atomic(self, name: str, data: bytes) -> None:
+        tmp = self.root / f".{name}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.root / name)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "files": len(self.manifest["files"]),
+            "passages": self.manifest["live"],
+            "shards": self.manifest["shard"] - self.manifest["first_shard"] + 1,
+            "dead_bytes": self.manifest["dead_bytes"],
+        }
+
+    def close(self) -> None:
+        for f in self._shards.values():
+            f.close()
+        self._shards.clear()
+        if self._offsets is not None:
+            self._offsets.close()
+            self._offsets = None
+
+
+def _expand(ranges: List[List[int]]) -> Iterator[int]:
+    for first, count in ranges:
+        yield from range(first, first + count)
+
+
+def _apply(index: BM25Index, changes: list) -> None:
+    """Replay a delta batch: ("+", id, length, term counts) and ("-", id, terms)."""
+    for change in changes:
+        if change[0] == "+":
+            index.add_terms(change[1], change[2], change[3])
+        else:
+            index.remove_terms(change[1], change[2])
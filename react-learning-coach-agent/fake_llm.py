@@ -0,0 +1,245 @@
+"""
+Deterministic stand-in for ChatOpenAI, for benchmarks and offline runs.
+
+Replies are canned per prompt type (onboarding JSON, plan JSON, plan
+outline and stage details JSON, code review JSON, replan JSON, exercises,
+coaching text) and can simulate latency: a delay
+before the first token, then a delay per token when streaming. Async calls
+(ainvoke/astream) wait with asyncio.sleep, so they don't hold a thread.
+Faults can be injected too: a share of calls is slow (slow_latency more
+before the first token; make it large for hung calls) and a share fails
+with InjectedError after its first-token delay, drawn from `seed`.
+
+    import runtime, fake_llm
+    runtime.set_llm_factory(fake_llm.factory(first_token_latency=0.3))
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+ONBOARDING_JSON = {
+    "project_summary": "A todo app with TypeScript",
+    "features": ["add todos", "filter todos", "persist to localStorage"],
+    "assumed_level": "beginner",
+}
+STAGE_NAMES = ["Project Setup", "Components & JSX", "State with useState", "Effects & Persistence", "Filtering & Polish"]
+PLAN_JSON = {
+    "stages": [
+        {
+            "name": name,
+            "goal": f"Complete {name.lower()} for the todo app",
+            "tasks": [f"{name} task {t}" for t in range(1, 4)],
+            "fundamentals": ["jsx", "props", "useState hook", "useEffect hook"][: 2 + i % 3],
+            "docs": ["https://react.dev/learn"],
+            "features": [ONBOARDING_JSON["features"][i % 3]],
+        }
+        for i, name in enumerate(STAGE_NAMES)
+    ]
+}
+OUTLINE_JSON = {"stages": [{k: s[k] for k in ("name", "goal", "features")} for s in PLAN_JSON["stages"]]}
+REVIEW_JSON = {
+    "issues": "The effect has no dependency array, so it runs after every render.",
+    "suggested_fundamentals": "useEffect dependencies, render cycle",
+    "high_level_hint": "Think about when this effect actually needs to re-run.",
+}
+EXERCISES_TEXT = (
+    "## 🏋️ Exercises\n**Ex 1:**\n- Render a list of todos from an array\n- Verify each item has a key\n\n"
+    "**Ex 2:**\n- Add a controlled input for new todos\n- Verify the input clears on submit\n\n"
+    "**Ex 3:**\n- Toggle a todo's done state\n- Verify the UI updates without a reload\n\n"
+    "## 💡 Hints\nKeep state as close as possible to where it is used."
+)
+COACHING_TEXT = (
+    "## 📋 Instructions\n1. Create the component file\n```bash\ntouch src/TodoList.tsx\n```\n"
+    "2. Define a `Todo` interface\n3. Render the list with `map`\n\n"
+    "## 🎯 Foundations\n- Components are functions that return JSX\n- Props flow down, events flow up\n\n"
+    "## 📚 Docs\n- https://react.dev/learn\n\n"
+    "## 💡 Example\n```tsx\nconst TodoList = ({ todos }: Props) => <ul>{todos.map(t => <li key={t.id}>{t.text}</li>)}</ul>;\n```\n\n"
+    "## ❓ `continue`/`exercises`/`done`/`go to stage X`"
+)
+
+
+def split_tokens(text: str) -> List[str]:
+    """The pieces a reply streams in: words with their trailing whitespace."""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+def replan_reply(prompt: str) -> str:
+    """Keep every remaining stage but the last, which gets the added features (see replan.py)."""
+    remaining = re.findall(r"^(\d+)\. (.*) \[(.*)\]$", prompt, re.MULTILINE)
+    added = re.search(r"added features: ([^;\n]*)", prompt)
+    stages: List[Any] = [int(number) for number, _, _ in remaining[:-1]]
+    if remaining:
+        _, name, features = remaining[-1]
+        stages.append({
+            "name": name,
+            "goal": f"Complete {name.lower()}",
+            "tasks": [f"{name} task {t}" for t in range(1, 4)],
+            "fundamentals": ["useState hook", "useEffect hook"],
+            "docs": ["https://react.dev/learn"],
+            "features": [f for f in features.split(", ") if f] + ([f.strip() for f in added.group(1).split(",")] if added else []),
+        })
+    return json.dumps({"stages": stages})
+
+
+def stage_details_reply(prompt: str) -> str:
+    """Tasks, fundamentals and docs of the PLAN_JSON stage named in the prompt (or generic ones)."""
+    name = re.search(r"^Stage \d+: (.*)$", prompt, re.MULTILINE)
+    name = name.group(1) if name else "Stage"
+    stage = next((s for s in PLAN_JSON["stages"] if s["name"] == name), None) or {
+        "tasks": [f"{name} task {t}" for t in range(1, 4)],
+        "fundamentals": ["jsx", "props"],
+        "docs": ["https://react.dev/learn"],
+    }
+    return json.dumps({k: stage[k] for k in ("tasks", "fundamentals", "docs")})
+
+
+def coach_responder(messages: List[BaseMessage]) -> str:
+    """Pick the canned reply matching the prompt the nodes send."""
+    system = str(messages[0].content) if messages else ""
+    if "Extract ONLY valid JSON" in system:
+        return json.dumps(ONBOARDING_JSON)
+    if "replanner" in system:
+        return replan_reply(str(messages[-1].content))
+    if "Detail ONE stage" in system:
+        return stage_details_reply(str(messages[-1].content))
+    if "planner" in system and "Outline" in system:
+        return json.dumps(OUTLINE_JSON)
+    if "planner" in system:
+        return json.dumps(PLAN_JSON)
+    if "code reviewer" in system:
+        return json.dumps(REVIEW_JSON)
+    if "progressive exercises" in system:
+        return EXERCISES_TEXT
+    return COACHING_TEXT
+
+
+class InjectedError(RuntimeError):
+    """A failure injected by FakeChatModel's error_rate, reported like an HTTP 500."""
+
+    status_code = 500
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model returning `responder(messages)` after simulated latency."""
+
+    responder: Callable[[List[BaseMessage]], str] = coach_responder
+    first_token_latency: float = 0.0
+    token_latency: float = 0.0
+    model_name: str = "fake-coach"
+    slow_rate: float = 0.0
+    slow_latency: float = 0.0
+    error_rate: float = 0.0
+    seed: Optional[int] = None
+    _calls: int = PrivateAttr(default=0)
+    _rng: Optional[random.Random] = PrivateAttr(default=None)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-coach"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name}
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        self._calls += 1
+        return split_tokens(self.responder(messages))
+
+    def _fault(self) -> Tuple[float, bool]:
+        """This call's first-token delay and whether it then fails."""
+        if self._rng is None:
+            self._rng = random.Random(self.seed)
+        slow = self._rng.random() < self.slow_rate
+        failed = self._rng.random() < self.error_rate
+        return self.first_token_latency + (self.slow_latency if slow else 0.0), failed
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        delay, failed = self._fault()
+        time.sleep(delay)
+        if failed:
+            raise InjectedError("injected failure")
+        time.sleep(self.token_latency * max(0, len(tokens) - 1))
+        text = "".join(tokens)
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, tokens), response_metadata=self._metadata())
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        tokens = self._tokens(messages)
+        delay, failed = self._fault()
+        time.sleep(delay)
+        if failed:
+            raise InjectedError("injected failure")
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_latency)
+            last = i == len(tokens) - 1
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=token,
+                usage_metadata=self._usage(messages, tokens) if last else None,
+                response_metadata=self._metadata() if last else {},
+            ))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        delay, failed = self._fault()
+        await asyncio.sleep(delay)
+        if failed:
+            raise InjectedError("injected failure")
+        await asyncio.sleep(self.token_latency * max(0, len(tokens) - 1))
+        message = AIMessage(content="".join(tokens), usage_metadata=self._usage(messages, tokens), response_metadata=self._metadata())
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._tokens(messages)
+        delay, failed = self._fault()
+        await asyncio.sleep(delay)
+        if failed:
+            raise InjectedError("injected failure")
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            last = i == len(tokens) - 1
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=token,
+                usage_metadata=self._usage(messages, tokens) if last else None,
+                response_metadata=self._metadata() if last else {},
+            ))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def _metadata(self) -> dict:
+        return {"model_name": self.model_name}
+
+    @staticmethod
+    def _usage(messages: List[BaseMessage], tokens: List[str]) -> dict:
+        # Words and punctuation marks, roughly what a BPE tokenizer sees
+        count = lambda text: len(re.findall(r"\w+|[^\w\s]", text))
+        prompt = sum(count(str(m.content)) for m in messages)
+        completion = count("".join(tokens))
+        return {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+
+
+def factory(**kwargs: Any) -> Callable[[str], FakeChatModel]:
+    """runtime.set_llm_factory-compatible factory: one FakeChatModel per model name."""
+    return lambda model: FakeChatModel(model_name=model, **kwargs)
@@ -1,6 +1,14 @@
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
-from state import GraphState
-from nodes import onboarding_node, planning_node, coaching_node
+from langgraph.types import Send
+from state import GraphState, PlanState
+from nodes import (
+    onboarding_node, coaching_node, aonboarding_node, acoaching_node,
+    plan_outline_node, aplan_outline_node, expand_stage_node, aexpand_stage_node,
+    assemble_plan_node, stage_tasks,
+)
+from memory import memory_node
+from runtime import get_metrics, get_recorder
 
 def route_after_onboarding(state: GraphState) -> str:
     """After onboarding, check if we should plan or coach."""
@@ -23,13 +31,48 @@ def route_coaching(state: GraphState) -> str:
     # When status is coaching, end the graph and wait for next user input
     return "end"
 
-def build_graph():
+def route_stage_expansion(state: PlanState):
+    """Fan out one expand_stage per outlined stage; a plan made in one call is already done."""
+    tasks = stage_tasks(state)
+    if not tasks:
+        return END
+    return [Send("expand_stage", task) for task in tasks]
+
+def build_planning_graph():
+    """
+    Planning as map-reduce: a short call outlines the stages (names, goals,
+    features), every stage's details are expanded concurrently via Send, and
+    `assemble` reduces them back into state["stages"]. Replans and
+    PLAN_FANOUT=off finish in the outline step with a single call.
+    """
+    workflow = StateGraph(PlanState)
+    workflow.add_node("outline", RunnableLambda(plan_outline_node, afunc=aplan_outline_node, name="outline"))
+    workflow.add_node("expand_stage", RunnableLambda(expand_stage_node, afunc=aexpand_stage_node, name="expand_stage"))
+    workflow.add_node("assemble", assemble_plan_node)
+
+    workflow.add_edge(START, "outline")
+    workflow.add_conditional_edges("outline", route_stage_expansion, ["expand_stage", END])
+    workflow.add_edge("expand_stage", "assemble")
+    workflow.add_edge("assemble", END)
+    return workflow.compile()
+
+def build_graph(checkpointer=None):
+    """
+    Compile the coach graph; with a checkpointer, state persists per `thread_id`.
+    LLM nodes carry sync and async implementations, so the same graph serves
+    invoke/stream (blocking calls) and ainvoke/astream (awaited calls). Async
+    runs need an async-capable checkpointer (checkpoints.open_async_checkpointer).
+    Planning is a subgraph (build_planning_graph); it shares the checkpointer.
+    Runs report node, model and retrieval timings to runtime.get_metrics(),
+    and with SESSION_RECORD set each turn is recorded (recorder.py).
+    """
     workflow = StateGraph(GraphState)
     
     # Add nodes
-    workflow.add_node("onboarding", onboarding_node)
-    workflow.add_node("planning", planning_node)
-    workflow.add_node("coaching", coaching_node)
+    workflow.add_node("onboarding", RunnableLambda(onboarding_node, afunc=aonboarding_node, name="onboarding"))
+    workflow.add_node("planning", build_planning_graph())
+    workflow.add_node("coaching", RunnableLambda(coaching_node, afunc=acoaching_node, name="coaching"))
+    workflow.add_node("memory", memory_node)
     
     # Define flow
     workflow.add_edge(START, "onboarding")
@@ -41,16 +84,21 @@ def build_graph():
     workflow.add_conditional_edges(
         "planning",
         route_after_planning,
-        {"end": END}
+        {"end": "memory"}
     )
     workflow.add_conditional_edges(
         "coaching",
         route_coaching,
         {
             "planning": "planning",
-            "end": END,
-            "finished": END
+            "end": "memory",
+            "finished": "memory"
         }
     )
+    # Every turn ends by folding old turns into the rolling summary
+    workflow.add_edge("memory", END)
     
-    return workflow.compile()
+    graph = workflow.compile(checkpointer=checkpointer)
+    metrics, recorder = get_metrics(), get_recorder()
+    callbacks = [handler for handler, on in ((metrics.callback, metrics.enabled), (recorder, recorder.enabled)) if on]
+    return graph.with_config(callbacks=callbacks) if callbacks else graph
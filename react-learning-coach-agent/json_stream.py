@@ -0,0 +1,180 @@
+"""
+Tolerant, incremental JSON for model output.
+
+`repair_json(text)` parses a reply that may be wrapped in code fences or
+prose, have trailing commas, or be cut off mid-way (open strings, arrays
+and objects are closed, a dangling key or partial value is dropped, down to
+an empty container if need be).
+
+`ArrayItemStream(key)` is fed the reply chunk by chunk while it streams and
+returns each element of the array under `key` (e.g. "stages") as soon as
+that element's closing brace arrives. Arrays anywhere else (in prose before
+the JSON, or under other keys) are ignored.
+"""
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+_TRAILING_COMMA = re.compile(r'("(?:\\.|[^"\\])*")|,(\s*[}\]])', re.DOTALL)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _scan(text: str) -> Tuple[Optional[int], List[str], bool]:
+    """(end of the first complete value or None, open containers, inside a string) for JSON text."""
+    stack: List[str] = []
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return i + 1, stack, False
+    return None, stack, in_string
+
+
+def _strip_trailing_commas(text: str) -> str:
+    return _TRAILING_COMMA.sub(lambda m: m.group(1) or m.group(2), text)
+
+
+def _close(text: str) -> str:
+    """Make a truncated document well-formed: end the open string, drop dangling tokens, close containers."""
+    _, stack, in_string = _scan(text)
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    if text.endswith(":"):
+        # `"key":` still waiting for its value
+        text = re.sub(r'"(?:\\.|[^"\\])*"\s*:$', "", text)
+    elif stack and stack[-1] == "{" and re.search(r'[{,]\s*"(?:\\.|[^"\\])*"$', text):
+        # A key with no colon yet (a string right after `{` or `,` in an object)
+        text = re.sub(r'"(?:\\.|[^"\\])*"$', "", text)
+    text = text.rstrip().rstrip(",")
+    return text + "".join(_CLOSERS[c] for c in reversed(stack))
+
+
+def _last_break(text: str) -> int:
+    """Index of the last comma or opening bracket outside strings, or -1."""
+    last, in_string, escape = -1, False, False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in ",{[":
+            last = i
+    return last
+
+
+def repair_json(text: str) -> Any:
+    """
+    Parse the first JSON object/array in `text`, repairing common damage.
+    Raises ValueError if nothing usable is found.
+    """
+    # Anything before the first bracket (prose, a ```json fence) is skipped; so is anything after the value.
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("no JSON object or array in text")
+    text = text[min(starts):]
+    end, _, _ = _scan(text)
+    if end is not None:
+        try:
+            return json.loads(_strip_trailing_commas(text[:end]))
+        except json.JSONDecodeError:
+            text = text[:end - 1]  # damaged inside; treat as truncated before the final closer
+
+    # Truncated: close it, and if a partial value still breaks it, back off to the
+    # previous comma, or to just after the bracket the value started in (`{"a": tru` -> `{}`).
+    candidate = text
+    while candidate:
+        try:
+            return json.loads(_strip_trailing_commas(_close(candidate)))
+        except json.JSONDecodeError:
+            cut = _last_break(candidate)
+            if cut < 0:
+                break
+            keep = cut + 1 if candidate[cut] in "{[" and cut + 1 < len(candidate) else cut
+            candidate = candidate[:keep]
+    raise ValueError("could not repair JSON")
+
+
+class ArrayItemStream:
+    """Incrementally extract complete elements of the array under `key` from streamed JSON text."""
+
+    def __init__(self, key: str = "stages"):
+        self.key = key
+        self.text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._colon_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self.items: List[Any] = []
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Add streamed text; returns the elements completed by it."""
+        self.text += chunk
+        done: List[Any] = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+                continue
+            if ch == '"':
+                self._in_string, self._string_start = True, i
+            elif ch == ":":
+                self._colon_key = self._last_string
+            elif ch in "{[":
+                self._stack.append(ch)
+                depth = len(self._stack)
+                if ch == "[" and self._array_depth is None and self._colon_key == self.key:
+                    self._array_depth = depth
+                elif ch == "{" and self._array_depth is not None and depth == self._array_depth + 1:
+                    self._item_start = i
+                self._colon_key = None
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                depth = len(self._stack)
+                if ch == "}" and self._item_start is not None and depth == self._array_depth:
+                    try:
+                        done.append(repair_json(text[self._item_start:i + 1]))
+                    except ValueError:
+                        pass
+                    self._item_start = None
+                elif ch == "]" and self._array_depth is not None and depth == self._array_depth - 1:
+                    self._array_depth = -1  # array finished; ignore later arrays
+            elif ch == ",":
+                self._colon_key = None
+        self._pos = len(text)
+        self.items.extend(done)
+        return done
+
+    def result(self) -> Any:
+        """The whole (repaired) document once streaming has ended."""
+        return repair_json(self.text)
@@ -0,0 +1,219 @@
+"""
+Content-addressed cache for chat completions.
+
+Keys are a SHA-256 over the normalized (model, messages, params). Lookups
+go to an in-memory LRU first, then to a SQLite file shared by every
+process on the machine, which expires entries by TTL and evicts the least
+recently used ones once it grows past its size budget. The file's total
+size is kept in a one-row table by triggers, so a store never scans it,
+and hits (memory ones too) mark entries used in batched updates.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+CACHE_DB = os.getenv(
+    "LLM_CACHE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".llm_cache.sqlite")
+)
+MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 86400)))
+MAX_DISK_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+TOUCH_BATCH = 64  # hits buffered before their `accessed` times are written
+TOUCH_SECONDS = 5.0  # ... or once the oldest buffered hit is this old
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS responses ("
+    " key TEXT PRIMARY KEY, content TEXT NOT NULL, size INTEGER NOT NULL,"
+    " created REAL NOT NULL, accessed REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)",
+    "CREATE INDEX IF NOT EXISTS responses_created ON responses (created)",
+    "CREATE TABLE IF NOT EXISTS responses_size (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)",
+    # Seeded once from the existing rows, then kept current by the triggers
+    "INSERT OR IGNORE INTO responses_size (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM responses",
+    "CREATE TRIGGER IF NOT EXISTS responses_size_insert AFTER INSERT ON responses"
+    " BEGIN UPDATE responses_size SET bytes = bytes + NEW.size; END",
+    "CREATE TRIGGER IF NOT EXISTS responses_size_update AFTER UPDATE OF size ON responses"
+    " BEGIN UPDATE responses_size SET bytes = bytes + NEW.size - OLD.size; END",
+    "CREATE TRIGGER IF NOT EXISTS responses_size_delete AFTER DELETE ON responses"
+    " BEGIN UPDATE responses_size SET bytes = bytes - OLD.size; END",
+)
+
+
+def _normalize(text: Any) -> str:
+    if not isinstance(text, str):
+        text = json.dumps(text, sort_keys=True, default=str)
+    return " ".join(text.split())
+
+
+def cache_key(model: str, messages: List[Any], params: Optional[Dict[str, Any]] = None) -> str:
+    """Whitespace-insensitive hash of what determines a completion."""
+    payload = {
+        "model": model,
+        "messages": [(m.type, _normalize(m.content)) for m in messages],
+        "params": params or {},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-level (LRU memory + SQLite disk) cache of completion text, with hit/miss stats per node."""
+
+    def __init__(
+        self,
+        path: Optional[str] = CACHE_DB,
+        memory_entries: int = MEMORY_ENTRIES,
+        ttl_seconds: float = TTL_SECONDS,
+        max_disk_bytes: int = MAX_DISK_BYTES,
+    ):
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._touched: Dict[str, float] = {}
+        self._touched_since = 0.0
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # One transaction, so another process never sees the size row without its triggers
+            with self._transaction():
+                for statement in _SCHEMA:
+                    self._conn.execute(statement)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def get(self, key: str, node: str = "default") -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                self._memory.move_to_end(key)
+                self._touch(key, now)
+                self._stats[node]["memory_hits"] += 1
+                return entry[0]
+            if entry is not None:
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT content, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] + self.ttl_seconds > now:
+                    self._remember(key, row[0], row[1] + self.ttl_seconds)
+                    self._touch(key, now)
+                    self._stats[node]["disk_hits"] += 1
+                    return row[0]
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+            self._stats[node]["misses"] += 1
+            return None
+
+    def has(self, key: str) -> bool:
+        """Whether `key` has a live entry; unlike get() it records no hit or miss and touches nothing."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                return True
+            if self._conn is None:
+                return False
+            row = self._conn.execute("SELECT created FROM responses WHERE key = ?", (key,)).fetchone()
+            return row is not None and row[0] + self.ttl_seconds > now
+
+    def put(self, key: str, content: str, node: str = "default") -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, content, now + self.ttl_seconds)
+            self._stats[node]["stores"] += 1
+            if self._conn is not None:
+                self._touched.pop(key, None)
+                with self._transaction():
+                    # An upsert, not INSERT OR REPLACE: REPLACE's implicit delete skips the size trigger
+                    self._conn.execute(
+                        "INSERT INTO responses (key, content, size, created, accessed) VALUES (?, ?, ?, ?, ?)"
+                        " ON CONFLICT (key) DO UPDATE SET content = excluded.content, size = excluded.size,"
+                        " created = excluded.created, accessed = excluded.accessed",
+                        (key, content, len(content.encode("utf-8")), now, now),
+                    )
+                    self._flush_touched()
+                    self._evict_disk(now)
+
+    def _remember(self, key: str, content: str, expires_at: float) -> None:
+        self._memory[key] = (content, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _touch(self, key: str, now: float) -> None:
+        """Record a hit on `key` for the disk LRU; written in batches, not per hit."""
+        if self._conn is None:
+            return
+        if not self._touched:
+            self._touched_since = now
+        self._touched[key] = now
+        if len(self._touched) >= TOUCH_BATCH or now - self._touched_since >= TOUCH_SECONDS:
+            with self._transaction():
+                self._flush_touched()
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET accessed = ? WHERE key = ?", [(t, k) for k, t in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _evict_disk(self, now: float) -> None:
+        self._conn.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT bytes FROM responses_size").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            victims.append((key,))
+            freed += size
+            if total - freed <= self.max_disk_bytes:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self._stats["_cache"]["evictions"] += len(victims)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per node plus totals and hit rate."""
+        with self._lock:
+            by_node = {node: dict(counts) for node, counts in self._stats.items() if node != "_cache"}
+            totals: Dict[str, int] = defaultdict(int)
+            for counts in by_node.values():
+                for name, value in counts.items():
+                    totals[name] += value
+            lookups = totals["memory_hits"] + totals["disk_hits"] + totals["misses"]
+            return {
+                "by_node": by_node,
+                "totals": dict(totals),
+                "hit_rate": (totals["memory_hits"] + totals["disk_hits"]) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "evictions": self._stats["_cache"]["evictions"],
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
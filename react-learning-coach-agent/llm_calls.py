@@ -0,0 +1,326 @@
+"""
+Single entry point for the nodes' and tools' chat model calls.
+
+`call_llm(node, messages)` checks the shared response cache before going
+to the model. Nodes opt out per call (cache=False) or by name through
+LLM_CACHE_DISABLED_NODES (comma-separated); LLM_CACHE=off disables it.
+
+Inside a graph run, replies of STREAMED_NODES reach `stream_mode="messages"`
+consumers token by token; JSON-producing calls are tagged nostream.
+`emit_text` sends display text (headers, cached replies) on the "custom" stream.
+Replies generated ahead of time by the prefetcher (prefetch.py) are taken
+by request key before the model is called, and a request identical to one
+already in flight joins it instead of calling the model again
+(singleflight.py). Which model a node calls, with what max tokens, comes
+from the model router (model_router.py), which is told each call's latency
+so slow tiers can be fallen back from.
+Model requests run under the turn deadline with retries, hedging and a
+circuit breaker (resilience.py); when the model can't answer, nodes get a
+degraded reply (DEGRADED_REPLIES, empty for the JSON nodes, whose parsers
+fall back to local defaults) that is never cached.
+`acall_llm` is the same for the async nodes.
+"""
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage
+from langgraph.config import get_config, get_stream_writer
+from langgraph.constants import TAG_NOSTREAM
+
+from llm_cache import cache_key
+from resilience import BackendUnavailable, StreamBroken, Superseded
+from runtime import get_llm, get_prefetcher, get_resilience, get_response_cache, get_router, get_single_flight
+
+CACHE_ENABLED = os.getenv("LLM_CACHE", "on").lower() not in ("0", "off", "false", "no")
+CACHE_DISABLED_NODES = {n.strip() for n in os.getenv("LLM_CACHE_DISABLED_NODES", "").split(",") if n.strip()}
+# Free-text replies shown to the learner; everything else is JSON the nodes parse.
+STREAMED_NODES = {"exercises", "coaching"}
+# Shown when the model is unavailable (breaker open, turn deadline passed)
+DEGRADED_REPLIES = {
+    "coaching": (
+        "⚠️ The coach's model isn't answering right now, so this is the short version: keep working "
+        "through this stage's tasks with the linked docs, and send `continue` again in a minute for the full guide."
+    ),
+    "exercises": (
+        "⚠️ The coach's model isn't answering right now, so no new exercises yet. Redo this stage's "
+        "tasks from memory, without looking at your code, then ask for `exercises` again in a minute."
+    ),
+}
+
+
+def graph_node(metadata: dict) -> str:
+    """The top-level graph node a run belongs to (e.g. "planning" for its subgraph's nodes)."""
+    namespace = metadata.get("langgraph_checkpoint_ns", "")
+    return namespace.split("|")[0].split(":")[0] or metadata.get("langgraph_node", "")
+
+
+def emit_text(text: str, reply: bool = False) -> None:
+    """Stream display text to stream_mode="custom" consumers; no-op outside a graph run."""
+    try:
+        writer = get_stream_writer()
+        node = graph_node(get_config().get("metadata", {}))
+    except RuntimeError:
+        return
+    writer({"type": "text", "node": node, "text": text, "reply": reply})
+
+
+def _model_params(llm: Any) -> dict:
+    params = dict(getattr(llm, "_identifying_params", {}) or {})
+    model = params.pop("model_name", None) or params.pop("model", None) or type(llm).__name__
+    return {"model": str(model), "params": params}
+
+
+def uses_cache(node: str) -> bool:
+    return CACHE_ENABLED and node not in CACHE_DISABLED_NODES
+
+
+def request_key(llm: Any, messages: List[Any], max_tokens: Optional[int] = None) -> str:
+    """What identifies a request to `llm`: the cache key of its model, messages and parameters."""
+    ident = _model_params(llm)
+    params = {**ident["params"], "max_tokens": max_tokens} if max_tokens else ident["params"]
+    return cache_key(ident["model"], messages, params)
+
+
+def model_kwargs(route: Any) -> dict:
+    """Per-call model arguments from a route (max_tokens when the node declares one)."""
+    return {"max_tokens": route.max_tokens} if route.max_tokens else {}
+
+
+def _prepare(node: str, messages: List[Any], cache: bool) -> Tuple[Any, Any, dict, Optional[str]]:
+    """The route, client, run config and cache key (None when caching is off) for one call."""
+    route = get_router().route(node)
+    llm = get_llm(route.model)
+    streamed = node in STREAMED_NODES
+    config = {"tags": [f"coach:{node}"] if streamed else [f"coach:{node}", TAG_NOSTREAM]}
+    if not (cache and uses_cache(node)):
+        return route, llm, config, None
+    return route, llm, config, request_key(llm, messages, route.max_tokens)
+
+
+def _cached(node: str, key: Optional[str]) -> Optional[AIMessage]:
+    if key is None:
+        return None
+    content = get_response_cache().get(key, node)
+    if content is None:
+        return None
+    if node in STREAMED_NODES:
+        emit_text(content, reply=True)
+    return AIMessage(content=content, response_metadata={"cache_hit": True})
+
+
+def _prefetched(node: str, key: Optional[str], content: Optional[str]) -> Optional[AIMessage]:
+    if content is None:
+        return None
+    if node in STREAMED_NODES:
+        emit_text(content, reply=True)
+    resp = AIMessage(content=content, response_metadata={"prefetched": True})
+    _store(node, key, resp)
+    return resp
+
+
+def _prefetch_key(route: Any, llm: Any, messages: List[Any], key: Optional[str]) -> Optional[str]:
+    """The request key to look up in the prefetcher, None when nothing is prefetched."""
+    if not get_prefetcher().has_pending():
+        return None
+    return key or request_key(llm, messages, route.max_tokens)
+
+
+def _flight_key(route: Any, llm: Any, messages: List[Any], key: Optional[str]) -> Optional[str]:
+    """The request key identical in-flight calls share, None when coalescing is off."""
+    if not get_single_flight().enabled:
+        return None
+    return key or request_key(llm, messages, route.max_tokens)
+
+
+def _joined(node: str, resp: AIMessage, on_token: Optional[Callable[[str], None]]) -> AIMessage:
+    """Another caller's reply to the same request, delivered whole like a cached one."""
+    if node in STREAMED_NODES:
+        emit_text(resp.content, reply=True)
+    if on_token is not None:
+        on_token(resp.content)
+    return AIMessage(content=resp.content, response_metadata={"coalesced": True})
+
+
+def _store(node: str, key: Optional[str], resp: Any) -> None:
+    if key is not None and isinstance(resp.content, str) and resp.content:
+        get_response_cache().put(key, resp.content, node)
+
+
+def _message(chunk: Any) -> AIMessage:
+    """The AIMessage a streamed call adds up to."""
+    if chunk is None:
+        return AIMessage(content="")
+    return AIMessage(
+        content=chunk.content, response_metadata=chunk.response_metadata, usage_metadata=chunk.usage_metadata
+    )
+
+
+class _Reply:
+    """Which attempt of a call is streaming its reply: the first to produce a token; the others stop."""
+
+    def __init__(self, on_token: Optional[Callable[[str], None]]):
+        self.on_token = on_token
+        self.owner: Optional[object] = None
+        self._lock = threading.Lock()
+
+    def forward(self, attempt: object, text: str) -> None:
+        with self._lock:
+            if self.owner is None:
+                self.owner = attempt
+        if self.owner is not attempt:
+            raise Superseded()
+        if self.on_token is not None:
+            self.on_token(text)
+
+    def failed(self, attempt: object, exc: Exception) -> Exception:
+        """What a failed attempt raises: StreamBroken (not retried) once part of its reply was shown."""
+        return StreamBroken(f"reply broke off: {exc!r}") if self.owner is attempt else exc
+
+
+def _reply_for(node: str, on_token: Optional[Callable[[str], None]]) -> Optional[_Reply]:
+    """Calls whose tokens someone sees (on_token, or messages-mode streaming) are streamed and tracked."""
+    return _Reply(on_token) if on_token is not None or node in STREAMED_NODES else None
+
+
+def _attempt(llm: Any, messages: List[Any], config: dict, route: Any,
+             reply: Optional[_Reply]) -> Callable[[threading.Event], AIMessage]:
+    """One request to the model, as resilience.Resilience.call runs it."""
+    kwargs = model_kwargs(route)
+    if reply is None:
+        return lambda cancelled: llm.invoke(messages, config=config, **kwargs)
+
+    def run(cancelled: threading.Event) -> AIMessage:
+        me, full = object(), None
+        try:
+            for chunk in llm.stream(messages, config=config, **kwargs):
+                if cancelled.is_set():
+                    raise Superseded()
+                full = chunk if full is None else full + chunk
+                if isinstance(chunk.content, str) and chunk.content:
+                    reply.forward(me, chunk.content)
+        except Superseded:
+            raise
+        except Exception as exc:
+            raise reply.failed(me, exc) from exc
+        return _message(full)
+
+    return run
+
+
+def _aattempt(llm: Any, messages: List[Any], config: dict, route: Any,
+              reply: Optional[_Reply]) -> Callable[[], Awaitable[AIMessage]]:
+    kwargs = model_kwargs(route)
+    if reply is None:
+        return lambda: llm.ainvoke(messages, config=config, **kwargs)
+
+    async def run() -> AIMessage:
+        me, full = object(), None
+        try:
+            async for chunk in llm.astream(messages, config=config, **kwargs):
+                full = chunk if full is None else full + chunk
+                if isinstance(chunk.content, str) and chunk.content:
+                    reply.forward(me, chunk.content)
+        except Superseded:
+            raise
+        except Exception as exc:
+            raise reply.failed(me, exc) from exc
+        return _message(full)
+
+    return run
+
+
+def _degraded(node: str, exc: Exception, on_token: Optional[Callable[[str], None]]) -> AIMessage:
+    """The local reply served when the model can't answer; not cached, and not told to the router."""
+    get_resilience().count("degraded")
+    content = DEGRADED_REPLIES.get(node, "")
+    if content:
+        if node in STREAMED_NODES:
+            emit_text(content, reply=True)
+        if on_token is not None:
+            on_token(content)
+    return AIMessage(content=content, response_metadata={"degraded": True, "reason": type(exc).__name__})
+
+
+def call_llm(node: str, messages: List[Any], cache: bool = True,
+             on_token: Optional[Callable[[str], None]] = None) -> AIMessage:
+    """
+    Invoke the chat model routed for `node` (onboarding, planning, stage_details,
+    replanning, exercises, code_review, coaching, summary), serving identical requests from the cache.
+    With `on_token` the reply is streamed and each piece passed to it as it
+    arrives (a cached or prefetched reply arrives as one piece), e.g. to parse JSON early.
+    """
+    route, llm, config, key = _prepare(node, messages, cache)
+    hit = _cached(node, key)
+    if hit is None:
+        prefetch_key = _prefetch_key(route, llm, messages, key)
+        if prefetch_key is not None:
+            hit = _prefetched(node, key, get_prefetcher().take(prefetch_key))
+    if hit is not None:
+        if on_token is not None:
+            on_token(hit.content)
+        return hit
+    attempt = _attempt(llm, messages, config, route, _reply_for(node, on_token))
+
+    def model_call() -> AIMessage:
+        start = time.perf_counter()
+        # Not hedged: a duplicate request of a streamed node would stream its tokens to the learner too
+        resp = get_resilience().call(node, route.model, attempt, hedge=node not in STREAMED_NODES)
+        get_router().observe(route, time.perf_counter() - start, getattr(resp, "usage_metadata", None))
+        # Stored before the flight ends, so a request arriving just after it finds the cache
+        _store(node, key, resp)
+        return resp
+
+    try:
+        resp, led = get_single_flight().do(_flight_key(route, llm, messages, key), node, model_call)
+    except BackendUnavailable as exc:
+        return _degraded(node, exc, on_token)
+    return resp if led else _joined(node, resp, on_token)
+
+
+async def acall_llm(node: str, messages: List[Any], cache: bool = True,
+                    on_token: Optional[Callable[[str], None]] = None) -> AIMessage:
+    """Async call_llm: awaits `ainvoke`, so the event loop serves other sessions meanwhile."""
+    route, llm, config, key = _prepare(node, messages, cache)
+    hit = _cached(node, key)
+    if hit is None:
+        prefetch_key = _prefetch_key(route, llm, messages, key)
+        if prefetch_key is not None:
+            hit = _prefetched(node, key, await get_prefetcher().atake(prefetch_key))
+    if hit is not None:
+        if on_token is not None:
+            on_token(hit.content)
+        return hit
+    attempt = _aattempt(llm, messages, config, route, _reply_for(node, on_token))
+
+    async def model_call() -> AIMessage:
+        start = time.perf_counter()
+        resp = await get_resilience().acall(node, route.model, attempt, hedge=node not in STREAMED_NODES)
+        get_router().observe(route, time.perf_counter() - start, getattr(resp, "usage_metadata", None))
+        _store(node, key, resp)
+        return resp
+
+    try:
+        resp, led = await get_single_flight().ado(_flight_key(route, llm, messages, key), node, model_call)
+    except BackendUnavailable as exc:
+        return _degraded(node, exc, on_token)
+    return resp if led else _joined(node, resp, on_token)
+
+
+async def agenerate(node: str, messages: List[Any], route: Any, llm: Any, config: dict) -> AIMessage:
+    """
+    A background request (prefetch.py): under the resilience layer, told to
+    the router, and joining an identical call in flight like acall_llm, but
+    not cached, streamed or degraded; BackendUnavailable reaches the caller.
+    """
+    attempt = _aattempt(llm, messages, config, route, None)
+
+    async def model_call() -> AIMessage:
+        start = time.perf_counter()
+        resp = await get_resilience().acall(node, route.model, attempt)
+        get_router().observe(route, time.perf_counter() - start, getattr(resp, "usage_metadata", None))
+        return resp
+
+    resp, _ = await get_single_flight().ado(_flight_key(route, llm, messages, None), node, model_call)
+    return resp
@@ -3,16 +3,18 @@
 React Learning Coach: Interactive CLI for React/TypeScript project learning.
 """
 
-from dotenv import load_dotenv
-from typing import Dict, Any
+import argparse
+from typing import Dict, Any, Optional
 from pathlib import Path
 
-load_dotenv()
+import runtime
+from streaming import TurnStream
+
+runtime.load_env()
 
 from langchain_core.messages import HumanMessage
 from yaspin import yaspin
 from yaspin.spinners import Spinners
-from graph import build_graph
 
 def print_header() -> None:
     """Application header."""
@@ -53,6 +55,7 @@ def create_initial_state() -> Dict[str, Any]:
     """Clean initial state."""
     return {
         "messages": [],
+        "summary": "",
         "learner_profile": {},
         "project_spec": {"features": []},
         "stages": [],
@@ -60,24 +63,72 @@ def create_initial_state() -> Dict[str, Any]:
         "status": "onboarding",
     }
 
-def print_new_ai_messages(state: Dict[str, Any], last_count: int) -> int:
-    """Print new AI messages only."""
-    new_msgs = state["messages"][last_count:]
-    for msg in new_msgs:
+def print_new_ai_messages(state: Dict[str, Any]) -> None:
+    """Print the AI replies to the latest user message (older turns may have been compacted)."""
+    messages = state["messages"]
+    last_human = max((i for i, m in enumerate(messages) if m.type == "human"), default=-1)
+    for msg in messages[last_human + 1:]:
         if msg.type == "ai":
             print(f"\n{msg.content}\n")
             print("-" * 70 + "\n")
-    return len(state["messages"])
 
-def main() -> None:
-    """Main CLI loop."""
+def turn_input(graph, config: Dict[str, Any], user_input: str) -> Dict[str, Any]:
+    """Only the new message for an existing thread; the full initial state for a new one."""
+    message = HumanMessage(content=user_input)
+    if graph.get_state(config).values:
+        return {"messages": [message]}
     state = create_initial_state()
-    
+    state["messages"].append(message)
+    return state
+
+def run_turn(graph, config: Dict[str, Any], user_input: str, show_timing: bool = False) -> Dict[str, Any]:
+    """Stream the coach's replies, model output and fixed text alike, as the turn produces them."""
+    session = config["configurable"]["thread_id"]
+    runtime.get_prefetcher().on_input(session, user_input)
+    stream = TurnStream(graph, turn_input(graph, config, user_input), config)
+    spinner = yaspin(Spinners.dots12, text="🤔 Coach is thinking...")
+    spinner.start()
+    streaming = False
+    try:
+        for _, text in stream:
+            if not streaming:
+                spinner.stop()
+                print()
+                streaming = True
+            print(text, end="", flush=True)
+    finally:
+        if not streaming:
+            spinner.ok("✓ ")
+
+    if streaming:
+        print("\n")
+        print("-" * 70 + "\n")
+    # Generate the likely next commands while the learner reads this reply
+    runtime.get_prefetcher().schedule(session, stream.state)
+    if show_timing:
+        ttft = f"{stream.ttft:.2f}s" if stream.ttft is not None else "n/a"
+        print(f"⏱️  first token {ttft} · turn {stream.elapsed:.2f}s\n")
+    return stream.state
+
+def main(session_id: Optional[str] = None, show_timing: bool = False) -> None:
+    """Main CLI loop."""
+    from checkpoints import new_thread_id, thread_config
+
+    thread_id = session_id or new_thread_id()
+    config = thread_config(thread_id)
+
+    # Graph compile and client setup happen while the user types the first message.
+    runtime.warm_up()
+
     print_header()
-    print("What would you like to build? (e.g., 'a todo app with TypeScript')\n")
+    print(f"📁 Session: {thread_id} (resume with `python main.py --session {thread_id}`)\n")
 
-    last_count = 0
-    first_run = True
+    state = runtime.get_graph().get_state(config).values if session_id else {}
+    if state.get("messages"):
+        print("Resuming where you left off:")
+        print_new_ai_messages(state)
+    else:
+        print("What would you like to build? (e.g., 'a todo app with TypeScript')\n")
 
     while True:
         user_input = input("You: ").strip()
@@ -85,23 +136,19 @@ def main() -> None:
             continue
 
         if user_input.lower() in ("quit", "exit", "q"):
-            print("\n✅ Happy coding! Keep learning and building! 🚀\n")
+            print(f"\n✅ Happy coding! Keep learning and building! 🚀 (session {thread_id})\n")
             break
 
         if user_input.lower() == "help":
             print_help()
             continue
 
-        state["messages"].append(HumanMessage(content=user_input))
-
         # FIXED: Always use FULL GRAPH - no manual routing
-        with yaspin(Spinners.dots12, text="🤔 Coach is thinking...") as spinner:
-            graph = build_graph()
-            state = graph.invoke(state)
-            spinner.ok("✓ ")
-
-        last_count = print_new_ai_messages(state, last_count)
-        first_run = False
+        run_turn(runtime.get_graph(), config, user_input, show_timing)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="React Learning Coach CLI")
+    parser.add_argument("--session", help="resume a saved session by id")
+    parser.add_argument("--timing", action="store_true", help="show time to first token per turn")
+    args = parser.parse_args()
+    main(args.session, args.timing)
@@ -0,0 +1,107 @@
+"""
+Bounded conversation memory: the last N turns stay verbatim in
+state["messages"], older turns are folded into state["summary"], so a
+session's footprint stays roughly constant however long it runs.
+HISTORY_SUMMARIZER picks how turns are folded: local (the default, no model
+call) or llm (the "summary" route of model_router.py).
+"""
+import os
+from typing import Any, Callable, Dict, List
+
+from langchain_core.messages import BaseMessage, RemoveMessage
+
+MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "6"))
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "2000"))
+HISTORY_SUMMARIZER = os.getenv("HISTORY_SUMMARIZER", "local").lower()
+LINE_CHARS = 120
+
+Summarizer = Callable[[str, List[BaseMessage]], str]
+
+
+def _first_line(text: str) -> str:
+    line = next((l.strip() for l in text.splitlines() if l.strip()), "")
+    return line if len(line) <= LINE_CHARS else line[:LINE_CHARS - 1] + "…"
+
+
+def local_summarizer(summary: str, messages: List[BaseMessage]) -> str:
+    """
+    Append one line per folded message (the user's text, the coach's
+    heading) and drop the oldest lines past SUMMARY_MAX_CHARS. No LLM call.
+    """
+    lines = summary.splitlines() if summary else []
+    for msg in messages:
+        who = "Learner" if msg.type == "human" else "Coach"
+        lines.append(f"- {who}: {_first_line(msg.content)}")
+    while lines and sum(len(l) + 1 for l in lines) > SUMMARY_MAX_CHARS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def llm_summarizer(summary: str, messages: List[BaseMessage]) -> str:
+    """Fold messages into the summary with the chat model (one extra call per fold)."""
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from llm_calls import call_llm
+
+    transcript = "\n".join(f"{m.type}: {m.content}" for m in messages)
+    resp = call_llm("summary", [
+        SystemMessage(content=(
+            "Update the running summary of a React coaching session. Keep the learner's goals, "
+            f"progress, struggles and decisions. Max {SUMMARY_MAX_CHARS} characters, plain bullets."
+        )),
+        HumanMessage(content=f"Summary so far:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"),
+    ], cache=False)
+    if resp.response_metadata.get("degraded"):
+        # Model unavailable: fold locally rather than replace the summary with nothing
+        return local_summarizer(summary, messages)
+    return resp.content.strip()[:SUMMARY_MAX_CHARS]
+
+
+def split_turns(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group messages into turns, each starting at a human message."""
+    turns: List[List[BaseMessage]] = []
+    for msg in messages:
+        if msg.type == "human" or not turns:
+            turns.append([])
+        turns[-1].append(msg)
+    return turns
+
+
+class HistoryManager:
+    """Keeps the last `max_turns` turns verbatim and summarizes the rest."""
+
+    def __init__(self, max_turns: int = MAX_TURNS, summarizer: Summarizer = local_summarizer):
+        self.max_turns = max(1, max_turns)
+        self.summarizer = summarizer
+
+    def compact(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """State update removing old turns (via RemoveMessage) and extending the summary; {} if nothing to do."""
+        turns = split_turns(state.get("messages", []))
+        if len(turns) <= self.max_turns:
+            return {}
+        folded = [msg for turn in turns[:-self.max_turns] for msg in turn]
+        return {
+            "messages": [RemoveMessage(id=msg.id) for msg in folded],
+            "summary": self.summarizer(state.get("summary", ""), folded),
+        }
+
+
+def memory_stats(state: Dict[str, Any]) -> Dict[str, int]:
+    """Per-session memory accounting for the conversation part of the state."""
+    messages = state.get("messages", [])
+    summary = state.get("summary", "")
+    message_bytes = sum(len(str(m.content).encode("utf-8")) for m in messages)
+    return {
+        "messages": len(messages),
+        "turns": len(split_turns(messages)),
+        "message_bytes": message_bytes,
+        "summary_bytes": len(summary.encode("utf-8")),
+        "total_bytes": message_bytes + len(summary.encode("utf-8")),
+    }
+
+
+_history = HistoryManager(summarizer=llm_summarizer if HISTORY_SUMMARIZER == "llm" else local_summarizer)
+
+
+def memory_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Graph node run at the end of every turn."""
+    return _history.compact(state)
@@ -0,0 +1,424 @@
+"""
+Hot-path instrumentation, fed by LangChain callbacks on every graph run.
+
+build_graph attaches the process-wide `MetricsCallback` (runtime.get_metrics())
+to the compiled graph, so every invoke/stream/ainvoke records:
+
+    coach_turn_seconds         whole graph runs
+    coach_node_seconds         node runs ("planning/expand_stage" for subgraph nodes)
+    coach_node_self_seconds    node time outside its model calls, retrieval and child
+                               nodes: prompt building, JSON parsing, state updates
+    coach_llm_seconds          model calls by graph node, branch (the call_llm node:
+                               coaching, exercises, code_review, ...) and model
+    coach_llm_tokens_total     prompt/completion tokens, same labels
+    coach_llm_cost_usd_total   their cost at the model router's prices
+    coach_retrieval_seconds    fetch_docs searches by mode
+
+plus, read when exported, the response cache's lookups per node, the
+prefetcher's counters, the model router's current tier per node, the
+model calls' retries, hedges, timeouts and circuit breakers, and how many
+calls joined an identical request in flight.
+`render_prometheus()` is the Prometheus text format (the server serves it
+at /metrics); with METRICS_TRACE=path each span is also appended to a JSONL
+trace. Histograms have fixed buckets and are updated under one lock, with no
+work per streamed token. METRICS=off disables all of it.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from resilience import EVENTS
+from runtime import get_prefetcher, get_resilience, get_response_cache, get_router, get_single_flight
+
+ENABLED = os.getenv("METRICS", "on").lower() not in ("0", "off", "false", "no")
+TRACE_PATH = os.getenv("METRICS_TRACE") or None
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+HISTOGRAMS = {
+    "coach_turn_seconds": "Wall time of graph runs (one learner turn).",
+    "coach_node_seconds": "Wall time of graph node runs.",
+    "coach_node_self_seconds": "Node time outside model calls, retrieval and child nodes.",
+    "coach_llm_seconds": "Wall time of chat model calls.",
+    "coach_retrieval_seconds": "Wall time of fetch_docs searches.",
+}
+COUNTERS = {
+    "coach_llm_tokens_total": "Tokens reported by the model, by kind (prompt/completion).",
+    "coach_llm_cost_usd_total": "Cost of those tokens in USD (model_router prices).",
+    "coach_errors_total": "Node runs and model calls that raised.",
+}
+
+
+def node_path(namespace: str) -> str:
+    """'planning:<id>|expand_stage:<id>' -> 'planning/expand_stage'."""
+    return "/".join(part.split(":")[0] for part in namespace.split("|"))
+
+
+def _current_namespace() -> str:
+    from langgraph.config import get_config
+
+    try:
+        return get_config().get("metadata", {}).get("langgraph_checkpoint_ns", "")
+    except RuntimeError:
+        return ""
+
+
+def _usage(response: Any) -> Optional[Tuple[int, int]]:
+    """(prompt, completion) tokens of an LLMResult, None if the model didn't report them."""
+    generations = response.generations[0] if response.generations else []
+    message = getattr(generations[0], "message", None) if generations else None
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+    return None
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # per bucket, the last is +Inf; cumulated on export
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Span:
+    __slots__ = ("kind", "name", "namespace", "thread", "labels", "start", "wall", "children")
+
+    def __init__(self, kind: str, name: str, namespace: str, thread: Any, labels: Labels = ()):
+        self.kind = kind
+        self.name = name
+        self.namespace = namespace
+        self.thread = thread
+        self.labels = labels
+        self.start = time.perf_counter()
+        self.wall = time.time()
+        self.children = 0.0  # seconds spent in model calls, retrieval and child nodes
+
+
+class MetricsCallback(BaseCallbackHandler):
+    """
+    Times graph runs, node runs and chat model calls. LangGraph starts two
+    chain runs per node (the task and the node's runnable) plus one per
+    router; only the first run of each task namespace is timed.
+    """
+
+    run_inline = True  # plain bookkeeping: no executor hop in async runs
+    ignore_agent = True
+    ignore_retriever = True
+    ignore_retry = True
+    ignore_custom_event = True
+
+    def __init__(self, registry: "Registry"):
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._spans: Dict[UUID, _Span] = {}
+        self._open: Dict[str, _Span] = {}  # node spans by task namespace
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                       tags: Optional[List[str]] = None, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        metadata = metadata or {}
+        namespace = metadata.get("langgraph_checkpoint_ns")
+        if namespace is None:
+            if parent_run_id is None:
+                with self._lock:
+                    self._spans[run_id] = _Span("turn", kwargs.get("name") or "", "", metadata.get("thread_id"))
+            return
+        if kwargs.get("name") != metadata.get("langgraph_node"):
+            return
+        with self._lock:
+            if namespace in self._open:
+                return
+            span = _Span("node", node_path(namespace), namespace, metadata.get("thread_id"))
+            self._open[namespace] = span
+            self._spans[run_id] = span
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "ok")
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, type(error).__name__)
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                            tags: Optional[List[str]] = None, metadata: Optional[Dict[str, Any]] = None,
+                            **kwargs: Any) -> None:
+        metadata = metadata or {}
+        tags = tags or []
+        namespace = metadata.get("langgraph_checkpoint_ns", "")
+        branch = next((tag[6:] for tag in tags if tag.startswith("coach:")), "")
+        node = node_path(namespace) if namespace else ("prefetch" if "prefetch" in tags else "")
+        labels = (("node", node), ("branch", branch), ("model", str(metadata.get("ls_model_name", ""))))
+        span = _Span("llm", branch, namespace, metadata.get("thread_id"), labels)
+        with self._lock:
+            self._spans[run_id] = span
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "ok", _usage(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, type(error).__name__)
+
+    def charge(self, namespace: str, seconds: float) -> None:
+        """Count `seconds` (e.g. a retrieval) as spent outside the node run of `namespace`."""
+        with self._lock:
+            span = self._open.get(namespace)
+            if span is not None:
+                span.children += seconds
+
+    def _finish(self, run_id: UUID, status: str, usage: Optional[Tuple[int, int]] = None) -> None:
+        end = time.perf_counter()
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+            if span is None:
+                return
+            elapsed = end - span.start
+            if span.kind == "node":
+                del self._open[span.namespace]
+                parent = self._open.get(span.namespace.rpartition("|")[0])
+            else:
+                parent = self._open.get(span.namespace)
+            if parent is not None:
+                parent.children += elapsed
+        self.registry.record(span, elapsed, status, usage)
+
+
+class Registry:
+    """Process-wide histograms and counters, their Prometheus export and the JSONL trace."""
+
+    def __init__(self, enabled: bool = ENABLED, trace_path: Optional[str] = TRACE_PATH):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.callback = MetricsCallback(self)
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = defaultdict(dict)
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self._trace = None
+
+    def observe(self, name: str, labels: Labels, seconds: float) -> None:
+        series = self._histograms[name]
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram()
+        histogram.observe(seconds)
+
+    def record(self, span: _Span, elapsed: float, status: str, usage: Optional[Tuple[int, int]] = None) -> None:
+        """Aggregate one finished span (and append it to the trace)."""
+        event: Dict[str, Any] = {"ts": round(span.wall, 6), "type": span.kind, "name": span.name,
+                                 "thread": span.thread, "ms": round(elapsed * 1000, 3)}
+        with self._lock:
+            if span.kind == "node":
+                labels = (("node", span.name),)
+                own = max(0.0, elapsed - span.children)
+                self.observe("coach_node_seconds", labels, elapsed)
+                self.observe("coach_node_self_seconds", labels, own)
+                event["self_ms"] = round(own * 1000, 3)
+            elif span.kind == "llm":
+                labels = span.labels
+                self.observe("coach_llm_seconds", labels, elapsed)
+                event.update(labels)
+                if usage is not None:
+                    self._counters["coach_llm_tokens_total"][labels + (("kind", "prompt"),)] += usage[0]
+                    self._counters["coach_llm_tokens_total"][labels + (("kind", "completion"),)] += usage[1]
+                    event["prompt_tokens"], event["completion_tokens"] = usage
+                    model = dict(labels)["model"]
+                    self._counters["coach_llm_cost_usd_total"][labels] += get_router().cost(model, *usage)
+            else:
+                labels = ()
+                self.observe("coach_turn_seconds", labels, elapsed)
+            if status != "ok":
+                self._counters["coach_errors_total"][(("type", span.kind), ("name", span.name))] += 1
+                event["status"] = status
+            if self.trace_path:
+                self._write(event, flush=span.kind == "turn")
+
+    def observe_retrieval(self, mode: str, seconds: float, hits: int) -> None:
+        """Called by fetch_docs after each search."""
+        if not self.enabled:
+            return
+        namespace = _current_namespace()
+        self.callback.charge(namespace, seconds)
+        with self._lock:
+            self.observe("coach_retrieval_seconds", (("mode", mode),), seconds)
+            if self.trace_path:
+                self._write({"ts": round(time.time() - seconds, 6), "type": "retrieval", "name": mode,
+                             "node": node_path(namespace) if namespace else "", "ms": round(seconds * 1000, 3),
+                             "hits": hits}, flush=False)
+
+    def _write(self, event: Dict[str, Any], flush: bool) -> None:
+        if self._trace is None:
+            self._trace = open(self.trace_path, "a", buffering=1 << 16)
+            atexit.register(self.flush)
+        self._trace.write(json.dumps(event, separators=(",", ":"), default=str) + "\n")
+        if flush:
+            self._trace.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._trace is not None:
+                self._trace.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copies of the histograms ({name: {labels: (bucket counts, sum, count)}}) and counters."""
+        with self._lock:
+            histograms = {
+                name: {labels: (list(h.counts), h.sum, h.count) for labels, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+            counters = {name: dict(series) for name, series in self._counters.items()}
+        return {"histograms": histograms, "counters": counters}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (0.0.4) of everything recorded so far."""
+        data = self.snapshot()
+        lines: List[str] = []
+        for name, help_text in HISTOGRAMS.items():
+            series = data["histograms"].get(name)
+            if not series:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for labels, (counts, total, count) in sorted(series.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS + (None,), counts):
+                    cumulative += n
+                    le = "+Inf" if bound is None else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total!r}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        for name, help_text in COUNTERS.items():
+            series = data["counters"].get(name)
+            if series:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [f"{name}{_format_labels(labels)} {value:g}" for labels, value in sorted(series.items())]
+        lines += _cache_lines() + _prefetch_lines() + _router_lines() + _resilience_lines() + _coalescing_lines()
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels) + "}"
+
+
+def _cache_lines() -> List[str]:
+    """Response cache lookups per call_llm node (llm_cache.ResponseCache.stats)."""
+    from llm_calls import CACHE_ENABLED
+
+    if not CACHE_ENABLED:
+        return []
+    stats = get_response_cache().stats()
+    lines = [
+        "# HELP coach_llm_cache_lookups_total Response cache lookups by node and result.",
+        "# TYPE coach_llm_cache_lookups_total counter",
+    ]
+    for node, counts in sorted(stats["by_node"].items()):
+        for result in ("memory_hits", "disk_hits", "misses"):
+            lines.append(f'coach_llm_cache_lookups_total{_format_labels((("node", node), ("result", result)))} '
+                         f'{counts.get(result, 0)}')
+    lines += [
+        "# HELP coach_llm_cache_hit_ratio Share of response cache lookups served from the cache.",
+        "# TYPE coach_llm_cache_hit_ratio gauge",
+        f"coach_llm_cache_hit_ratio {stats['hit_rate']:.6g}",
+    ]
+    return lines
+
+
+def _prefetch_lines() -> List[str]:
+    prefetcher = get_prefetcher()
+    if not prefetcher.enabled:
+        return []
+    stats = prefetcher.stats()
+    lines = [
+        "# HELP coach_prefetch_total Speculative prefetches by outcome.",
+        "# TYPE coach_prefetch_total counter",
+    ]
+    lines += [f'coach_prefetch_total{{outcome="{outcome}"}} {stats.get(outcome, 0)}'
+              for outcome in ("scheduled", "hits", "wasted", "cancelled")]
+    lines += [
+        "# HELP coach_prefetch_pending Prefetches queued or being generated.",
+        "# TYPE coach_prefetch_pending gauge",
+        f"coach_prefetch_pending {stats['pending']}",
+    ]
+    return lines
+
+
+def _router_lines() -> List[str]:
+    """Each node's current model tier and how often it fell back (model_router.ModelRouter.stats)."""
+    nodes = get_router().stats()["nodes"]
+    lines = [
+        "# HELP coach_model_tier The model each call_llm node is currently routed to (1 = current).",
+        "# TYPE coach_model_tier gauge",
+    ]
+    lines += [f"coach_model_tier{_format_labels((('node', node), ('model', info['model'])))} 1"
+              for node, info in sorted(nodes.items())]
+    lines += [
+        "# HELP coach_model_fallbacks_total Times a node fell back to a faster tier after running over budget.",
+        "# TYPE coach_model_fallbacks_total counter",
+    ]
+    lines += [f"coach_model_fallbacks_total{_format_labels((('node', node),))} {info['fallbacks']}"
+              for node, info in sorted(nodes.items())]
+    return lines
+
+
+def _resilience_lines() -> List[str]:
+    """Retries, hedges, timeouts and degraded replies of model calls, and each model's breaker (resilience.py)."""
+    stats = get_resilience().stats()
+    lines = [
+        "# HELP coach_llm_call_events_total Model call outcomes: retries, hedges and their wins, timeouts, "
+        "failures, calls short-circuited by an open breaker, degraded replies.",
+        "# TYPE coach_llm_call_events_total counter",
+    ]
+    lines += [f"coach_llm_call_events_total{_format_labels((('event', event),))} {stats[event]}"
+              for event in EVENTS]
+    lines += [
+        "# HELP coach_llm_circuit_open Whether the model's circuit breaker is open (1) or half-open/closed (0).",
+        "# TYPE coach_llm_circuit_open gauge",
+    ]
+    lines += [f"coach_llm_circuit_open{_format_labels((('model', model),))} {int(info['state'] == 'open')}"
+              for model, info in sorted(stats["breakers"].items())]
+    return lines
+
+
+def _coalescing_lines() -> List[str]:
+    """Model calls made vs calls that joined an identical request in flight (singleflight.py)."""
+    stats = get_single_flight().stats()
+    lines = [
+        "# HELP coach_llm_flights_total Model requests made on behalf of possibly several identical calls.",
+        "# TYPE coach_llm_flights_total counter",
+    ]
+    lines += [f"coach_llm_flights_total{_format_labels((('node', node),))} {counts['flights']}"
+              for node, counts in sorted(stats["nodes"].items())]
+    lines += [
+        "# HELP coach_llm_coalesced_total Calls answered by an identical request already in flight.",
+        "# TYPE coach_llm_coalesced_total counter",
+    ]
+    lines += [f"coach_llm_coalesced_total{_format_labels((('node', node),))} {counts['coalesced']}"
+              for node, counts in sorted(stats["nodes"].items())]
+    lines += [
+        "# HELP coach_llm_in_flight Distinct model requests in flight.",
+        "# TYPE coach_llm_in_flight gauge",
+        f"coach_llm_in_flight {stats['in_flight']}",
+    ]
+    return lines
@@ -0,0 +1,177 @@
+"""
+Per-node model tiering with latency budgets.
+
+Every call_llm node (onboarding, planning, stage_details, replanning,
+exercises, code_review, coaching, plus summary for memory.llm_summarizer)
+has a route: its model, max tokens (None = the model's default) and a
+latency budget in seconds. TIERS lists the models from strongest/slowest to
+fastest; a node whose recent latency (an EWMA over its calls) exceeds its
+budget falls back to the next faster tier, and after TIER_COOLDOWN_SECONDS
+the tier above is tried again, with fresh measurements.
+
+Defaults keep every node on runtime.DEFAULT_MODEL. MODEL_ROUTES overrides them
+with JSON (a file path, or the JSON itself) merged over the defaults:
+
+    {"tiers": ["gpt-4o", "gpt-4o-mini", "gpt-4.1-nano"],
+     "prices": {"gpt-4o": [2.5, 10.0]},
+     "nodes": {"coaching": {"model": "gpt-4o", "max_tokens": 800, "budget_s": 8}}}
+
+Prices are USD per million input/output tokens; `stats()` reports latency,
+tokens and cost per tier and the current tier of every node.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from runtime import DEFAULT_MODEL
+
+TIERS: List[str] = ["gpt-4o", "gpt-4o-mini", "gpt-4.1-nano"]
+PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+NODES: Dict[str, Dict[str, Any]] = {
+    "onboarding": {"budget_s": 8},
+    "planning": {"budget_s": 30},
+    "stage_details": {"budget_s": 15},
+    "replanning": {"budget_s": 25},
+    "exercises": {"budget_s": 20},
+    "code_review": {"budget_s": 15},
+    "coaching": {"budget_s": 20},
+    "summary": {"budget_s": 10},
+}
+COOLDOWN_SECONDS = float(os.getenv("TIER_COOLDOWN_SECONDS", "120"))
+EWMA_ALPHA = 0.3
+WINDOW = 200  # latencies kept per tier for percentiles
+
+
+class Route:
+    __slots__ = ("node", "model", "max_tokens", "budget_s")
+
+    def __init__(self, node: str, model: str, max_tokens: Optional[int], budget_s: Optional[float]):
+        self.node = node
+        self.model = model
+        self.max_tokens = max_tokens
+        self.budget_s = budget_s
+
+    def __repr__(self) -> str:
+        return f"Route({self.node!r}, {self.model!r}, max_tokens={self.max_tokens}, budget_s={self.budget_s})"
+
+
+def load_config(source: Optional[str] = None) -> Dict[str, Any]:
+    """MODEL_ROUTES (a JSON file path or inline JSON) merged over the defaults."""
+    source = os.getenv("MODEL_ROUTES") if source is None else source
+    overrides: Dict[str, Any] = {}
+    if source:
+        if source.lstrip().startswith("{"):
+            overrides = json.loads(source)
+        else:
+            with open(source) as f:
+                overrides = json.load(f)
+    nodes = {node: dict(route) for node, route in NODES.items()}
+    for node, route in overrides.get("nodes", {}).items():
+        nodes.setdefault(node, {}).update(route)
+    return {
+        "tiers": list(overrides.get("tiers", TIERS)),
+        "prices": {**PRICES, **{model: tuple(p) for model, p in overrides.get("prices", {}).items()}},
+        "nodes": nodes,
+    }
+
+
+class ModelRouter:
+    """Picks each call's model from its node's route and demotes nodes that run over budget."""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, cooldown: float = COOLDOWN_SECONDS):
+        config = config or load_config()
+        self.tiers: List[str] = config["tiers"]
+        self.prices: Dict[str, Tuple[float, float]] = config["prices"]
+        self.nodes: Dict[str, Dict[str, Any]] = config["nodes"]
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._level: Dict[str, int] = defaultdict(int)  # steps below the node's declared model
+        self._changed: Dict[str, float] = {}
+        self._ewma: Dict[Tuple[str, str], float] = {}
+        self._latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=WINDOW))
+        self._totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._demotions: Dict[str, int] = defaultdict(int)
+
+    def chain(self, node: str) -> List[str]:
+        """The node's declared model followed by the faster tiers it may fall back to."""
+        model = self.nodes.get(node, {}).get("model") or DEFAULT_MODEL
+        if model not in self.tiers:
+            return [model]
+        return self.tiers[self.tiers.index(model):]
+
+    def route(self, node: str) -> Route:
+        """The route for the node's next call, on its current tier."""
+        spec = self.nodes.get(node, {})
+        chain = self.chain(node)
+        with self._lock:
+            level = min(self._level[node], len(chain) - 1)
+            if level and time.monotonic() - self._changed.get(node, 0.0) >= self.cooldown:
+                # Probe the tier above again; it has to earn its place with new measurements
+                level -= 1
+                self._level[node] = level
+                self._changed[node] = time.monotonic()
+                self._ewma.pop((node, chain[level]), None)
+        return Route(node, chain[level], spec.get("max_tokens"), spec.get("budget_s"))
+
+    def observe(self, route: Route, seconds: float, usage: Optional[Dict[str, int]] = None) -> None:
+        """Record a finished model call; falls the node back a tier when its smoothed latency is over budget."""
+        prompt = (usage or {}).get("input_tokens", 0)
+        completion = (usage or {}).get("output_tokens", 0)
+        with self._lock:
+            totals = self._totals[route.model]
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            totals["prompt_tokens"] += prompt
+            totals["completion_tokens"] += completion
+            totals["cost_usd"] += self.cost(route.model, prompt, completion)
+            self._latencies[route.model].append(seconds)
+
+            key = (route.node, route.model)
+            previous = self._ewma.get(key)
+            ewma = seconds if previous is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * previous
+            self._ewma[key] = ewma
+            chain = self.chain(route.node)
+            level = self._level[route.node]
+            if (route.budget_s is not None and ewma > route.budget_s
+                    and level + 1 < len(chain) and chain[level] == route.model):
+                self._level[route.node] = level + 1
+                self._changed[route.node] = time.monotonic()
+                self._demotions[route.node] += 1
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        price_in, price_out = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+    def stats(self) -> Dict[str, Any]:
+        """Latency, tokens and cost per tier; each node's current model and fallbacks so far."""
+        with self._lock:
+            tiers = {}
+            for model, totals in self._totals.items():
+                ordered = sorted(self._latencies[model])
+                pick = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 1)
+                tiers[model] = {
+                    "calls": int(totals["calls"]),
+                    "mean_ms": round(totals["seconds"] / totals["calls"] * 1000, 1),
+                    "p50_ms": pick(0.5),
+                    "p95_ms": pick(0.95),
+                    "prompt_tokens": int(totals["prompt_tokens"]),
+                    "completion_tokens": int(totals["completion_tokens"]),
+                    "cost_usd": round(totals["cost_usd"], 6),
+                }
+            nodes = {
+                node: {
+                    "model": self.chain(node)[min(self._level[node], len(self.chain(node)) - 1)],
+                    "budget_s": spec.get("budget_s"),
+                    "fallbacks": self._demotions[node],
+                }
+                for node, spec in self.nodes.items()
+            }
+        return {"tiers": tiers, "nodes": nodes}
@@ -1,25 +1,26 @@
-import json
+import os
 import re
-from dotenv import load_dotenv
+from typing import Any, Dict, List, Optional
 
-load_dotenv()
-
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from state import GraphState
-from tools import fetch_docs, analyze_code_snippet
+from json_stream import ArrayItemStream, repair_json
+from llm_calls import acall_llm, call_llm, emit_text
+from replan import can_replan_incrementally, merge_replan, plan_basis, replan_messages
+from state import GraphState, PlanState
+from review import areview_code, extract_code_blocks, review_code
+from tools import fetch_docs
 
-llm = ChatOpenAI(model="gpt-4o-mini")
 
-# --- Onboarding Node ---
-def onboarding_node(state: GraphState) -> GraphState:
-    # If already onboarded, skip to coaching
-    if state.get("status") not in ["onboarding", ""]:
-        return state
-    
-    last_msg = state["messages"][-1]
-    user_text = last_msg.content
+def _say(state: GraphState, text: str, emit: bool = True) -> None:
+    """Add a fixed-text reply, streamed where it happens so it reads in order with model output."""
+    if emit:
+        emit_text(text)
+    state["messages"].append(AIMessage(content=text))
 
+# --- Onboarding Node ---
+# Each node is split into prompt building and applying the reply, shared by
+# the sync node and its async twin (a*_node), which only differ in the call.
+def _onboarding_messages(state: GraphState) -> list:
     system = SystemMessage(content=(
         "React/TypeScript project coach. Extract ONLY valid JSON:\n"
         '{"project_summary": "brief description", '
@@ -27,41 +28,70 @@ def onboarding_node(state: GraphState) -> GraphState:
         '"assumed_level": "beginner" | "intermediate" | "advanced"}\n'
         "Assume 'beginner' if unclear. No extra text."
     ))
+    return [system, HumanMessage(content=state["messages"][-1].content)]
 
-    resp = llm.invoke([system, HumanMessage(content=user_text)])
-    content = resp.content.strip().replace("```json", "").replace("```", "")
+LEVEL_DESC = {
+    "beginner": "new to React/TypeScript (detailed fundamentals)",
+    "intermediate": "knows basics (best practices focus)",
+    "advanced": "experienced (advanced patterns)"
+}
 
+def _apply_onboarding(state: GraphState, reply: str) -> GraphState:
+    user_text = state["messages"][-1].content
+    data = {"project_summary": user_text, "features": ["basic app"], "assumed_level": "beginner"}
+
+    # Tolerant parse: fences, trailing commas and truncation are repaired; missing fields keep defaults
     try:
-        data = json.loads(re.search(r'\{.*\}', content, re.DOTALL).group(0))
-    except Exception:
-        data = {"project_summary": user_text, "features": ["basic app"], "assumed_level": "beginner"}
+        parsed = repair_json(reply)
+    except ValueError:
+        parsed = {}
+    if isinstance(parsed, dict):
+        data.update({k: v for k, v in parsed.items() if k in data and v})
+    if isinstance(data["features"], str):
+        data["features"] = [data["features"]]
+    if data["assumed_level"] not in LEVEL_DESC:
+        data["assumed_level"] = "beginner"
 
     state["project_spec"] = {"summary": data["project_summary"], "features": data["features"]}
     state["learner_profile"] = {"assumed_level": data["assumed_level"]}
     state["status"] = "onboarding_complete"
 
-    level_desc = {
-        "beginner": "new to React/TypeScript (detailed fundamentals)",
-        "intermediate": "knows basics (best practices focus)",
-        "advanced": "experienced (advanced patterns)"
-    }
-
     msg = (
         f"✅ **Project Confirmed**\n\n"
         f"**Build:** {data['project_summary']}\n\n"
         f"**Features:** {', '.join(data['features'])}\n\n"
-        f"**Level:** {data['assumed_level'].title()} - {level_desc[data['assumed_level']]}\n\n"
+        f"**Level:** {data['assumed_level'].title()} - {LEVEL_DESC[data['assumed_level']]}\n\n"
         f"💡 Say 'I'm actually [level]' to adjust\n\n"
         f"Creating learning plan..."
     )
-    state["messages"].append(AIMessage(content=msg))
+    # Shown right away; the plan streams in after it
+    _say(state, msg)
     return state
 
+def _needs_onboarding(state: GraphState) -> bool:
+    # If already onboarded, skip to coaching
+    return state.get("status") in ["onboarding", ""]
+
+def onboarding_node(state: GraphState) -> GraphState:
+    if not _needs_onboarding(state):
+        return state
+    resp = call_llm("onboarding", _onboarding_messages(state))
+    return _apply_onboarding(state, resp.content)
+
+async def aonboarding_node(state: GraphState) -> GraphState:
+    if not _needs_onboarding(state):
+        return state
+    resp = await acall_llm("onboarding", _onboarding_messages(state))
+    return _apply_onboarding(state, resp.content)
+
 # --- Planning Node ---
-def planning_node(state: GraphState) -> GraphState:
+# PLAN_FANOUT=off plans in one call, every stage in full (the old behaviour),
+# instead of a short outline whose stages are then expanded in parallel.
+PLAN_FANOUT = os.getenv("PLAN_FANOUT", "on").lower() not in ("0", "off", "false", "no")
+
+def _planning_messages(state: GraphState) -> list:
     spec = state["project_spec"]
     level = state["learner_profile"]["assumed_level"]
-    is_replan = state.get("status") == "replan"
 
     system = SystemMessage(content=(
         f"React/TS planner for {level} learners. 4-6 stages covering {spec['features']}.\n"
@@ -70,22 +100,26 @@ def planning_node(state: GraphState) -> GraphState:
         '{"stages": [{"name": "...", "goal": "...", "tasks": [...], '
         '"fundamentals": [...], "docs": [...], "features": [...]}]}'
     ))
-
-    resp = llm.invoke([
+    return [
         system,
         HumanMessage(content=f"Project: {spec['summary']}\nFeatures: {spec['features']}\nLevel: {level}")
-    ])
+    ]
 
-    content = resp.content.strip().replace("```", "")
-    try:
-        data = json.loads(re.search(r'\{.*\}', content, re.DOTALL).group(0))
-        state["stages"] = data["stages"]
-    except Exception:
-        state["stages"] = [{"name": "Setup", "goal": "Basic app", "tasks": [], "fundamentals": [], "docs": [], "features": spec["features"]}]
+STAGE_REQUIRED = ("name", "goal")
 
-    if not is_replan:
-        state["current_stage_index"] = 0
 
+def _clean_stages(stages: Any) -> list:
+    """
+    Stage dicts with every field present. Stages without a name or goal (the
+    partial last stage of a cut-off reply) are dropped; other fields default to empty.
+    """
+    cleaned = []
+    for stage in stages if isinstance(stages, list) else []:
+        if isinstance(stage, dict) and all(isinstance(stage.get(f), str) and stage[f].strip() for f in STAGE_REQUIRED):
+            cleaned.append({"tasks": [], "fundamentals": [], "docs": [], "features": [], **stage})
+    return cleaned
+
+def _plan_parts(state: GraphState, is_replan: bool) -> tuple:
     current = state.get("current_stage_index", 0) + 1
     if is_replan:
         header = f"## 🔄 Updated Learning Plan\n**Current: Stage {current}\n\n**Stages:**\n\n"
@@ -99,22 +133,218 @@ def planning_node(state: GraphState) -> GraphState:
             "**Plan:** add feature • I'm actually [level]\n\n"
             "Ready? **'continue'**!"
         )
+    return header, "---" + footer
+
+def _stage_line(i: int, stage: Dict[str, Any], current: Optional[int]) -> str:
+    marker = " ← **YOU ARE HERE**" if i == current else ""
+    feats = f" ({', '.join(stage.get('features', []))})" if stage.get('features') else ""
+    return f"**Stage {i}: {stage['name']}**{marker}{feats}\n  Goal: {stage['goal']}\n\n"
+
+def _plan_streamer(state: GraphState):
+    """
+    on_token handler for the planner call: emits the plan header, then each
+    stage line as soon as that stage's JSON object is complete. Returns it
+    with the list of stages shown so far.
+    """
+    is_replan = state.get("status") == "replan"
+    current = state.get("current_stage_index", 0) + 1 if is_replan else None
+    parser = ArrayItemStream("stages")
+    shown = []
+    emit_text(_plan_parts(state, is_replan)[0])
 
-    plan_text = header
-    for i, stage in enumerate(state["stages"], 1):
-        marker = " ← **YOU ARE HERE**" if is_replan and i == current else ""
-        feats = f" ({', '.join(stage.get('features', []))})" if stage.get('features') else ""
-        plan_text += f"**Stage {i}: {stage['name']}**{marker}{feats}\n  Goal: {stage['goal']}\n\n"
+    def on_token(text: str) -> None:
+        for stage in _clean_stages(parser.feed(text)):
+            shown.append(stage)
+            emit_text(_stage_line(len(shown), stage, current))
+    return on_token, shown
 
-    state["messages"].append(AIMessage(content=plan_text + "---" + footer))
+def _finish_stream(state: GraphState, stages: list, shown: list) -> None:
+    """Emit the stage lines the stream didn't show (the fallback stage, or a last stage the repair recovered)."""
+    current = state.get("current_stage_index", 0) + 1 if state.get("status") == "replan" else None
+    for i, stage in enumerate(stages[len(shown):], len(shown) + 1):
+        emit_text(_stage_line(i, stage, current))
+
+def _apply_plan(state: GraphState, reply: str, shown: list) -> GraphState:
+    spec = state["project_spec"]
+    is_replan = state.get("status") == "replan"
+
+    try:
+        data = repair_json(reply)
+        stages = _clean_stages(data.get("stages") if isinstance(data, dict) else data)
+    except ValueError:
+        stages = []
+    state["stages"] = stages or [{"name": "Setup", "goal": "Basic app", "tasks": [], "fundamentals": [], "docs": [], "features": spec["features"]}]
+    _finish_stream(state, state["stages"], shown)
+
+    if not is_replan:
+        state["current_stage_index"] = 0
+    return _show_plan(state, is_replan, streamed=True)
+
+def _apply_replan(state: GraphState, reply: str) -> GraphState:
+    state["stages"] = merge_replan(state, reply)
+    return _show_plan(state, is_replan=True)
+
+def _show_plan(state: GraphState, is_replan: bool, streamed: bool = False) -> GraphState:
+    """Append the plan message; `streamed` = header and stages were already emitted, only the footer is left."""
+    state["plan_basis"] = plan_basis(state)
+    current = state.get("current_stage_index", 0) + 1 if is_replan else None
+    header, footer = _plan_parts(state, is_replan)
+    plan_text = header + "".join(_stage_line(i, stage, current) for i, stage in enumerate(state["stages"], 1))
+    emit_text(footer if streamed else plan_text + footer)
+
+    state["messages"].append(AIMessage(content=plan_text + footer))
     state["status"] = "coaching"
     return state
 
+def planning_node(state: GraphState) -> GraphState:
+    if can_replan_incrementally(state):
+        resp = call_llm("replanning", replan_messages(state))
+        return _apply_replan(state, resp.content)
+    on_token, shown = _plan_streamer(state)
+    resp = call_llm("planning", _planning_messages(state), on_token=on_token)
+    return _apply_plan(state, resp.content, shown)
+
+async def aplanning_node(state: GraphState) -> GraphState:
+    if can_replan_incrementally(state):
+        resp = await acall_llm("replanning", replan_messages(state))
+        return _apply_replan(state, resp.content)
+    on_token, shown = _plan_streamer(state)
+    resp = await acall_llm("planning", _planning_messages(state), on_token=on_token)
+    return _apply_plan(state, resp.content, shown)
+
+# --- Planning subgraph (outline -> expand_stage per stage -> assemble, see graph.py) ---
+def _outline_messages(state: GraphState) -> list:
+    spec = state["project_spec"]
+    level = state["learner_profile"]["assumed_level"]
+
+    system = SystemMessage(content=(
+        f"React/TS planner for {level} learners. Outline 4-6 stages covering {spec['features']}.\n"
+        "Each stage: name, goal, features[] only (details are planned per stage).\n"
+        f"JSON only:\n"
+        '{"stages": [{"name": "...", "goal": "...", "features": [...]}]}'
+    ))
+    return [
+        system,
+        HumanMessage(content=f"Project: {spec['summary']}\nFeatures: {spec['features']}\nLevel: {level}")
+    ]
+
+def _apply_outline(state: PlanState, reply: str, shown: list) -> PlanState:
+    try:
+        data = repair_json(reply)
+        outline = _clean_stages(data.get("stages") if isinstance(data, dict) else data)
+    except ValueError:
+        outline = []
+    state["outline"] = outline or [{"name": "Setup", "goal": "Basic app", "tasks": [], "fundamentals": [], "docs": [], "features": state["project_spec"]["features"]}]
+    _finish_stream(state, state["outline"], shown)
+    return state
+
+def _planned(state: PlanState) -> bool:
+    # The single-call planner and the replanner finish the plan themselves
+    return state.get("status") == "coaching"
+
+def plan_outline_node(state: PlanState) -> PlanState:
+    state["stage_details"] = None
+    if not PLAN_FANOUT or can_replan_incrementally(state):
+        return planning_node(state)
+    on_token, shown = _plan_streamer(state)
+    resp = call_llm("planning", _outline_messages(state), on_token=on_token)
+    return _apply_outline(state, resp.content, shown)
+
+async def aplan_outline_node(state: PlanState) -> PlanState:
+    state["stage_details"] = None
+    if not PLAN_FANOUT or can_replan_incrementally(state):
+        return await aplanning_node(state)
+    on_token, shown = _plan_streamer(state)
+    resp = await acall_llm("planning", _outline_messages(state), on_token=on_token)
+    return _apply_outline(state, resp.content, shown)
+
+def stage_tasks(state: PlanState) -> List[Dict[str, Any]]:
+    """One expansion task (the Send payload) per outlined stage; empty once the plan is complete."""
+    if _planned(state):
+        return []
+    names = [stage["name"] for stage in state["outline"]]
+    return [
+        {
+            "index": i,
+            "stage": stage,
+            "outline": names,
+            "summary": state["project_spec"]["summary"],
+            "level": state["learner_profile"]["assumed_level"],
+        }
+        for i, stage in enumerate(state["outline"])
+    ]
+
+def _stage_detail_messages(task: Dict[str, Any]) -> list:
+    stage = task["stage"]
+    system = SystemMessage(content=(
+        f"React/TS planner for {task['level']} learners. Detail ONE stage of the plan.\n"
+        "JSON only:\n"
+        '{"tasks": [...], "fundamentals": [...], "docs": [...]}'
+    ))
+    return [
+        system,
+        HumanMessage(content=(
+            f"Project: {task['summary']}\n"
+            f"Plan: {' | '.join(task['outline'])}\n"
+            f"Stage {task['index'] + 1}: {stage['name']}\n"
+            f"Goal: {stage['goal']}\n"
+            f"Features: {stage.get('features', [])}"
+        ))
+    ]
+
+def _apply_stage_details(task: Dict[str, Any], reply: str) -> Dict[str, Any]:
+    try:
+        data = repair_json(reply)
+    except ValueError:
+        data = {}
+    details = {
+        field: data[field] for field in ("tasks", "fundamentals", "docs")
+        if isinstance(data, dict) and isinstance(data.get(field), list)
+    }
+    return {"stage_details": [{"index": task["index"], **details}]}
+
+def expand_stage_node(task: Dict[str, Any]) -> Dict[str, Any]:
+    resp = call_llm("stage_details", _stage_detail_messages(task))
+    return _apply_stage_details(task, resp.content)
+
+async def aexpand_stage_node(task: Dict[str, Any]) -> Dict[str, Any]:
+    resp = await acall_llm("stage_details", _stage_detail_messages(task))
+    return _apply_stage_details(task, resp.content)
+
+def assemble_plan_node(state: PlanState) -> PlanState:
+    """Reduce: outline + expanded details (in outline order, whatever order they finished in) -> stages."""
+    is_replan = state.get("status") == "replan"
+    details = {d["index"]: d for d in state.get("stage_details") or []}
+    state["stages"] = [
+        {**stage, **{k: v for k, v in details.get(i, {}).items() if k != "index"}}
+        for i, stage in enumerate(state["outline"])
+    ]
+    state["stage_details"] = None
+
+    if not is_replan:
+        state["current_stage_index"] = 0
+    return _show_plan(state, is_replan, streamed=True)
+
 # --- Coaching Node ---
-def coaching_node(state: GraphState) -> GraphState:
+NEXT_STAGE_COMMANDS = ("done", "next stage", "move on")
+
+
+def advances_stage(text: str) -> bool:
+    """Whether coaching_node answers `text` locally by moving on to the next stage."""
+    msg = text.lower()
+    return "exercise" not in msg and any(x in msg for x in NEXT_STAGE_COMMANDS)
+
+
+def _coaching_step(state: GraphState, emit: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Handle the turn locally where no LLM is needed (navigation, replan
+    triggers) and return None; otherwise return the LLM call to make:
+    {"node", "messages", "header"} or, for pasted code, {"review": (message, stage_info)}.
+    With emit=False local replies are only added to state, not streamed.
+    """
     # Only process human messages, skip if last message is from AI
     if not state["messages"] or state["messages"][-1].type != "human":
-        return state
+        return None
     
     stages = state.get("stages", [])
     idx = state.get("current_stage_index", 0)
@@ -122,8 +352,8 @@ def coaching_node(state: GraphState) -> GraphState:
 
     if idx >= len(stages):
         state["status"] = "finished"
-        state["messages"].append(AIMessage("🎉 **Complete!** You've built your project! 🚀"))
-        return state
+        _say(state, "🎉 **Complete!** You've built your project! 🚀", emit)
+        return None
 
     stage = stages[idx]
     msg = state["messages"][-1].content.lower()
@@ -136,14 +366,14 @@ def coaching_node(state: GraphState) -> GraphState:
                 if 0 <= target < len(stages):
                     state["current_stage_index"] = target
                     new_stage = stages[target]
-                    state["messages"].append(AIMessage(
+                    _say(state, (
                         f"📍 **Jumped to Stage {target+1}/{len(stages)}: {new_stage['name']}**\n"
                         f"**Goal:** {new_stage['goal']}\n"
                         f"**Features:** {', '.join(new_stage.get('features', []))}\n\n"
                         f"💬 `continue`=instructions, `exercises`=practice"
-                    ))
+                    ), emit)
                     state["status"] = "coaching"
-                    return state
+                    return None
             except ValueError:
                 pass
 
@@ -152,48 +382,44 @@ def coaching_node(state: GraphState) -> GraphState:
             if lvl in msg:
                 state["learner_profile"]["assumed_level"] = lvl
                 state["status"] = "replan"
-                state["messages"].append(AIMessage(
-                    f"✅ **{lvl.title()}** level activated!\n🔄 Replanning..."
-                ))
-                return state
+                _say(state, f"✅ **{lvl.title()}** level activated!\n🔄 Replanning...", emit)
+                return None
 
     if "done with exercise" in msg or "done with exercises" in msg:
-        state["messages"].append(AIMessage(
+        _say(state, (
             f"✅ **Exercises complete!** Stage {idx+1}/{len(stages)}: {stage['name']}\n\n"
             f"• `continue` = instructions\n• `exercises` = more\n• `done` = next\n• `go to stage X`"
-        ))
+        ), emit)
         state["status"] = "coaching"
-        return state
+        return None
 
-    if any(x in msg for x in ["done", "next stage", "move on"]):
-        if "exercise" not in msg:
+    if any(x in msg for x in NEXT_STAGE_COMMANDS):
+        if advances_stage(msg):
             state["current_stage_index"] += 1
             if state["current_stage_index"] >= len(stages):
                 state["status"] = "finished"
-                state["messages"].append(AIMessage(
-                    f"🎉 **All Done!** Built: **{state['project_spec']['summary']}** 🚀"
-                ))
+                _say(state, f"🎉 **All Done!** Built: **{state['project_spec']['summary']}** 🚀", emit)
             else:
                 next_stage = stages[state["current_stage_index"]]
-                state["messages"].append(AIMessage(
+                _say(state, (
                     f"✅ **Stage {idx+1} Complete!**\n\n"
                     f"**Next: Stage {state['current_stage_index']+1}/{len(stages)}**\n"
                     f"**{next_stage['name']}** - {next_stage['goal']}\n\n"
                     f"💬 `continue`=`start`, `go to stage X`=`jump`, `exercises`=`practice`"
-                ))
+                ), emit)
         state["status"] = "coaching"
-        return state
+        return None
 
     if "add feature" in msg:
         feature = re.split(r'add feature[:\s]+', msg, flags=re.I)[1].strip() if "add feature" in msg else "new feature"
         state["project_spec"]["features"].append(feature)
         state["status"] = "replan"
-        state["messages"].append(AIMessage(
+        _say(state, (
             f"🔄 **Adding: {feature}**\n"
             f"📍 Stage {idx+1}/{len(stages)}\n"
             f"🔄 Replanning to integrate..."
-        ))
-        return state
+        ), emit)
+        return None
 
     if "exercise" in msg or "practice" in msg:
         topic = msg.split("for ", 1)[1].strip() if "for " in msg else None
@@ -202,41 +428,27 @@ def coaching_node(state: GraphState) -> GraphState:
             "## 🏋️ Exercises\n**Ex 1:**\n- Task\n- Verify\n\n**Ex 2:**\n...\n\n## 💡 Hints\n...\n\n"
             "'done with exercises'=stay, 'done'=next stage"
         ))
-        resp = llm.invoke([system, HumanMessage(content=f"Stage: {stage['name']} | Topic: {topic or 'fundamentals'}")])
-        
-        state["messages"].append(AIMessage(
-            f"📍 **Stage {idx+1}/{len(stages)}: {stage['name']}**\n\n{resp.content}"
-        ))
-        state["status"] = "coaching"
-        return state
+        return {
+            "node": "exercises",
+            "messages": [system, HumanMessage(content=f"Stage: {stage['name']} | Topic: {topic or 'fundamentals'}")],
+            "header": f"📍 **Stage {idx+1}/{len(stages)}: {stage['name']}**\n\n",
+        }
 
-    # Check if user is sharing code for review
-    if "```" in state["messages"][-1].content:
-        # Extract code from message (find code block)
-        code_match = re.search(r'```(?:javascript|typescript|jsx|tsx|js|ts)?\s*\n(.*?)```', 
-                               state["messages"][-1].content, re.DOTALL)
-        if code_match:
-            code = code_match.group(1).strip()
-            stage_info = f"Stage: {stage['name']}\nGoal: {stage['goal']}\nFundamentals: {', '.join(stage.get('fundamentals', []))}"
-            
-            try:
-                feedback = analyze_code_snippet(code, stage_info)
-                
-                state["messages"].append(AIMessage(
-                    f"📍 **Stage {idx+1}/{len(stages)}: {stage['name']}**\n\n"
-                    f"## 🔍 Code Review\n\n"
-                    f"**Issues Found:**\n{feedback.get('issues', 'None detected')}\n\n"
-                    f"**Concepts to Review:**\n{feedback.get('suggested_fundamentals', 'N/A')}\n\n"
-                    f"**💡 Hint:**\n{feedback.get('high_level_hint', 'Keep practicing!')}\n\n"
-                    f"---\n💬 `continue` for more help • `exercises` for practice • `done` when ready"
-                ))
-                state["status"] = "coaching"
-                return state
-            except Exception as e:
-                # If code analysis fails, fall through to default coaching
-                pass
+    # Check if user is sharing code for review (every block, reviewed in parallel)
+    if "```" in state["messages"][-1].content and extract_code_blocks(state["messages"][-1].content):
+        stage_info = f"Stage: {stage['name']}\nGoal: {stage['goal']}\nFundamentals: {', '.join(stage.get('fundamentals', []))}"
+        return {"review": (state["messages"][-1].content, stage_info)}
+
+    return _default_coaching_step(state)
+
+def _default_coaching_step(state: GraphState) -> Dict[str, Any]:
+    """Default coaching or questions."""
+    stages = state["stages"]
+    idx = state.get("current_stage_index", 0)
+    level = state["learner_profile"].get("assumed_level", "beginner")
+    stage = stages[idx]
+    msg = state["messages"][-1].content.lower()
 
-    # Default coaching or questions
     docs = fetch_docs(" ".join(stage.get("fundamentals", [])))
     docs_text = "\n".join(f"- {d['topic']}: {d['link']}" for d in docs[:3]) or "No docs"
 
@@ -249,15 +461,80 @@ def coaching_node(state: GraphState) -> GraphState:
         "## ❓ `continue`/`exercises`/`done`/`go to stage X`"
     ))
     
-    resp = llm.invoke([system, HumanMessage(content=f"User: {msg}\nStage: {stage['name']}")])
-    
-    state["messages"].append(AIMessage(
+    header = (
         f"📍 **Stage {idx+1}/{len(stages)}: {stage['name']}**\n"
-        f"*Goal: {stage['goal']}*\n\n---\n\n{resp.content}"
+        f"*Goal: {stage['goal']}*\n\n---\n\n"
+    )
+    return {
+        "node": "coaching",
+        "messages": [system, HumanMessage(content=f"User: {msg}\nStage: {stage['name']}")],
+        "header": header,
+    }
+
+def coaching_request(state: GraphState, user_text: str) -> Optional[Dict[str, Any]]:
+    """
+    The LLM call ({"node", "messages", "header"}) coaching_node would make if
+    the learner sent `user_text` now, or None if it would answer locally.
+    `state` is left untouched (used to prefetch likely replies, see prefetch.py).
+    """
+    spec = state.get("project_spec") or {}
+    guess = {
+        **state,
+        "messages": [HumanMessage(content=user_text)],
+        "learner_profile": dict(state.get("learner_profile") or {}),
+        # "add feature" appends to the features list
+        "project_spec": {**spec, "features": list(spec.get("features", []))},
+    }
+    step = _coaching_step(guess, emit=False)
+    return step if step is not None and "node" in step else None
+
+def _apply_review(state: GraphState, feedback: Dict[str, str]) -> GraphState:
+    stages = state["stages"]
+    idx = state.get("current_stage_index", 0)
+    stage = stages[idx]
+    _say(state, (
+        f"📍 **Stage {idx+1}/{len(stages)}: {stage['name']}**\n\n"
+        f"## 🔍 Code Review\n\n"
+        f"**Issues Found:**\n{feedback.get('issues', 'None detected')}\n\n"
+        f"**Concepts to Review:**\n{feedback.get('suggested_fundamentals', 'N/A')}\n\n"
+        f"**💡 Hint:**\n{feedback.get('high_level_hint', 'Keep practicing!')}\n\n"
+        f"---\n💬 `continue` for more help • `exercises` for practice • `done` when ready"
     ))
     state["status"] = "coaching"
     return state
 
+def _apply_reply(state: GraphState, step: Dict[str, Any], reply: str) -> GraphState:
+    state["messages"].append(AIMessage(step["header"] + reply))
+    state["status"] = "coaching"
+    return state
+
+def coaching_node(state: GraphState) -> GraphState:
+    step = _coaching_step(state)
+    if step is None:
+        return state
+    if "review" in step:
+        try:
+            return _apply_review(state, review_code(*step["review"]))
+        except Exception:
+            # If code analysis fails, fall through to default coaching
+            step = _default_coaching_step(state)
+    emit_text(step["header"])
+    resp = call_llm(step["node"], step["messages"])
+    return _apply_reply(state, step, resp.content)
+
+async def acoaching_node(state: GraphState) -> GraphState:
+    step = _coaching_step(state)
+    if step is None:
+        return state
+    if "review" in step:
+        try:
+            return _apply_review(state, await areview_code(*step["review"]))
+        except Exception:
+            step = _default_coaching_step(state)
+    emit_text(step["header"])
+    resp = await acall_llm(step["node"], step["messages"])
+    return _apply_reply(state, step, resp.content)
+
 # --- Routing Node ---
 def route_next_node(state: GraphState) -> str:
     """Route based on status to next node."""
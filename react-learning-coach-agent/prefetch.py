@@ -0,0 +1,284 @@
+"""
+Speculative prefetch of the coach's likely next replies.
+
+After a turn that leaves the learner on a stage, the next input is almost
+always a quick action: "continue" or "give me exercises" on this stage, or
+"done" and then "continue" on the next one. `Prefetcher.schedule(session,
+state)` builds exactly the requests coaching_node would make for those and
+generates them in the background, on one worker event loop with at most
+PREFETCH_CONCURRENCY calls at a time. call_llm takes a prefetched reply by
+request key instead of calling the model; one still being generated is
+waited for rather than requested twice, one still queued is dropped.
+
+`on_input` cancels a session's predictions when the learner sends
+something else (a question, a command that wasn't predicted); "done" and
+the other next-stage commands, answered without the model, keep the next
+stage's. A reply already served is not predicted again. Replies generated
+but never used count against PREFETCH_TOKEN_BUDGET (output tokens per
+session); once it is spent, the session is not prefetched any more. The
+PREFETCH_MAX_SESSIONS most recently active sessions are tracked; an evicted
+session's predictions are dropped with it.
+PREFETCH=off disables prefetching.
+
+Generations go through llm_calls.agenerate: the turn deadline, retries and
+circuit breaker of resilience.py, the router's latency figures, and
+coalescing with identical calls in flight. A turn waits for a reply being
+generated no longer than its own deadline.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from resilience import TURN_DEADLINE_SECONDS, time_left
+
+ENABLED = os.getenv("PREFETCH", "on").lower() not in ("0", "off", "false", "no")
+CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "1"))
+TOKEN_BUDGET = int(os.getenv("PREFETCH_TOKEN_BUDGET", "4000"))
+MAX_SESSIONS = int(os.getenv("PREFETCH_MAX_SESSIONS", "10000"))
+
+# (learner input, stages ahead of the current one) worth generating in advance
+PREDICTED_INPUTS: Tuple[Tuple[str, int], ...] = (("continue", 0), ("give me exercises", 0), ("continue", 1))
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class _Entry:
+    def __init__(self, session: str, text: str, ahead: int, node: str):
+        self.session = session
+        self.text = text
+        self.ahead = ahead
+        self.node = node
+        self.started = False
+        self.future: Optional[concurrent.futures.Future] = None
+
+
+class _Session:
+    __slots__ = ("wasted", "served")
+
+    def __init__(self):
+        self.wasted = 0
+        self.served: set = set()
+
+
+class Prefetcher:
+    """Background generations keyed by request key (llm_calls.request_key), with a wasted-token budget per session."""
+
+    def __init__(self, enabled: bool = ENABLED, concurrency: int = CONCURRENCY, token_budget: int = TOKEN_BUDGET):
+        self.enabled = enabled
+        self.concurrency = concurrency
+        self.token_budget = token_budget
+        self._entries: Dict[str, _Entry] = {}
+        # Per session, least recently active first: wasted tokens and request keys already served
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._stats: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="coach-prefetch", daemon=True).start()
+                self._slots = asyncio.run_coroutine_threadsafe(self._make_slots(), loop).result()
+                self._loop = loop
+            return self._loop
+
+    async def _make_slots(self) -> asyncio.Semaphore:
+        return asyncio.Semaphore(self.concurrency)
+
+    def _session(self, session: str) -> "_Session":
+        """The session's bookkeeping, marked as most recently active; call with the lock held."""
+        state = self._sessions.get(session)
+        if state is None:
+            state = self._sessions[session] = _Session()
+            while len(self._sessions) > MAX_SESSIONS:
+                evicted, _ = self._sessions.popitem(last=False)
+                self._drop_entries(evicted)
+        self._sessions.move_to_end(session)
+        return state
+
+    def _drop_entries(self, session: str) -> None:
+        """Forget an evicted session's predictions; call with the lock held. Its waste is no longer tracked."""
+        for key in [key for key, e in self._entries.items() if e.session == session]:
+            future = self._entries.pop(key).future
+            if future is not None and future.cancel():
+                self._stats["cancelled"] += 1
+
+    def predict(self, state: Dict[str, Any]) -> List[Tuple[str, int, Dict[str, Any]]]:
+        """(input, stages ahead, coaching request) for the likely next inputs on the current and next stage."""
+        from nodes import coaching_request
+
+        stages = state.get("stages") or []
+        idx = state.get("current_stage_index", 0)
+        if state.get("status") != "coaching" or idx >= len(stages):
+            return []
+        predicted = []
+        for text, ahead in PREDICTED_INPUTS:
+            if idx + ahead < len(stages):
+                step = coaching_request({**state, "current_stage_index": idx + ahead}, text)
+                if step is not None:
+                    predicted.append((text, ahead, step))
+        return predicted
+
+    def schedule(self, session: str, state: Dict[str, Any]) -> int:
+        """Start generating the predicted replies for `session`, replacing its older predictions; returns how many were started."""
+        if not self.enabled or self.budget_left(session) <= 0:
+            self.cancel(session)
+            return 0
+        from llm_calls import request_key, uses_cache
+        from runtime import get_llm, get_response_cache, get_router
+
+        wanted = {}
+        predicted = set()
+        for text, ahead, step in self.predict(state):
+            # The model and max tokens call_llm will route this node's request to
+            route = get_router().route(step["node"])
+            llm = get_llm(route.model)
+            key = request_key(llm, step["messages"], route.max_tokens)
+            predicted.add(key)
+            # Replies the response cache already has come back instantly anyway
+            if not (uses_cache(step["node"]) and get_response_cache().has(key)):
+                wanted[key] = (text, ahead, step, route, llm)
+        with self._lock:
+            served = self._session(session).served
+            # Only keys still predicted can come up again; the rest are forgotten
+            served &= predicted
+            wanted = {key: value for key, value in wanted.items() if key not in served}
+        self.cancel(session, keep=set(wanted))
+
+        started = 0
+        loop = self._ensure_loop()
+        with self._lock:
+            for key, (text, ahead, step, route, llm) in wanted.items():
+                if key in self._entries:
+                    # Kept from before, maybe now for the current stage rather than the next
+                    self._entries[key].text, self._entries[key].ahead = text, ahead
+                    continue
+                entry = _Entry(session, text, ahead, step["node"])
+                self._entries[key] = entry
+                entry.future = asyncio.run_coroutine_threadsafe(self._generate(entry, llm, route, step["messages"]), loop)
+                started += 1
+            self._stats["scheduled"] += started
+        return started
+
+    async def _generate(self, entry: _Entry, llm: Any, route: Any, messages: List[Any]) -> str:
+        from llm_calls import agenerate
+        from runtime import get_metrics
+
+        metrics = get_metrics()
+        # Outside any graph run, so metrics sees these calls only when handed its callback
+        config = {"tags": [f"coach:{entry.node}", "prefetch"], "callbacks": [metrics.callback] if metrics.enabled else []}
+        async with self._slots:
+            entry.started = True
+            resp = await agenerate(entry.node, messages, route, llm, config)
+        return resp.content if isinstance(resp.content, str) else ""
+
+    def on_input(self, session: str, text: str) -> None:
+        """
+        The learner sent `text`: unless it was one of the predicted inputs,
+        the session's predictions are cancelled, except the next stage's when
+        `text` moves on to it.
+        """
+        from nodes import advances_stage
+
+        normalized = _normalize(text)
+        with self._lock:
+            entries = [(key, e) for key, e in self._entries.items() if e.session == session]
+        if any(e.text == normalized for _, e in entries):
+            return
+        keep = {key for key, e in entries if e.ahead == 1} if advances_stage(normalized) else None
+        self.cancel(session, keep=keep)
+
+    def cancel(self, session: str, keep: Optional[set] = None) -> None:
+        """Drop the session's predictions (except `keep`); generated-but-unused replies count as waste."""
+        with self._lock:
+            dropped = [
+                (key, self._entries.pop(key)) for key, e in list(self._entries.items())
+                if e.session == session and key not in (keep or ())
+            ]
+        for _, entry in dropped:
+            future = entry.future
+            if future is None:
+                continue
+            if future.cancel():
+                with self._lock:
+                    self._stats["cancelled"] += 1
+            else:
+                # Already generated (or past cancelling): the reply goes unused once it is there
+                future.add_done_callback(lambda f, entry=entry: self._record_waste(entry, f))
+
+    def _record_waste(self, entry: _Entry, future: concurrent.futures.Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        with self._lock:
+            state = self._sessions.get(entry.session)
+            if state is None:
+                # Evicted meanwhile
+                return
+            # Roughly 4 characters per token
+            state.wasted += max(1, len(future.result()) // 4)
+            self._stats["wasted"] += 1
+
+    def budget_left(self, session: str) -> int:
+        with self._lock:
+            state = self._sessions.get(session)
+        return self.token_budget - (state.wasted if state is not None else 0)
+
+    def has_pending(self) -> bool:
+        return bool(self._entries)
+
+    def _claim(self, key: str) -> Optional[_Entry]:
+        """The entry to wait for, or None; a prediction not started yet is cancelled (a direct call is faster)."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and entry.future is not None:
+                self._session(entry.session).served.add(key)
+        if entry is None or entry.future is None:
+            return None
+        if not entry.started and entry.future.cancel():
+            with self._lock:
+                self._stats["cancelled"] += 1
+            return None
+        return entry
+
+    def _hit(self) -> None:
+        with self._lock:
+            self._stats["hits"] += 1
+
+    def take(self, key: str) -> Optional[str]:
+        """The prefetched reply for a request key (waiting if it is being generated, within the turn deadline), or None."""
+        entry = self._claim(key)
+        if entry is None:
+            return None
+        try:
+            content = entry.future.result(timeout=time_left(TURN_DEADLINE_SECONDS))
+        except (concurrent.futures.CancelledError, Exception):
+            return None
+        self._hit()
+        return content or None
+
+    async def atake(self, key: str) -> Optional[str]:
+        """take() for the async nodes: waits without blocking the event loop."""
+        entry = self._claim(key)
+        if entry is None:
+            return None
+        try:
+            content = await asyncio.wait_for(asyncio.wrap_future(entry.future), time_left(TURN_DEADLINE_SECONDS))
+        except asyncio.CancelledError:
+            if entry.future.cancelled():
+                return None
+            raise
+        except Exception:
+            return None
+        self._hit()
+        return content or None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "pending": len(self._entries)}
@@ -0,0 +1,270 @@
+"""
+Fast local checks for common React/JSX/TSX mistakes, run before a pasted
+snippet goes to the LLM reviewer. Pattern-based, not a parser: every rule
+aims to be cheap and to stay quiet when unsure.
+
+Findings are dicts: {"rule", "line", "severity", "message", "fundamental"}.
+"error" findings are definite bugs that a learner can act on without an
+LLM review; "warning" findings may be intended (an effect meant to run
+after every render) and are passed along to the reviewer.
+"""
+import hashlib
+import re
+from typing import Any, Dict, List, Optional
+
+Finding = Dict[str, Any]
+
+# Strings are matched first so comment markers inside them are left alone.
+_STRINGS_OR_COMMENTS = re.compile(
+    r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`)|//[^\n]*|/\*.*?\*/', re.DOTALL
+)
+_SETTER_DECL = re.compile(r"const\s*\[\s*(\w+)\s*,\s*(set\w+)\s*\]\s*=\s*(?:React\.)?useState\b")
+_COMPONENT = re.compile(
+    r"(?:function\s+([A-Z]\w*)\s*\([^)]*\)\s*(?::[^{]+)?\{|const\s+([A-Z]\w*)\s*(?::[^=]+)?=\s*(?:\([^)]*\)|\w+)\s*(?::[^=]+)?=>\s*\{)"
+)
+
+
+def strip_comments(code: str) -> str:
+    """Code without comments; newlines are kept so line numbers still match."""
+    return _STRINGS_OR_COMMENTS.sub(lambda m: m.group(1) or "\n" * m.group(0).count("\n"), code)
+
+
+def normalize_code(code: str) -> str:
+    """Code without comments and with all whitespace runs collapsed, for hashing."""
+    return " ".join(strip_comments(code).split())
+
+
+def review_key(code: str, stage_info: str) -> str:
+    """Memo key for a review: same code modulo comments/whitespace, same stage."""
+    return hashlib.sha256(f"{normalize_code(code)}\0{stage_info}".encode("utf-8")).hexdigest()
+
+
+def _line(code: str, pos: int) -> int:
+    return code.count("\n", 0, pos) + 1
+
+
+def _close(code: str, start: int, open_ch: str = "(", close_ch: str = ")") -> int:
+    """Index of the bracket closing the one at `start` (strings skipped), or -1."""
+    depth, i, quote = 0, start, None
+    while i < len(code):
+        ch = code[i]
+        if quote:
+            if ch == "\\":
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in "\"'`":
+            quote = ch
+        elif ch == open_ch:
+            depth += 1
+        elif ch == close_ch:
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return -1
+
+
+def _top_level_args(text: str) -> List[str]:
+    args, depth, current, quote = [], 0, [], None
+    for i, ch in enumerate(text):
+        if quote:
+            if ch == quote and text[i - 1] != "\\":
+                quote = None
+        elif ch in "\"'`":
+            quote = ch
+        elif ch in "([{":
+            depth += 1
+        elif ch in ")]}":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    if "".join(current).strip():
+        args.append("".join(current))
+    return args
+
+
+def _finding(code: str, pos: int, rule: str, severity: str, message: str, fundamental: str) -> Finding:
+    return {"rule": rule, "line": _line(code, pos), "severity": severity, "message": message, "fundamental": fundamental}
+
+
+# --- Rules (each takes comment-free code and returns findings) ---
+def _effect_rules(code: str) -> List[Finding]:
+    findings = []
+    for m in re.finditer(r"\b(?:React\.)?use(?:Layout)?Effect\s*\(", code):
+        open_at = m.end() - 1
+        close_at = _close(code, open_at)
+        if close_at < 0:
+            continue
+        args = _top_level_args(code[open_at + 1:close_at])
+        if args and re.match(r"\s*async\b", args[0]):
+            findings.append(_finding(
+                code, m.start(), "async-effect", "error",
+                "The effect callback is async; effects must return nothing or a cleanup function. "
+                "Define an async function inside the effect and call it.",
+                "useEffect with async code",
+            ))
+        if len(args) == 1:
+            findings.append(_finding(
+                code, m.start(), "effect-missing-deps", "warning",
+                "useEffect has no dependency array, so it runs after every render "
+                "(and loops forever if it sets state). Fine if that is intended.",
+                "useEffect dependencies",
+            ))
+    return findings
+
+
+def _component_bodies(code: str) -> List[tuple]:
+    bodies = []
+    for m in _COMPONENT.finditer(code):
+        open_at = m.end() - 1
+        close_at = _close(code, open_at, "{", "}")
+        if close_at > 0:
+            bodies.append((open_at + 1, close_at))
+    return bodies
+
+
+def _set_state_in_render(code: str) -> List[Finding]:
+    setters = {m.group(2) for m in _SETTER_DECL.finditer(code)}
+    if not setters:
+        return []
+    findings = []
+    call = re.compile(r"\b(" + "|".join(map(re.escape, sorted(setters))) + r")\s*\(")
+    for start, end in _component_bodies(code):
+        depth, i, statement_start = 0, start, start
+        while i < end:
+            ch = code[i]
+            if ch in "{([":
+                depth += 1
+            elif ch in "})]":
+                depth -= 1
+            elif ch in ";\n" and depth == 0:
+                statement_start = i + 1
+            elif depth == 0:
+                m = call.match(code, i)
+                if m and (i == 0 or not (code[i - 1].isalnum() or code[i - 1] in "_.")):
+                    statement = code[statement_start:i]
+                    # Calls inside handlers defined in the body (`const f = () => setX(1)`) are fine.
+                    if "=>" not in statement and "function" not in statement and not statement.strip().startswith("return"):
+                        findings.append(_finding(
+                            code, i, "set-state-in-render", "error",
+                            f"`{m.group(1)}` is called directly in the component body, which triggers "
+                            "another render on every render. Call it from an event handler or an effect.",
+                            "state updates and re-rendering",
+                        ))
+                    i = m.end()
+                    continue
+            i += 1
+    return findings
+
+
+def _jsx_rules(code: str) -> List[Finding]:
+    findings = []
+    for m in re.finditer(r"<[a-z][\w.-]*\b[^<>]*?\s(class|for)\s*=", code):
+        fix = "className" if m.group(1) == "class" else "htmlFor"
+        findings.append(_finding(
+            code, m.start(1), f"jsx-{m.group(1)}-attribute", "error",
+            f"JSX uses `{fix}`, not `{m.group(1)}`.", "JSX attributes vs HTML",
+        ))
+    for m in re.finditer(r"\sstyle\s*=\s*[\"']", code):
+        findings.append(_finding(
+            code, m.start(), "jsx-style-string", "error",
+            "`style` takes an object in JSX, e.g. style={{ color: 'red' }}.", "JSX attributes vs HTML",
+        ))
+    for m in re.finditer(r"\s(on[A-Z]\w*)\s*=\s*\{\s*([A-Za-z_$][\w$.]*)\s*\(([^()]*)\)\s*\}", code):
+        # With arguments it may be a handler factory (`onClick={select(id)}`), so only warn.
+        findings.append(_finding(
+            code, m.start(1), "handler-called-in-render", "warning" if m.group(3).strip() else "error",
+            f"`{m.group(1)}={{{m.group(2)}(...)}}` calls the handler while rendering; "
+            f"pass a function instead: `{m.group(1)}={{() => {m.group(2)}(...)}}`.",
+            "event handlers",
+        ))
+    for m in re.finditer(r"\.map\s*\(", code):
+        close_at = _close(code, m.end() - 1)
+        body = code[m.end():close_at] if close_at > 0 else ""
+        tag = re.search(r"=>\s*(?:\(\s*)?(<[A-Za-z][^>]*>)", body)
+        if tag and "key=" not in tag.group(1):
+            findings.append(_finding(
+                code, m.start(), "missing-key", "warning",
+                "Elements rendered from `.map()` need a stable `key` prop.", "lists and keys",
+            ))
+    return findings
+
+
+def _mutation_rules(code: str) -> List[Finding]:
+    findings = []
+    for m in _SETTER_DECL.finditer(code):
+        name = m.group(1)
+        for mut in re.finditer(rf"\b{re.escape(name)}\s*(?:\.(push|pop|splice|sort|reverse|shift|unshift)\s*\(|\[[^\]]+\]\s*=[^=]|\.\w+\s*=[^=])", code):
+            findings.append(_finding(
+                code, mut.start(), "state-mutation", "error",
+                f"`{name}` is state and is mutated in place; React won't re-render. "
+                f"Build a new value and pass it to `{m.group(2)}`.",
+                "immutable state updates",
+            ))
+    return findings
+
+
+def _hook_rules(code: str) -> List[Finding]:
+    findings = []
+    for m in re.finditer(r"\b(?:if|for|while)\s*\([^)]*\)\s*\{[^{}]*?\b(use[A-Z]\w*)\s*\(", code):
+        findings.append(_finding(
+            code, m.start(1), "conditional-hook", "error",
+            f"`{m.group(1)}` is called inside a condition or loop; hooks must run in the same order every render.",
+            "rules of hooks",
+        ))
+    return findings
+
+
+# Coaching hints for reviews from the findings alone: point at the concept, not the fix.
+HINTS = {
+    "effect-missing-deps": "Ask yourself which values this effect reads, and when it actually needs to re-run.",
+    "async-effect": "Think about what an effect is allowed to return, and where the async work could live instead.",
+    "set-state-in-render": "Rendering should only describe the UI; look for the event or effect that should cause this update.",
+    "state-mutation": "React compares state by reference. What happens to the reference when you change it in place?",
+    "conditional-hook": "Hooks are identified by call order. What happens to that order when the condition changes?",
+    "jsx-class-attribute": "JSX is JavaScript, so some HTML attribute names are reserved words there.",
+    "jsx-for-attribute": "JSX is JavaScript, so some HTML attribute names are reserved words there.",
+    "jsx-style-string": "In JSX, `style` describes CSS as a JavaScript object.",
+    "handler-called-in-render": "Are you giving React a function to call later, or calling it right now?",
+}
+GENERIC_HINT = "Walk through what your code does on the first render and after each state change."
+
+RULES = [_effect_rules, _set_state_in_render, _jsx_rules, _mutation_rules, _hook_rules]
+
+
+def lint_react(code: str) -> List[Finding]:
+    """All findings for a snippet, by line."""
+    clean = strip_comments(code)
+    findings = [f for rule in RULES for f in rule(clean)]
+    return sorted(findings, key=lambda f: (f["line"], f["rule"]))
+
+
+def local_review(findings: List[Finding]) -> Optional[Dict[str, str]]:
+    """A complete review from the findings alone, or None when an LLM review is still needed."""
+    errors = [f for f in findings if f["severity"] == "error"]
+    if not errors:
+        return None
+    return {
+        "issues": format_findings(findings),
+        "suggested_fundamentals": ", ".join(dict.fromkeys(f["fundamental"] for f in findings)),
+        "high_level_hint": HINTS.get(errors[0]["rule"], errors[0]["message"]),
+        "source": "local",
+    }
+
+
+def fallback_review(findings: List[Finding]) -> Dict[str, str]:
+    """A review from the warnings alone (or a generic nudge), for when the LLM reviewer gives nothing usable."""
+    return {
+        "issues": format_findings(findings) or "Couldn't review this automatically right now.",
+        "suggested_fundamentals": ", ".join(dict.fromkeys(f["fundamental"] for f in findings)) or "N/A",
+        "high_level_hint": HINTS.get(findings[0]["rule"], findings[0]["message"]) if findings else GENERIC_HINT,
+        "source": "local",
+    }
+
+
+def format_findings(findings: List[Finding]) -> str:
+    return "\n".join(f"- Line {f['line']}: {f['message']}" for f in findings)
@@ -0,0 +1,99 @@
+"""
+Session recording for load tests.
+
+With SESSION_RECORD=path, build_graph attaches a `SessionRecorder` callback
+that appends one JSON line per graph run (one learner turn), whichever
+entry point ran it (CLI, Streamlit, the server):
+
+    {"session": thread_id, "turn": 0, "ts": start (epoch s), "gap_s": seconds since the
+     session's previous turn ended (reading/typing time), "input": the learner's message,
+     "elapsed_ms": turn wall time, "status": "ok" or the exception type}
+
+Inputs are written verbatim, so only record sessions you may keep.
+benchmarks/replay.py replays a recording against a stub model server.
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+RECORD_PATH = os.getenv("SESSION_RECORD") or None
+
+
+def input_text(graph_input: Any) -> Optional[str]:
+    """The learner message a graph input carries (the last message), if any."""
+    messages = graph_input.get("messages") if isinstance(graph_input, dict) else None
+    if not messages:
+        return None
+    content = getattr(messages[-1], "content", messages[-1])
+    return content if isinstance(content, str) else None
+
+
+class SessionRecorder(BaseCallbackHandler):
+    """Writes each root graph run's input and timing to a JSONL file (see the module docstring)."""
+
+    run_inline = True
+    ignore_llm = True
+    ignore_chat_model = True
+    ignore_agent = True
+    ignore_retriever = True
+    ignore_retry = True
+    ignore_custom_event = True
+
+    def __init__(self, path: Optional[str] = RECORD_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._runs: Dict[UUID, Tuple[str, str, float, float]] = {}
+        self._turns: Dict[str, int] = {}
+        self._last_end: Dict[str, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                       metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        # Only whole turns: node and subgraph runs have a parent (or a task namespace)
+        if parent_run_id is not None or "langgraph_checkpoint_ns" in (metadata or {}):
+            return
+        text = input_text(inputs)
+        session = (metadata or {}).get("thread_id")
+        if text is None or session is None:
+            return
+        with self._lock:
+            self._runs[run_id] = (str(session), text, time.time(), time.perf_counter())
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._write(run_id, "ok")
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._write(run_id, type(error).__name__)
+
+    def _write(self, run_id: UUID, status: str) -> None:
+        end = time.perf_counter()
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            if run is None:
+                return
+            session, text, wall, start = run
+            turn = self._turns.get(session, 0)
+            previous = self._last_end.get(session)
+            self._turns[session] = turn + 1
+            self._last_end[session] = end
+            record = {
+                "session": session,
+                "turn": turn,
+                "ts": round(wall, 3),
+                "gap_s": round(start - previous, 3) if previous is not None else None,
+                "input": text,
+                "elapsed_ms": round((end - start) * 1000, 1),
+                "status": status,
+            }
+            if self._file is None:
+                self._file = open(self.path, "a", buffering=1)
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -0,0 +1,143 @@
+"""
+Incremental replanning.
+
+When the learner adds a feature or changes level mid-plan, stages before
+`current_stage_index` are done and stay as they are. The model only sees a
+compact view of the remaining stages plus what changed since the plan was
+made (`state["plan_basis"]`), and answers with just those stages: unchanged
+ones by their number, changed or new ones in full. The reply is merged
+back by stage number/name.
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from json_stream import repair_json
+
+# REPLAN_INCREMENTAL=off regenerates the whole plan on every replan (the old behaviour).
+INCREMENTAL = os.getenv("REPLAN_INCREMENTAL", "on").lower() not in ("0", "off", "false", "no")
+
+STAGE_FIELDS = ("name", "goal", "tasks", "fundamentals", "docs", "features")
+
+
+def plan_basis(state: Dict[str, Any]) -> Dict[str, Any]:
+    """What a plan was generated from; stored next to the stages to diff against later."""
+    return {
+        "level": state["learner_profile"].get("assumed_level", "beginner"),
+        "features": list(state["project_spec"].get("features", [])),
+    }
+
+
+def plan_changes(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Features added/removed and level change since the plan was made."""
+    basis = state.get("plan_basis") or {}
+    current = plan_basis(state)
+    if "features" in basis:
+        before = basis["features"]
+    else:
+        # Plans made before plan_basis existed: features no stage covers are new.
+        before = [f for stage in state.get("stages", []) for f in stage.get("features", [])]
+    return {
+        "added_features": [f for f in current["features"] if f not in before],
+        "removed_features": [f for f in before if f not in current["features"]],
+        "level": (basis.get("level"), current["level"]) if basis.get("level", current["level"]) != current["level"] else None,
+    }
+
+
+def _describe(changes: Dict[str, Any]) -> str:
+    parts = []
+    if changes["added_features"]:
+        parts.append(f"added features: {', '.join(changes['added_features'])}")
+    if changes["removed_features"]:
+        parts.append(f"removed features: {', '.join(changes['removed_features'])}")
+    if changes["level"]:
+        parts.append(f"level {changes['level'][0]} -> {changes['level'][1]} (adjust depth of remaining stages)")
+    return "; ".join(parts) or "none (tidy up remaining stages)"
+
+
+def can_replan_incrementally(state: Dict[str, Any]) -> bool:
+    return INCREMENTAL and state.get("status") == "replan" and bool(state.get("stages"))
+
+
+def replan_messages(state: Dict[str, Any]) -> List[Any]:
+    """Prompt naming only the remaining stages (number, name, features); done ones are just counted."""
+    stages = state["stages"]
+    idx = min(state.get("current_stage_index", 0), len(stages))
+    level = state["learner_profile"].get("assumed_level", "beginner")
+    remaining = "\n".join(
+        f"{i}. {s['name']} [{', '.join(s.get('features', []))}]" for i, s in enumerate(stages[idx:], idx + 1)
+    )
+
+    system = SystemMessage(content=(
+        f"React/TS replanner for {level} learners. Update only the remaining stages for the change.\n"
+        'JSON only: {"stages": [...]}, remaining stages in order; unchanged = its number, '
+        "changed/new = {name, goal, tasks[], fundamentals[], docs[], features[]}."
+    ))
+    human = HumanMessage(content=(
+        f"Project: {state['project_spec'].get('summary', '')}\n"
+        + (f"Stages 1-{idx} done.\n" if idx else "")
+        + f"Change: {_describe(plan_changes(state))}\n"
+        + f"Remaining:\n{remaining}"
+    ))
+    return [system, human]
+
+
+def _key(name: Any) -> str:
+    return " ".join(str(name).lower().split())
+
+
+def _parse_stages(reply: str) -> Optional[List[Any]]:
+    try:
+        data = repair_json(reply)
+    except ValueError:
+        return None
+    stages = data.get("stages") if isinstance(data, dict) else data
+    if not isinstance(stages, list):
+        return None
+    return [s for s in stages if isinstance(s, int) or (isinstance(s, dict) and s.get("name"))]
+
+
+def merge_replan(state: Dict[str, Any], reply: str) -> List[Dict[str, Any]]:
+    """
+    Done stages + the model's remaining stages: kept ones (by number, or
+    {"name", "keep": true}) are reused as-is, changed ones overlay the old
+    stage of the same name.
+    An unparseable reply keeps the old stages; added features no stage
+    picked up go to the last stage.
+    """
+    stages = state["stages"]
+    idx = min(state.get("current_stage_index", 0), len(stages))
+    frozen, tail = stages[:idx], stages[idx:]
+    by_name = {_key(s["name"]): s for s in tail}
+
+    proposed = _parse_stages(reply)
+    merged: List[Dict[str, Any]] = []
+    for item in proposed or []:
+        if isinstance(item, int):
+            # Unchanged stage, by its 1-based plan number
+            if idx < item <= len(stages):
+                merged.append(stages[item - 1])
+            continue
+        old = by_name.get(_key(item["name"]))
+        if item.get("keep"):
+            if old is not None:
+                merged.append(old)
+            continue
+        stage = dict(old) if old is not None else {"goal": "", "tasks": [], "fundamentals": [], "docs": [], "features": []}
+        stage.update({field: item[field] for field in STAGE_FIELDS if field in item})
+        merged.append(stage)
+    if not merged:
+        merged = [dict(s) for s in tail]
+
+    changes = plan_changes(state)
+    covered = {f for stage in frozen + merged for f in stage.get("features", [])}
+    missing = [f for f in changes["added_features"] if f not in covered]
+    if missing and merged:
+        merged[-1] = dict(merged[-1], features=list(merged[-1].get("features", [])) + missing)
+    elif missing:
+        merged.append({
+            "name": f"Add {', '.join(missing)}", "goal": f"Integrate {', '.join(missing)} into the project",
+            "tasks": [], "fundamentals": [], "docs": [], "features": missing,
+        })
+    return frozen + merged
@@ -0,0 +1,356 @@
+"""
+Deadlines, retries, hedged requests and a circuit breaker for model calls.
+
+call_llm/acall_llm send every model request through `Resilience.call`
+(`acall` for async nodes):
+
+- Deadline: a turn started with `with_deadline(config)` (TurnStream and the
+  server do) carries an absolute deadline, TURN_DEADLINE_SECONDS after it
+  starts; every call of the turn, retries included, has to finish by then.
+  Each attempt is also cut off after LLM_ATTEMPT_TIMEOUT_SECONDS.
+- Retries: failed or timed-out attempts are retried up to LLM_RETRIES times,
+  with exponential backoff and full jitter; client errors (HTTP 4xx other
+  than 408/409/429) are not retried.
+- Hedging: when an attempt of a hedgeable node runs longer than that node's
+  recent p95 (once HEDGE_MIN_SAMPLES calls have been seen), a duplicate
+  request is sent and the first reply wins; the other request is cancelled.
+  At most HEDGE_MAX_RATIO of calls are hedged, so a backend that is slow
+  for everyone isn't sent twice the load.
+- Circuit breaker, per model: BREAKER_FAILURES failed attempts in a row
+  open it, and calls fail fast for BREAKER_RESET_SECONDS; then one trial
+  call is let through (half-open), which closes it again on success.
+
+An open breaker, a missed deadline or running out of retries raise
+BackendUnavailable, which call_llm answers with a degraded local reply
+instead of failing the turn. LLM_RESILIENCE=off calls the model directly.
+"""
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langgraph.config import get_config
+
+ENABLED = os.getenv("LLM_RESILIENCE", "on").lower() not in ("0", "off", "false", "no")
+TURN_DEADLINE_SECONDS = float(os.getenv("TURN_DEADLINE_SECONDS", "90"))
+ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "45"))
+RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+BACKOFF_SECONDS = float(os.getenv("LLM_RETRY_BACKOFF_SECONDS", "0.5"))
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "on").lower() not in ("0", "off", "false", "no")
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+CALL_THREADS = int(os.getenv("LLM_CALL_THREADS", "64"))  # sync attempts run here, so they can be timed out
+WINDOW = 200  # successful call latencies kept per node for the hedge delay
+
+# "__" keeps the deadline out of run metadata (and so out of checkpoints)
+DEADLINE_KEY = "__coach_deadline"
+EVENTS = ("calls", "retries", "hedges", "hedge_wins", "timeouts", "failures", "short_circuits", "degraded")
+
+
+class BackendUnavailable(Exception):
+    """The model didn't answer in time, or at all; call_llm serves a degraded reply instead."""
+
+
+class DeadlineExceeded(BackendUnavailable, TimeoutError):
+    """The turn's deadline passed before the model answered."""
+
+
+class CircuitOpen(BackendUnavailable):
+    """The model's circuit breaker is open; the call wasn't attempted."""
+
+
+class StreamBroken(BackendUnavailable):
+    """A streamed reply failed after part of it was shown; retrying would show it twice."""
+
+
+class Superseded(Exception):
+    """A hedged attempt that lost the race and stopped early."""
+
+
+def with_deadline(config: Dict[str, Any], seconds: float = TURN_DEADLINE_SECONDS) -> Dict[str, Any]:
+    """A copy of the run config whose turn has to finish within `seconds`."""
+    configurable = {**config.get("configurable", {}), DEADLINE_KEY: time.monotonic() + seconds}
+    return {**config, "configurable": configurable}
+
+
+def deadline() -> Optional[float]:
+    """The current turn's deadline (a time.monotonic() value); None outside a turn that has one."""
+    try:
+        return get_config().get("configurable", {}).get(DEADLINE_KEY)
+    except RuntimeError:
+        return None
+
+
+def time_left(default: float) -> float:
+    """Seconds until the current turn's deadline, capped at `default` (which applies without one)."""
+    end = deadline()
+    return default if end is None else max(0.0, min(default, end - time.monotonic()))
+
+
+def retryable(exc: BaseException) -> bool:
+    """Everything but client errors: a bad request or key fails the same way again."""
+    status = getattr(exc, "status_code", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status not in (408, 409, 429))
+
+
+class CircuitBreaker:
+    """Closed until `failures` attempts fail in a row; open for `reset_after` s; then one trial call."""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_after: float = BREAKER_RESET_SECONDS):
+        self.threshold = failures
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opens = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self._opened_at >= self.reset_after else "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go to the model now (in half-open state, only the one trial call)."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.reset_after:
+                return False
+            self._trial = True
+            return True
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self._trial = False
+            if ok:
+                self.failures, self._opened_at = 0, None
+                return
+            self.failures += 1
+            if self._opened_at is not None or self.failures >= self.threshold:
+                # A failed trial call opens it again for another reset period
+                self.opens += self._opened_at is None
+                self._opened_at = time.monotonic()
+
+
+class Resilience:
+    """Runs model calls under the turn deadline with retries, hedging and per-model circuit breakers."""
+
+    def __init__(self, enabled: bool = ENABLED, retries: int = RETRIES,
+                 attempt_timeout: float = ATTEMPT_TIMEOUT_SECONDS, backoff: float = BACKOFF_SECONDS,
+                 hedge: bool = HEDGE_ENABLED, hedge_min_samples: int = HEDGE_MIN_SAMPLES,
+                 hedge_max_ratio: float = HEDGE_MAX_RATIO, breaker_failures: int = BREAKER_FAILURES,
+                 breaker_reset: float = BREAKER_RESET_SECONDS):
+        self.enabled = enabled
+        self.retries = retries
+        self.attempt_timeout = attempt_timeout
+        self.backoff = backoff
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_max_ratio = hedge_max_ratio
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=WINDOW))
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = self._breakers[model] = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+            return breaker
+
+    def count(self, event: str, n: int = 1) -> None:
+        with self._lock:
+            self._counts[event] += n
+
+    def hedge_delay(self, node: str) -> Optional[float]:
+        """The node's recent p95 call latency, None while there are too few calls to tell."""
+        if not self.hedge:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies[node])
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * HEDGE_QUANTILE))]
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            if self._counts["hedges"] >= self.hedge_max_ratio * self._counts["calls"]:
+                return False
+            self._counts["hedges"] += 1
+            return True
+
+    def _start(self, model: str) -> Tuple[float, CircuitBreaker]:
+        """The call's deadline and its model's breaker; counts the call."""
+        self.count("calls")
+        return time.monotonic() + time_left(TURN_DEADLINE_SECONDS), self.breaker(model)
+
+    def _admit(self, model: str, breaker: CircuitBreaker, end: float) -> float:
+        """The current attempt's cutoff; raises instead when the deadline has passed or the breaker is open."""
+        now = time.monotonic()
+        if now >= end:
+            self.count("timeouts")
+            raise DeadlineExceeded(f"turn deadline passed before calling {model}")
+        if not breaker.allow():
+            self.count("short_circuits")
+            raise CircuitOpen(f"{model} is failing; retrying in up to {breaker.reset_after:g}s")
+        return min(end, now + self.attempt_timeout)
+
+    def _succeeded(self, node: str, breaker: CircuitBreaker, seconds: float) -> None:
+        breaker.record(True)
+        with self._lock:
+            self._latencies[node].append(seconds)
+
+    def _failed(self, model: str, breaker: CircuitBreaker, exc: Exception, tries: int, end: float) -> float:
+        """Record a failed attempt; the backoff before the next one, or raise when there is none."""
+        if isinstance(exc, StreamBroken) or not retryable(exc):
+            # After a client error the model did answer (the request was at fault); a broken stream didn't
+            breaker.record(not retryable(exc))
+            self.count("failures")
+            raise exc
+        breaker.record(False)
+        timed_out = isinstance(exc, TimeoutError)
+        self.count("timeouts" if timed_out else "failures")
+        if time.monotonic() >= end:
+            raise DeadlineExceeded(f"{model} didn't answer before the turn deadline") from exc
+        delay = random.uniform(0, self.backoff * 2 ** tries)  # full jitter
+        if tries >= self.retries or time.monotonic() + delay >= end:
+            raise BackendUnavailable(f"{model} failed {tries + 1} time(s): {exc!r}") from exc
+        self.count("retries")
+        return delay
+
+    def call(self, node: str, model: str, attempt: Callable[[threading.Event], Any], hedge: bool = False) -> Any:
+        """
+        `attempt(cancelled)` makes one request and returns the reply; it runs on
+        a worker thread so it can be timed out, and should stop early once
+        `cancelled` is set (a hedge won, or it ran out of time).
+        """
+        if not self.enabled:
+            return attempt(threading.Event())
+        end, breaker = self._start(model)
+        tries = 0
+        while True:
+            cutoff = self._admit(model, breaker, end)
+            start = time.monotonic()
+            try:
+                result = self._race(node, attempt, cutoff, hedge)
+            except Exception as exc:
+                time.sleep(self._failed(model, breaker, exc, tries, end))
+                tries += 1
+                continue
+            self._succeeded(node, breaker, time.monotonic() - start)
+            return result
+
+    async def acall(self, node: str, model: str, attempt: Callable[[], Awaitable[Any]], hedge: bool = False) -> Any:
+        """Async call: `attempt()` is awaited as a task, and cancelled when it loses or runs out of time."""
+        if not self.enabled:
+            return await attempt()
+        end, breaker = self._start(model)
+        tries = 0
+        while True:
+            cutoff = self._admit(model, breaker, end)
+            start = time.monotonic()
+            try:
+                result = await self._arace(node, attempt, cutoff, hedge)
+            except Exception as exc:
+                await asyncio.sleep(self._failed(model, breaker, exc, tries, end))
+                tries += 1
+                continue
+            self._succeeded(node, breaker, time.monotonic() - start)
+            return result
+
+    def _submit(self, attempt: Callable[[threading.Event], Any]) -> Tuple[Future, threading.Event]:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=CALL_THREADS, thread_name_prefix="llm-call")
+        cancelled = threading.Event()
+        # Each attempt gets its own copy of the caller's context (graph config, callbacks, stream writer)
+        return self._pool.submit(contextvars.copy_context().run, attempt, cancelled), cancelled
+
+    def _hedge_at(self, node: str, hedge: bool) -> Optional[float]:
+        delay = self.hedge_delay(node) if hedge else None
+        return None if delay is None else time.monotonic() + delay
+
+    def _race(self, node: str, attempt: Callable[[threading.Event], Any], cutoff: float, hedge: bool) -> Any:
+        """One attempt, plus a hedge if it is still running at the node's p95; the first reply."""
+        hedge_at = self._hedge_at(node, hedge)
+        runs = [self._submit(attempt)]
+        try:
+            while True:
+                until = cutoff if hedge_at is None else min(cutoff, hedge_at)
+                wait([future for future, _ in runs], timeout=max(0.0, until - time.monotonic()),
+                     return_when=FIRST_COMPLETED)
+                done, result = self._settled([future for future, _ in runs])
+                if done:
+                    return result
+                if time.monotonic() >= cutoff:
+                    raise TimeoutError(f"no reply from the model within {self.attempt_timeout:g}s")
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    if self._may_hedge():
+                        runs.append(self._submit(attempt))
+        finally:
+            for future, cancelled in runs:
+                cancelled.set()
+                future.cancel()
+
+    async def _arace(self, node: str, attempt: Callable[[], Awaitable[Any]], cutoff: float, hedge: bool) -> Any:
+        hedge_at = self._hedge_at(node, hedge)
+        tasks = [asyncio.ensure_future(attempt())]
+        try:
+            while True:
+                until = cutoff if hedge_at is None else min(cutoff, hedge_at)
+                await asyncio.wait(tasks, timeout=max(0.0, until - time.monotonic()), return_when=asyncio.FIRST_COMPLETED)
+                done, result = self._settled(tasks)
+                if done:
+                    return result
+                if time.monotonic() >= cutoff:
+                    raise TimeoutError(f"no reply from the model within {self.attempt_timeout:g}s")
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    if self._may_hedge():
+                        tasks.append(asyncio.ensure_future(attempt()))
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # retrieved, so a failed loser isn't logged as never retrieved
+
+    def _settled(self, runs: List[Any]) -> Tuple[bool, Any]:
+        """
+        (True, result) for the first successful attempt among finished ones
+        (futures or tasks); raises once every attempt has failed; (False, None)
+        while one is still running.
+        """
+        for i, run in enumerate(runs):
+            if run.done() and not run.cancelled() and run.exception() is None:
+                if i:
+                    self.count("hedge_wins")
+                return True, run.result()
+        if not all(run.done() for run in runs):
+            return False, None
+        errors = [run.exception() for run in runs if not run.cancelled()]
+        raise next((e for e in errors if not isinstance(e, Superseded)), errors[0] if errors else TimeoutError())
+
+    def stats(self) -> Dict[str, Any]:
+        """Event counts since start, and each model's breaker state."""
+        with self._lock:
+            counts = {event: self._counts.get(event, 0) for event in EVENTS}
+            breakers = dict(self._breakers)
+        return {**counts, "breakers": {model: {"state": b.state, "opens": b.opens} for model, b in breakers.items()}}
+
@@ -0,0 +1,118 @@
+"""
+Lexical retrieval over the docs corpus: tokenized inverted index + BM25.
+"""
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with a light plural strip ("hooks" -> "hook")."""
+    tokens = []
+    for tok in TOKEN_RE.findall(text.lower()):
+        if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+            tok = tok[:-1]
+        tokens.append(tok)
+    return tokens
+
+
+class BM25Index:
+    """
+    Inverted index (term -> {doc_id: term frequency}) scored with Okapi BM25.
+    Built once; queries only touch the postings of their own terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_len: Dict[int, int] = {}
+        self.total_len = 0
+        self._norms: Dict[int, float] = {}
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], **kwargs) -> "BM25Index":
+        """Index texts under ids 0..n-1 (their position)."""
+        index = cls(**kwargs)
+        for doc_id, text in enumerate(texts):
+            index.add(doc_id, text)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def add(self, doc_id: int, text: str) -> None:
+        tokens = tokenize(text)
+        self.add_terms(doc_id, len(tokens), Counter(tokens))
+
+    def add_terms(self, doc_id: int, length: int, counts: Dict[str, int]) -> None:
+        """add() from an already tokenized doc: its length and term frequencies."""
+        self.doc_len[doc_id] = length
+        self.total_len += length
+        self._norms = {}
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id: int, text: str) -> None:
+        """Drop a doc; `text` must be what it was added with, so only its own postings are touched."""
+        self.remove_terms(doc_id, set(tokenize(text)))
+
+    def remove_terms(self, doc_id: int, terms: Iterable[str]) -> None:
+        if doc_id not in self.doc_len:
+            return
+        self.total_len -= self.doc_len.pop(doc_id)
+        self._norms = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        n = len(self.doc_len)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _length_norms(self) -> Dict[int, float]:
+        """Per-doc k1 * (1 - b + b * dl / avgdl), recomputed only after the index changes."""
+        if not self._norms:
+            avgdl = self.total_len / len(self.doc_len) or 1.0
+            k1, b = self.k1, self.b
+            self._norms = {d: k1 * (1 - b + b * dl / avgdl) for d, dl in self.doc_len.items()}
+        return self._norms
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[float, int]]:
+        """Top-k (score, doc_id) pairs, best first; docs with no matching term are skipped."""
+        if not self.doc_len or k <= 0:
+            return []
+        norms = self._length_norms()
+        k1 = self.k1
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, tf in postings.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norms[doc_id])
+        # Ties go to the lower doc id so results are stable across runs.
+        top = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(score, doc_id) for doc_id, score in top]
+
+
+def fuse_rankings(rankings: List[List[Tuple[float, int]]], k: int = 3, rrf_k: int = 60) -> List[Tuple[float, int]]:
+    """
+    Reciprocal rank fusion: merge several best-first (score, doc_id) lists
+    without having to calibrate their score scales against each other.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (_, doc_id) in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    top = heapq.nlargest(k, fused.items(), key=lambda item: (item[1], -item[0]))
+    return [(score, doc_id) for doc_id, score in top]
@@ -0,0 +1,147 @@
+"""
+Code review for whole pastes: every fenced block is reviewed, large files
+are split at top-level component/function boundaries, and the pieces are
+reviewed concurrently (thread pool, or asyncio in the async graph) under a
+total deadline, cut short by the turn's own deadline (resilience.py).
+Per-piece reviews come from tools.analyze_code_snippet and are merged into
+one review dict of the same shape.
+"""
+import asyncio
+import contextvars
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from resilience import time_left
+from tools import aanalyze_code_snippet, analyze_code_snippet
+
+REVIEW_WORKERS = int(os.getenv("REVIEW_WORKERS", "4"))
+REVIEW_DEADLINE_SECONDS = float(os.getenv("REVIEW_DEADLINE_SECONDS", "30"))
+CHUNK_LINES = int(os.getenv("REVIEW_CHUNK_LINES", "80"))  # files longer than this are split
+
+_FENCE = re.compile(r"```[\w+-]*[^\S\n]*\n(.*?)```", re.DOTALL)
+# Top-level declarations a file can be cut before (column 0, so nested code never matches).
+_BOUNDARY = re.compile(
+    r"^(?:export\s+(?:default\s+)?)?(?:async\s+)?(?:function\s+(\w+)|class\s+(\w+)|(?:const|let)\s+(\w+)\s*(?::[^=]+)?=)",
+    re.MULTILINE,
+)
+
+Chunk = Tuple[str, str]  # (label, code)
+
+
+def extract_code_blocks(text: str) -> List[str]:
+    """Every non-empty fenced code block in a message, in order."""
+    return [block.strip() for block in _FENCE.findall(text) if block.strip()]
+
+
+def split_code(code: str, max_lines: int = CHUNK_LINES) -> List[Chunk]:
+    """
+    Cut code longer than max_lines before top-level declarations and pack
+    consecutive declarations into pieces of up to max_lines. Labels name
+    the declarations a piece contains.
+    """
+    lines = code.splitlines()
+    starts = sorted({0} | {code.count("\n", 0, m.start()) for m in _BOUNDARY.finditer(code)})
+    if len(lines) <= max_lines or len(starts) == 1:
+        return [(_label(code), code)]
+    sections = [lines[a:b] for a, b in zip(starts, starts[1:] + [len(lines)])]
+
+    chunks: List[Chunk] = []
+    current: List[str] = []
+    for section in sections:
+        if current and len(current) + len(section) > max_lines:
+            text = "\n".join(current)
+            chunks.append((_label(text), text))
+            current = []
+        current.extend(section)
+    if current:
+        text = "\n".join(current)
+        chunks.append((_label(text), text))
+    return chunks
+
+
+def _label(code: str) -> str:
+    names = [next(filter(None, m.groups())) for m in _BOUNDARY.finditer(code)]
+    components = [n for n in names if n[:1].isupper()] or names
+    return ", ".join(components[:3]) or "snippet"
+
+
+def review_chunks(text: str, max_lines: int = CHUNK_LINES) -> List[Chunk]:
+    """All pieces to review for a message: each block, split if large."""
+    chunks = []
+    for i, block in enumerate(extract_code_blocks(text), 1):
+        for label, code in split_code(block, max_lines):
+            chunks.append((f"Block {i}: {label}", code))
+    return chunks
+
+
+def merge_reviews(chunks: List[Chunk], reviews: List[Optional[Dict[str, str]]]) -> Dict[str, str]:
+    """
+    One review out of the per-piece ones. Pieces that failed or missed the
+    deadline are listed as not reviewed; raises if none was reviewed.
+    """
+    done = [(label, r) for (label, _), r in zip(chunks, reviews) if r is not None]
+    if not done:
+        raise RuntimeError("no code block could be reviewed")
+    if len(chunks) == 1:
+        return done[0][1]
+
+    issues = [f"**{label}**\n{r.get('issues', 'None detected')}" for label, r in done]
+    skipped = [label for (label, _), r in zip(chunks, reviews) if r is None]
+    if skipped:
+        issues.append(f"_Not reviewed (timed out or failed): {', '.join(skipped)}_")
+    fundamentals = [f.strip() for _, r in done for f in str(r.get("suggested_fundamentals", "")).split(",")]
+    sources = {r.get("source", "llm") for _, r in done}
+    return {
+        "issues": "\n\n".join(issues),
+        "suggested_fundamentals": ", ".join(dict.fromkeys(f for f in fundamentals if f)),
+        "high_level_hint": done[0][1].get("high_level_hint", "Keep practicing!"),
+        "source": "+".join(sorted(sources)),
+    }
+
+
+def review_code(text: str, stage_info: str, workers: int = REVIEW_WORKERS,
+                deadline: float = REVIEW_DEADLINE_SECONDS) -> Dict[str, str]:
+    """Review every code piece in `text` on a bounded thread pool; merged review."""
+    chunks = review_chunks(text)
+    if len(chunks) == 1:
+        return analyze_code_snippet(chunks[0][1], stage_info)
+    deadline = time_left(deadline)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks))), thread_name_prefix="code-review")
+    try:
+        # Each task runs in a copy of the caller's context so graph config/callbacks carry over.
+        futures = [
+            pool.submit(contextvars.copy_context().run, analyze_code_snippet, code, stage_info)
+            for _, code in chunks
+        ]
+        wait(futures, timeout=deadline)
+        reviews = [f.result() if f.done() and not f.exception() else None for f in futures]
+    finally:
+        # Don't wait for stragglers past the deadline; their results are dropped.
+        pool.shutdown(wait=False, cancel_futures=True)
+    return merge_reviews(chunks, reviews)
+
+
+async def areview_code(text: str, stage_info: str, workers: int = REVIEW_WORKERS,
+                       deadline: float = REVIEW_DEADLINE_SECONDS) -> Dict[str, str]:
+    """Async review_code: pieces run as tasks, at most `workers` at a time."""
+    chunks = review_chunks(text)
+    if len(chunks) == 1:
+        return await aanalyze_code_snippet(chunks[0][1], stage_info)
+    deadline = time_left(deadline)
+
+    slots = asyncio.Semaphore(max(1, workers))
+
+    async def one(code: str) -> Dict[str, str]:
+        async with slots:
+            return await aanalyze_code_snippet(code, stage_info)
+
+    tasks = [asyncio.create_task(one(code)) for _, code in chunks]
+    await asyncio.wait(tasks, timeout=deadline)
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+    reviews = [t.result() if t.done() and not t.cancelled() and not t.exception() else None for t in tasks]
+    return merge_reviews(chunks, reviews)
@@ -0,0 +1,239 @@
+"""
+Process-wide runtime: .env loading, LLM clients, the compiled coach graph,
+the docs corpus and its indexes, the response cache, the model router, the
+call resilience state, in-flight request coalescing, the metrics registry
+and the session recorder. Each is created on first use (under one lock, so
+concurrent sessions never build it twice) and then shared by every session
+of the CLI, Streamlit, the server and Studio; only the learner's GraphState
+is per session.
+"""
+import threading
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+_lock = threading.RLock()
+_env_loaded = False
+_llms: Dict[str, Any] = {}
+_llm_factory: Optional[Callable[[str], Any]] = None
+_graphs: Dict[bool, Any] = {}
+_checkpointer = None
+_response_cache = None
+_prefetcher = None
+_corpus = None
+_vector_index = None
+_metrics = None
+_router = None
+_resilience = None
+_single_flight = None
+_recorder = None
+
+
+def load_env() -> None:
+    """Load .env once per process."""
+    global _env_loaded
+    if not _env_loaded:
+        with _lock:
+            if not _env_loaded:
+                from dotenv import load_dotenv
+                load_dotenv()
+                _env_loaded = True
+
+
+def _default_llm_factory(model: str) -> Any:
+    # langchain_openai (and the openai SDK under it) is the slowest import in the app.
+    from langchain_openai import ChatOpenAI
+    from resilience import ATTEMPT_TIMEOUT_SECONDS, ENABLED
+
+    if not ENABLED:
+        return ChatOpenAI(model=model)
+    # resilience.py times out and retries calls itself; the client's own retries would stack on top
+    return ChatOpenAI(model=model, max_retries=0, timeout=ATTEMPT_TIMEOUT_SECONDS)
+
+
+def get_llm(model: str = DEFAULT_MODEL) -> Any:
+    """Shared chat model client for `model`, created on first use."""
+    llm = _llms.get(model)
+    if llm is None:
+        with _lock:
+            llm = _llms.get(model)
+            if llm is None:
+                load_env()
+                llm = (_llm_factory or _default_llm_factory)(model)
+                _llms[model] = llm
+    return llm
+
+
+def set_llm_factory(factory: Optional[Callable[[str], Any]]) -> None:
+    """Swap how LLM clients are built (e.g. a fake model for benchmarks); None restores ChatOpenAI."""
+    global _llm_factory
+    with _lock:
+        _llm_factory = factory
+        _llms.clear()
+
+
+def get_checkpointer():
+    """The process-wide SQLite checkpointer (opened, and pruned, on first use)."""
+    global _checkpointer
+    if _checkpointer is None:
+        with _lock:
+            if _checkpointer is None:
+                load_env()
+                from checkpoints import open_checkpointer
+                _checkpointer = open_checkpointer()
+    return _checkpointer
+
+
+def get_response_cache():
+    """The process-wide LLM response cache (memory LRU over a shared SQLite file)."""
+    global _response_cache
+    if _response_cache is None:
+        with _lock:
+            if _response_cache is None:
+                load_env()
+                from llm_cache import ResponseCache
+                _response_cache = ResponseCache()
+    return _response_cache
+
+
+def get_prefetcher():
+    """The process-wide speculative prefetcher (see prefetch.py); its worker starts on first schedule."""
+    global _prefetcher
+    if _prefetcher is None:
+        with _lock:
+            if _prefetcher is None:
+                load_env()
+                from prefetch import Prefetcher
+                _prefetcher = Prefetcher()
+    return _prefetcher
+
+
+def get_router():
+    """The process-wide model router (see model_router.py): each call_llm node's model, max tokens and budget."""
+    global _router
+    if _router is None:
+        with _lock:
+            if _router is None:
+                load_env()
+                from model_router import ModelRouter
+                _router = ModelRouter()
+    return _router
+
+
+def get_resilience():
+    """The process-wide retry/hedging/circuit breaker state call_llm runs model calls under (see resilience.py)."""
+    global _resilience
+    if _resilience is None:
+        with _lock:
+            if _resilience is None:
+                load_env()
+                from resilience import Resilience
+                _resilience = Resilience()
+    return _resilience
+
+
+def get_single_flight():
+    """The process-wide registry of in-flight model requests identical calls join (see singleflight.py)."""
+    global _single_flight
+    if _single_flight is None:
+        with _lock:
+            if _single_flight is None:
+                load_env()
+                from singleflight import SingleFlight
+                _single_flight = SingleFlight()
+    return _single_flight
+
+
+def get_metrics():
+    """The process-wide metrics registry (see metrics.py); build_graph attaches its callback to every graph."""
+    global _metrics
+    if _metrics is None:
+        with _lock:
+            if _metrics is None:
+                load_env()
+                from metrics import Registry
+                _metrics = Registry()
+    return _metrics
+
+
+def get_recorder():
+    """The process-wide session recorder (see recorder.py); disabled unless SESSION_RECORD is set."""
+    global _recorder
+    if _recorder is None:
+        with _lock:
+            if _recorder is None:
+                load_env()
+                from recorder import SessionRecorder
+                _recorder = SessionRecorder()
+    return _recorder
+
+
+def get_corpus():
+    """The docs corpus fetch_docs searches (see tools.open_corpus); its BM25 index loads on first search."""
+    global _corpus
+    if _corpus is None:
+        with _lock:
+            if _corpus is None:
+                load_env()
+                from tools import open_corpus
+                _corpus = open_corpus()
+    return _corpus
+
+
+def set_corpus(corpus) -> None:
+    """Swap the docs corpus (e.g. a synthetic one for benchmarks); None reopens the configured one."""
+    global _corpus, _vector_index
+    with _lock:
+        _corpus = corpus
+        _vector_index = None
+
+
+def get_vector_index():
+    """The memory-mapped dense index over get_corpus(), reopened (rebuilt if needed) when the corpus changes."""
+    global _vector_index
+    corpus = get_corpus()
+    fingerprint = corpus.fingerprint()
+    index = _vector_index
+    if index is None or index.meta.get("fingerprint") != fingerprint:
+        with _lock:
+            if _vector_index is None or _vector_index.meta.get("fingerprint") != fingerprint:
+                from tools import open_vector_index
+                _vector_index = open_vector_index(corpus, fingerprint)
+            index = _vector_index
+    return index
+
+
+def get_graph(persistent: bool = True):
+    """
+    The compiled coach graph, built once per process. Persistent graphs
+    checkpoint every thread to SQLite; LangGraph Studio/API supplies its
+    own persistence and needs persistent=False.
+    """
+    graph = _graphs.get(persistent)
+    if graph is None:
+        with _lock:
+            graph = _graphs.get(persistent)
+            if graph is None:
+                from graph import build_graph
+                graph = build_graph(checkpointer=get_checkpointer() if persistent else None)
+                _graphs[persistent] = graph
+    return graph
+
+
+def warm_up() -> threading.Thread:
+    """Compile the graph, create the default client and load the docs index in the background (e.g. while the user types)."""
+    def _warm():
+        get_graph()
+        get_llm()
+        get_corpus().lexical_index()
+
+    thread = threading.Thread(target=_warm, name="runtime-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def reset() -> None:
+    """Drop cached clients and graphs (tests/benchmarks); the checkpointer stays open."""
+    with _lock:
+        _llms.clear()
+        _graphs.clear()
@@ -0,0 +1,324 @@
+"""
+HTTP service for many learners in one process.
+
+One async coach graph on an AsyncSqliteSaver serves every session. A
+bounded worker pool caps how many turns run at once and how many may wait
+for a slot; beyond that requests get 429 with Retry-After. Turns for the
+same session are serialized by a per-session lock.
+
+    POST /sessions                      -> {"session_id"}
+    GET  /sessions/{id}                 -> status, stage, recent messages
+    POST /sessions/{id}/messages        {"message": "..."} -> {"replies": [...]}
+    POST /sessions/{id}/stream          {"message": "..."} -> text/event-stream
+    GET  /health                        -> liveness + pool/latency/cache/model call metrics
+    GET  /metrics                       -> Prometheus text (node/model/token/retrieval timings)
+
+    python server.py --port 8000          # OpenAI
+    python server.py --fake-llm           # local fake model, no API key
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+import runtime
+from llm_calls import CACHE_ENABLED
+from checkpoints import CHECKPOINT_DB, new_thread_id, open_async_checkpointer, thread_config
+from resilience import with_deadline
+from streaming import TurnStream
+
+runtime.load_env()
+
+WORKERS = int(os.getenv("SERVER_WORKERS", "32"))  # turns running at once
+MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "64"))  # turns waiting for a worker
+RETRY_AFTER_SECONDS = 2
+
+
+# --- Admission control ---
+class WorkerPool:
+    """At most `workers` turns run concurrently and `max_queue` wait; the rest are refused."""
+
+    def __init__(self, workers: int = WORKERS, max_queue: int = MAX_QUEUE):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._slots = asyncio.Semaphore(self.workers)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def admit(self) -> bool:
+        """Reserve a place in the queue; False means the caller should answer 429."""
+        if self.active + self.waiting >= self.workers + self.max_queue:
+            self.rejected += 1
+            return False
+        self.waiting += 1
+        return True
+
+    @asynccontextmanager
+    async def slot(self, session_lock=None) -> AsyncIterator[None]:
+        """
+        Wait for a worker after a successful admit(). `session_lock` (an async
+        context manager) is entered first, so a queued follow-up for a busy
+        session doesn't tie up a worker while it waits.
+        """
+        async with AsyncExitStack() as stack:
+            try:
+                if session_lock is not None:
+                    await stack.enter_async_context(session_lock)
+                await self._slots.acquire()
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            try:
+                yield
+            finally:
+                self.active -= 1
+                self._slots.release()
+
+
+class SessionLocks:
+    """One lock per session id, dropped once nobody holds or waits on it."""
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[None]:
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        self._users[session_id] = self._users.get(session_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[session_id] -= 1
+            if not self._users[session_id]:
+                del self._users[session_id], self._locks[session_id]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+class Metrics:
+    """Turn counters and a window of recent turn latencies."""
+
+    def __init__(self, window: int = 1000):
+        self.turns = 0
+        self.errors = 0
+        self.latencies: deque = deque(maxlen=window)
+        self.ttft: deque = deque(maxlen=window)
+        self.started = time.time()
+
+    def record(self, elapsed: float, ttft: Optional[float] = None) -> None:
+        self.turns += 1
+        self.latencies.append(elapsed)
+        if ttft is not None:
+            self.ttft.append(ttft)
+
+    @staticmethod
+    def _percentiles(values: deque) -> Dict[str, Optional[float]]:
+        ordered = sorted(values)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 1) if ordered else None
+        return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "turns": self.turns,
+            "errors": self.errors,
+            "turn_latency": self._percentiles(self.latencies),
+            "first_token": self._percentiles(self.ttft),
+        }
+
+
+# --- Turn execution ---
+async def _turn_input(graph, config: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """Only the new message for an existing session; the full initial state for a new one."""
+    from main import create_initial_state
+
+    message = HumanMessage(content=text)
+    if (await graph.aget_state(config)).values:
+        return {"messages": [message]}
+    state = create_initial_state()
+    state["messages"].append(message)
+    return state
+
+
+def _replies(state: Dict[str, Any]) -> List[str]:
+    messages = state.get("messages", [])
+    last_human = max((i for i, m in enumerate(messages) if m.type == "human"), default=-1)
+    return [m.content for m in messages[last_human + 1:] if m.type == "ai"]
+
+
+def _session_view(state: Dict[str, Any], recent: int = 10) -> Dict[str, Any]:
+    stages = state.get("stages", [])
+    return {
+        "status": state.get("status"),
+        "current_stage": state.get("current_stage_index", 0) + 1 if stages else None,
+        "stages": [stage.get("name") for stage in stages],
+        "summary": state.get("summary", ""),
+        "messages": [{"role": m.type, "content": m.content} for m in state.get("messages", [])[-recent:]],
+    }
+
+
+async def _message_text(request: Request) -> Optional[str]:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return None
+    text = body.get("message") if isinstance(body, dict) else None
+    return text.strip() if isinstance(text, str) and text.strip() else None
+
+
+def _busy() -> JSONResponse:
+    return JSONResponse(
+        {"error": "server busy, retry later"}, status_code=429, headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+
+# --- Endpoints ---
+async def create_session(request: Request) -> JSONResponse:
+    return JSONResponse({"session_id": new_thread_id()}, status_code=201)
+
+
+async def get_session(request: Request) -> JSONResponse:
+    state = (await request.app.state.graph.aget_state(thread_config(request.path_params["session_id"]))).values
+    if not state:
+        return JSONResponse({"error": "unknown session"}, status_code=404)
+    return JSONResponse(_session_view(state))
+
+
+async def post_message(request: Request) -> JSONResponse:
+    app = request.app.state
+    session_id = request.path_params["session_id"]
+    text = await _message_text(request)
+    if text is None:
+        return JSONResponse({"error": 'expected JSON body {"message": "..."}'}, status_code=400)
+    if not app.pool.admit():
+        return _busy()
+
+    config = thread_config(session_id)
+    async with app.pool.slot(app.locks.hold(session_id)):
+        start = time.perf_counter()
+        try:
+            state = await app.graph.ainvoke(await _turn_input(app.graph, config, text), with_deadline(config))
+        except Exception as exc:
+            app.metrics.errors += 1
+            return JSONResponse({"error": f"turn failed: {exc}"}, status_code=500)
+        app.metrics.record(time.perf_counter() - start)
+    return JSONResponse({"session_id": session_id, "replies": _replies(state), "status": state.get("status")})
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_message(request: Request):
+    """Server-sent events: `token` per streamed piece, then `done` with the full replies."""
+    app = request.app.state
+    session_id = request.path_params["session_id"]
+    text = await _message_text(request)
+    if text is None:
+        return JSONResponse({"error": 'expected JSON body {"message": "..."}'}, status_code=400)
+    if not app.pool.admit():
+        return _busy()
+
+    async def events() -> AsyncIterator[str]:
+        config = thread_config(session_id)
+        async with app.pool.slot(app.locks.hold(session_id)):
+            try:
+                stream = TurnStream(app.graph, await _turn_input(app.graph, config, text), config)
+                async for node, piece in stream:
+                    yield _sse("token", {"node": node, "text": piece})
+            except Exception as exc:
+                app.metrics.errors += 1
+                yield _sse("error", {"error": f"turn failed: {exc}"})
+                return
+            app.metrics.record(stream.elapsed, stream.ttft)
+            yield _sse("done", {"replies": _replies(stream.state or {}), "status": (stream.state or {}).get("status")})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+async def health(request: Request) -> JSONResponse:
+    app = request.app.state
+    hit_rate = runtime.get_response_cache().stats()["hit_rate"] if CACHE_ENABLED else None
+    return JSONResponse({
+        "status": "ok",
+        "pool": {
+            "workers": app.pool.workers,
+            "max_queue": app.pool.max_queue,
+            "active": app.pool.active,
+            "waiting": app.pool.waiting,
+            "rejected": app.pool.rejected,
+        },
+        "sessions_busy": len(app.locks),
+        **app.metrics.snapshot(),
+        "llm_cache_hit_rate": round(hit_rate, 3) if hit_rate is not None else None,
+        "models": runtime.get_router().stats(),
+        "llm_calls": runtime.get_resilience().stats(),
+        "coalescing": runtime.get_single_flight().stats(),
+    })
+
+
+async def metrics(request: Request) -> PlainTextResponse:
+    """Prometheus scrape endpoint: node, model, token, retrieval and cache metrics (metrics.py)."""
+    return PlainTextResponse(runtime.get_metrics().render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def create_app(checkpoint_db: str = CHECKPOINT_DB, workers: int = WORKERS, max_queue: int = MAX_QUEUE) -> Starlette:
+    """The ASGI app; the async checkpointer and graph are opened on startup."""
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        from graph import build_graph
+
+        saver = await open_async_checkpointer(checkpoint_db)
+        app.state.graph = build_graph(checkpointer=saver)
+        app.state.pool = WorkerPool(workers, max_queue)
+        app.state.locks = SessionLocks()
+        app.state.metrics = Metrics()
+        try:
+            yield
+        finally:
+            await saver.conn.close()
+
+    return Starlette(
+        routes=[
+            Route("/sessions", create_session, methods=["POST"]),
+            Route("/sessions/{session_id}", get_session, methods=["GET"]),
+            Route("/sessions/{session_id}/messages", post_message, methods=["POST"]),
+            Route("/sessions/{session_id}/stream", stream_message, methods=["POST"]),
+            Route("/health", health, methods=["GET"]),
+            Route("/metrics", metrics, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="React Learning Coach HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="turns running at once")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE, help="turns allowed to wait for a worker")
+    parser.add_argument("--fake-llm", action="store_true", help="serve a local fake model (no API calls)")
+    parser.add_argument("--fake-latency", type=float, default=0.3, help="fake model first-token latency (s)")
+    args = parser.parse_args()
+
+    if args.fake_llm:
+        import fake_llm
+        runtime.set_llm_factory(fake_llm.factory(first_token_latency=args.fake_latency, token_latency=0.01))
+    uvicorn.run(create_app(workers=args.workers, max_queue=args.max_queue), host=args.host, port=args.port)
@@ -0,0 +1,123 @@
+"""
+Single-flight coalescing of identical in-flight model requests.
+
+When a classroom on the same stage and level asks for exercises at once,
+every request misses the response cache together. `SingleFlight.do(key, node, fn)`
+runs `fn` for the first caller with a request key (the leader) while
+later callers with the same key, from any thread or asyncio task, wait for
+and share its reply instead of calling the model again. The flight ends
+when the leader's call does, so the next identical request is served by
+the response cache, or makes a new call if caching is off.
+
+Followers wait no longer than their own turn deadline. They see the
+leader's error if its call failed, and if the leader was cancelled they
+start the call again. `stats()` counts flights and coalesced calls per
+node. LLM_COALESCE=off disables coalescing.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from resilience import TURN_DEADLINE_SECONDS, DeadlineExceeded, time_left
+
+ENABLED = os.getenv("LLM_COALESCE", "on").lower() not in ("0", "off", "false", "no")
+
+
+class _Abandoned(Exception):
+    """The leader was cancelled before its call finished; a follower makes the call itself."""
+
+
+class SingleFlight:
+    """Identical concurrent calls share one in-flight call (threads and asyncio tasks alike)."""
+
+    def __init__(self, enabled: bool = ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # A concurrent.futures.Future can be waited on by threads and, wrapped, by event loops
+        self._flights: Dict[str, concurrent.futures.Future] = {}
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: {"flights": 0, "coalesced": 0})
+
+    def _join(self, key: str, node: str) -> Tuple[concurrent.futures.Future, bool]:
+        """The key's flight and whether this caller leads it (starts the call)."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._counts[node]["coalesced"] += 1
+                return flight, False
+            flight = concurrent.futures.Future()
+            flight.set_running_or_notify_cancel()  # followers giving up can't cancel it for the others
+            self._flights[key] = flight
+            self._counts[node]["flights"] += 1
+            return flight, True
+
+    def _land(self, key: str, flight: concurrent.futures.Future, result: Any = None,
+              error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if error is None:
+            flight.set_result(result)
+        else:
+            # Cancellation (or an interrupt) belongs to the leader's task, not to its followers
+            flight.set_exception(error if isinstance(error, Exception) else _Abandoned())
+
+    def do(self, key: str, node: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """(fn()'s result, True) for the leader; (the leader's result, False) for the calls that joined it."""
+        if not self.enabled or key is None:
+            return fn(), True
+        while True:
+            flight, leader = self._join(key, node)
+            if leader:
+                try:
+                    result = fn()
+                except BaseException as exc:
+                    self._land(key, flight, error=exc)
+                    raise
+                self._land(key, flight, result)
+                return result, True
+            try:
+                return flight.result(timeout=time_left(TURN_DEADLINE_SECONDS)), False
+            except _Abandoned:
+                continue
+            except concurrent.futures.TimeoutError as exc:
+                raise DeadlineExceeded("turn deadline passed waiting for an identical request") from exc
+
+    async def ado(self, key: str, node: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Async do: followers await the flight without blocking the event loop."""
+        if not self.enabled or key is None:
+            return await fn(), True
+        while True:
+            flight, leader = self._join(key, node)
+            if leader:
+                try:
+                    result = await fn()
+                except BaseException as exc:
+                    self._land(key, flight, error=exc)
+                    raise
+                self._land(key, flight, result)
+                return result, True
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(flight), time_left(TURN_DEADLINE_SECONDS)), False
+            except _Abandoned:
+                continue
+            except asyncio.TimeoutError as exc:
+                raise DeadlineExceeded("turn deadline passed waiting for an identical request") from exc
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per node: calls that went to the model (flights) and calls that shared one (coalesced)."""
+        with self._lock:
+            nodes = {node: dict(counts) for node, counts in self._counts.items()}
+            in_flight = len(self._flights)
+        return {
+            "flights": sum(c["flights"] for c in nodes.values()),
+            "coalesced": sum(c["coalesced"] for c in nodes.values()),
+            "in_flight": in_flight,
+            "nodes": nodes,
+        }
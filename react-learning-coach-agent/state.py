@@ -1,15 +1,30 @@
 # state.py
-from typing import TypedDict, Annotated, List, Dict, Any
+from typing import TypedDict, Annotated, List, Dict, Any, Optional
 from langgraph.graph.message import add_messages
 
 
 class GraphState(TypedDict):
     messages: Annotated[List[Any], add_messages]
+    summary: str  # rolling summary of turns folded out of `messages` (see memory.py)
 
     learner_profile: Dict[str, Any]
     project_spec: Dict[str, Any]
 
     stages: List[Dict[str, Any]]
+    plan_basis: Dict[str, Any]  # level/features the stages were planned for (see replan.py)
     current_stage_index: int
 
     status: str  # "onboarding" | "planning" | "coaching" | "replan" | "finished"
+
+
+def _merge_details(left: List[Dict[str, Any]], right: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    # None resets (a new plan starts); otherwise the expansions' results accumulate
+    if right is None:
+        return []
+    return left + right
+
+
+class PlanState(GraphState):
+    """Planning subgraph state: the outline, and per-stage details gathered from the parallel expansions."""
+    outline: List[Dict[str, Any]]
+    stage_details: Annotated[List[Dict[str, Any]], _merge_details]
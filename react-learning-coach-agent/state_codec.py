@@ -0,0 +1,174 @@
+"""
+Binary codec for coach state snapshots and checkpoints.
+
+`encode_state(state)` packs a GraphState-like dict into one msgpack
+(ormsgpack) document; `decode_state(data)` returns an equal dict. In it:
+
+- stages, the learner profile and the project spec are positional rows
+  (state_models.py) instead of dicts repeating their keys;
+- levels, fundamentals, doc URLs and features are written once, in a string
+  table, and referenced by index; decoding interns them;
+- messages are [type, content, id] rows plus only the fields that are set,
+  instead of LangChain's full message dumps;
+- plain values (summary, index, status) are packed as they are, and
+  anything else through LangGraph's JsonPlusSerializer.
+
+`CompactSerializer` is the SQLite checkpointers' serializer
+(CHECKPOINT_CODEC=compact, the default; see checkpoints.py): checkpoints are
+written with their channel values in this format, everything else (pending
+writes, and checkpoints it can't pack) as LangGraph does. Checkpoints written
+before, in LangGraph's own format, still load.
+"""
+import sys
+from typing import Any, Dict, List, Mapping, Tuple
+
+import ormsgpack
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+    message_to_dict,
+    messages_from_dict,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from state_models import LearnerProfile, ProjectSpec, Stage, intern_all
+
+VERSION = 1
+CHECKPOINT_TYPE = "coach-state"
+
+# Field tags: how each state value was packed
+RAW, MESSAGES, STAGES, PROFILE, SPEC, SERDE = range(6)
+MESSAGE_TYPES = {"human": HumanMessage, "ai": AIMessage, "system": SystemMessage, "tool": ToolMessage}
+MESSAGE_CODES = {cls: code for code, cls in enumerate(MESSAGE_TYPES.values(), start=1)}
+MESSAGE_CLASSES = {code: cls for cls, code in MESSAGE_CODES.items()}
+_MESSAGE_FIELDS = ("type", "content", "id")
+
+_serde = JsonPlusSerializer()
+
+
+class _StringTable:
+    """Recurring strings of one snapshot, each stored once."""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def ref(self, value: str) -> int:
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return i
+
+
+def _encode_message(message: BaseMessage) -> List[Any]:
+    code = MESSAGE_CODES.get(type(message))
+    if code is None:
+        # Chunks, RemoveMessage, custom types: LangChain's own dict form
+        return [0, message_to_dict(message)]
+    # The pydantic fields as set, without model_dump's copying; unset ones are falsy
+    extra = {k: v for k, v in vars(message).items() if v and k not in _MESSAGE_FIELDS}
+    row = [code, message.content, message.id]
+    return row + [extra] if extra else row
+
+
+def _decode_message(row: List[Any]) -> BaseMessage:
+    if row[0] == 0:
+        return messages_from_dict([row[1]])[0]
+    extra = row[3] if len(row) > 3 else {}
+    return MESSAGE_CLASSES[row[0]](content=row[1], id=row[2], **extra)
+
+
+def _is_rows(value: Any, item: type) -> bool:
+    return isinstance(value, list) and all(isinstance(v, item) for v in value)
+
+
+def _encode_field(value: Any, serde: JsonPlusSerializer) -> List[Any]:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return [RAW, value]
+    if _is_rows(value, BaseMessage):
+        return [MESSAGES, [_encode_message(m) for m in value]]
+    return [SERDE, list(serde.dumps_typed(value))]
+
+
+def _encode_fields(state: Mapping[str, Any], serde: JsonPlusSerializer) -> Tuple[List[str], Dict[str, Any]]:
+    """The string table and each key's [tag, payload]."""
+    table = _StringTable()
+    fields: Dict[str, Any] = {}
+    for key, value in state.items():
+        if key == "stages" and _is_rows(value, dict):
+            fields[key] = [STAGES, [Stage.from_dict(s).to_row(table.ref) for s in value]]
+        elif key == "learner_profile" and isinstance(value, dict):
+            fields[key] = [PROFILE, LearnerProfile.from_dict(value).to_row(table.ref)]
+        elif key == "project_spec" and isinstance(value, dict):
+            fields[key] = [SPEC, ProjectSpec.from_dict(value).to_row(table.ref)]
+        else:
+            fields[key] = _encode_field(value, serde)
+    return table.strings, fields
+
+
+def _decode_fields(strings: List[str], fields: Dict[str, Any], serde: JsonPlusSerializer) -> Dict[str, Any]:
+    strings = intern_all(strings)
+    state: Dict[str, Any] = {}
+    for key, (tag, payload) in fields.items():
+        if tag == RAW:
+            state[key] = sys.intern(payload) if key == "status" and isinstance(payload, str) else payload
+        elif tag == MESSAGES:
+            state[key] = [_decode_message(row) for row in payload]
+        elif tag == STAGES:
+            state[key] = [Stage.from_row(row, strings).to_dict() for row in payload]
+        elif tag == PROFILE:
+            state[key] = LearnerProfile.from_row(payload, strings).to_dict()
+        elif tag == SPEC:
+            state[key] = ProjectSpec.from_row(payload, strings).to_dict()
+        else:
+            state[key] = serde.loads_typed(tuple(payload))
+    return state
+
+
+def encode_state(state: Mapping[str, Any]) -> bytes:
+    """A state snapshot (e.g. graph.get_state(config).values) as compact msgpack."""
+    strings, fields = _encode_fields(state, _serde)
+    return ormsgpack.packb([VERSION, strings, fields])
+
+
+def decode_state(data: bytes) -> Dict[str, Any]:
+    version, strings, fields = ormsgpack.unpackb(data)
+    if version != VERSION:
+        raise ValueError(f"unsupported state snapshot version {version}")
+    return _decode_fields(strings, fields, _serde)
+
+
+class CompactSerializer(JsonPlusSerializer):
+    """
+    LangGraph's serializer, except that checkpoints' channel values are
+    written with encode_state's format (unless compact=False). Reads both.
+    """
+
+    def __init__(self, *args: Any, compact: bool = True, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.compact = compact
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        if self.compact and isinstance(obj, dict) and isinstance(obj.get("channel_values"), dict) and "id" in obj:
+            try:
+                strings, fields = _encode_fields(obj["channel_values"], self)
+                rest_type, rest = super().dumps_typed({k: v for k, v in obj.items() if k != "channel_values"})
+                return CHECKPOINT_TYPE, ormsgpack.packb([VERSION, strings, fields, rest_type, rest])
+            except (TypeError, ValueError, ormsgpack.MsgpackEncodeError):
+                pass  # something the rows can't hold: the whole checkpoint goes the usual way
+        return super().dumps_typed(obj)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_ != CHECKPOINT_TYPE:
+            return super().loads_typed(data)
+        version, strings, fields, rest_type, rest = ormsgpack.unpackb(payload)
+        if version != VERSION:
+            raise ValueError(f"unsupported checkpoint codec version {version}")
+        checkpoint = super().loads_typed((rest_type, rest))
+        checkpoint["channel_values"] = _decode_fields(strings, fields, self)
+        return checkpoint
@@ -0,0 +1,145 @@
+"""
+Compact typed forms of the learner and plan data in GraphState.
+
+The graph keeps the learner profile, project spec and stages as plain dicts:
+nodes update them in place, and LangGraph Studio and the API expect
+JSON-like state. state_codec.py converts them to these classes to
+serialize them. Each class has fixed __slots__ fields instead of a dict
+repeating the same keys in every stage, and its row form is a positional
+list. The short strings that recur across stages and sessions (levels,
+fundamentals, doc URLs, features) are interned when read back, so loaded
+states share one copy of each.
+
+A field is None when its key is absent; keys outside the known fields,
+and known keys holding None, are kept as-is in `extra`, so
+`from_dict(d).to_dict() == d`.
+"""
+import sys
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Encodes a recurring string as an index into the snapshot's string table
+Ref = Callable[[str], int]
+
+
+def intern_all(values: Sequence[Any]) -> List[Any]:
+    return [sys.intern(v) if isinstance(v, str) else v for v in values]
+
+
+def _split(data: Dict[str, Any], fields: Sequence[str]) -> tuple:
+    """Known fields' values (None when absent or None) and everything else."""
+    values = [data.get(name) for name in fields]
+    extra = {k: v for k, v in data.items() if k not in fields or v is None}
+    return values, extra or None
+
+
+def _join(fields: Sequence[str], values: Sequence[Any], extra: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    data = {name: value for name, value in zip(fields, values) if value is not None}
+    if extra:
+        data.update(extra)
+    return data
+
+
+def _refs(values: Optional[List[str]], ref: Ref) -> Optional[List[Any]]:
+    # Non-string items (a malformed plan) go through as they are, marked by wrapping
+    return None if values is None else [ref(v) if isinstance(v, str) else [v] for v in values]
+
+
+def _strings(refs: Optional[List[Any]], strings: List[str]) -> Optional[List[Any]]:
+    return None if refs is None else [strings[r] if isinstance(r, int) else r[0] for r in refs]
+
+
+class Stage:
+    """One plan stage: name, goal, tasks, fundamentals, docs, features."""
+
+    __slots__ = ("name", "goal", "tasks", "fundamentals", "docs", "features", "extra")
+    FIELDS = ("name", "goal", "tasks", "fundamentals", "docs", "features")
+
+    def __init__(self, name: Optional[str] = None, goal: Optional[str] = None, tasks: Optional[List[str]] = None,
+                 fundamentals: Optional[List[str]] = None, docs: Optional[List[str]] = None,
+                 features: Optional[List[str]] = None, extra: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.goal = goal
+        self.tasks = tasks
+        self.fundamentals = fundamentals
+        self.docs = docs
+        self.features = features
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Stage":
+        values, extra = _split(data, cls.FIELDS)
+        return cls(*values, extra=extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return _join(self.FIELDS, [self.name, self.goal, self.tasks, self.fundamentals, self.docs, self.features],
+                     self.extra)
+
+    def to_row(self, ref: Ref) -> List[Any]:
+        row = [self.name, self.goal, self.tasks, _refs(self.fundamentals, ref), _refs(self.docs, ref),
+               _refs(self.features, ref)]
+        return row + [self.extra] if self.extra else row
+
+    @classmethod
+    def from_row(cls, row: List[Any], strings: List[str]) -> "Stage":
+        name, goal, tasks, fundamentals, docs, features = row[:6]
+        return cls(name, goal, tasks, _strings(fundamentals, strings), _strings(docs, strings),
+                   _strings(features, strings), row[6] if len(row) > 6 else None)
+
+    def __repr__(self) -> str:
+        return f"Stage({self.name!r})"
+
+
+class LearnerProfile:
+    """What onboarding learned about the learner: their assumed level."""
+
+    __slots__ = ("assumed_level", "extra")
+    FIELDS = ("assumed_level",)
+
+    def __init__(self, assumed_level: Optional[str] = None, extra: Optional[Dict[str, Any]] = None):
+        self.assumed_level = assumed_level
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LearnerProfile":
+        values, extra = _split(data, cls.FIELDS)
+        return cls(*values, extra=extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return _join(self.FIELDS, [self.assumed_level], self.extra)
+
+    def to_row(self, ref: Ref) -> List[Any]:
+        level = ref(self.assumed_level) if isinstance(self.assumed_level, str) else None
+        return [level, self.extra] if self.extra else [level]
+
+    @classmethod
+    def from_row(cls, row: List[Any], strings: List[str]) -> "LearnerProfile":
+        return cls(None if row[0] is None else strings[row[0]], row[1] if len(row) > 1 else None)
+
+
+class ProjectSpec:
+    """The learner's project: a one-line summary and its features."""
+
+    __slots__ = ("summary", "features", "extra")
+    FIELDS = ("summary", "features")
+
+    def __init__(self, summary: Optional[str] = None, features: Optional[List[str]] = None,
+                 extra: Optional[Dict[str, Any]] = None):
+        self.summary = summary
+        self.features = features
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ProjectSpec":
+        values, extra = _split(data, cls.FIELDS)
+        return cls(*values, extra=extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return _join(self.FIELDS, [self.summary, self.features], self.extra)
+
+    def to_row(self, ref: Ref) -> List[Any]:
+        row = [self.summary, _refs(self.features, ref)]
+        return row + [self.extra] if self.extra else row
+
+    @classmethod
+    def from_row(cls, row: List[Any], strings: List[str]) -> "ProjectSpec":
+        return cls(row[0], _strings(row[1], strings), row[2] if len(row) > 2 else None)
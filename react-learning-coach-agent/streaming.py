@@ -0,0 +1,103 @@
+"""
+Token streaming for one coach turn.
+
+`TurnStream` runs the graph with stream_mode=["messages", "custom"] and
+yields (node, text) pieces as they arrive: LLM tokens from the streamed
+nodes plus display text the nodes emit around them (see llm_calls.emit_text).
+Subgraph events are included and attributed to the top-level node (planning).
+Each node's text is one reply, so a piece starting another node's text
+begins with SEPARATOR.
+The final state is the same as `graph.invoke` would have produced.
+`async for` runs it over `graph.astream` instead.
+
+Each turn runs under a fresh deadline (resilience.with_deadline), which
+every model call of the turn honours.
+
+`ttft` is the time to the first reply token (model or cache); `first_text` the time to the
+first piece of anything (headers are emitted before the model is called).
+"""
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from langchain_core.messages import AIMessageChunk
+
+from llm_calls import graph_node
+from resilience import with_deadline
+
+STREAM_MODES = ["messages", "custom", "values"]
+SEPARATOR = "\n\n"
+
+
+class TurnStream:
+    """Iterate (or async-iterate) to stream a turn; afterwards `.state`, `.ttft` and `.elapsed` are set."""
+
+    def __init__(self, graph, graph_input: Dict[str, Any], config: Dict[str, Any]):
+        self.graph = graph
+        self.graph_input = graph_input
+        self.config = config
+        self.state: Optional[Dict[str, Any]] = None
+        self.ttft: Optional[float] = None
+        self.first_text: Optional[float] = None
+        self.elapsed: Optional[float] = None
+
+    def _reset(self) -> None:
+        self._start = time.perf_counter()
+        self._node = None
+
+    def _handle(self, namespace: Tuple[str, ...], mode: str, payload: Any) -> Optional[Tuple[str, str]]:
+        """Record one stream event; returns the (node, text) piece it carries, if any."""
+        if mode == "values":
+            # Subgraphs report their own state; the turn's state is the root graph's
+            if not namespace:
+                self.state = payload
+            return None
+        if mode == "messages":
+            chunk, metadata = payload
+            # Whole messages from node outputs also come through here; only live tokens count.
+            if not isinstance(chunk, AIMessageChunk) or not isinstance(chunk.content, str) or not chunk.content:
+                return None
+            node, text = graph_node(metadata), chunk.content
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - self._start
+        elif isinstance(payload, dict) and payload.get("type") == "text":
+            node, text = payload.get("node", ""), payload["text"]
+            # Cached replies arrive whole on the custom stream
+            if payload.get("reply") and self.ttft is None:
+                self.ttft = time.perf_counter() - self._start
+        else:
+            return None
+        if self.first_text is None:
+            self.first_text = time.perf_counter() - self._start
+        if self._node is not None and node != self._node:
+            text = SEPARATOR + text
+        self._node = node
+        return node, text
+
+    def _finish(self) -> None:
+        self.elapsed = time.perf_counter() - self._start
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        self._reset()
+        for namespace, mode, payload in self.graph.stream(
+            self.graph_input, with_deadline(self.config), stream_mode=STREAM_MODES, subgraphs=True
+        ):
+            piece = self._handle(namespace, mode, payload)
+            if piece is not None:
+                yield piece
+        self._finish()
+
+    async def __aiter__(self) -> AsyncIterator[Tuple[str, str]]:
+        """Same as iterating, over graph.astream (async graph and checkpointer)."""
+        self._reset()
+        async for namespace, mode, payload in self.graph.astream(
+            self.graph_input, with_deadline(self.config), stream_mode=STREAM_MODES, subgraphs=True
+        ):
+            piece = self._handle(namespace, mode, payload)
+            if piece is not None:
+                yield piece
+        self._finish()
+
+    def text(self) -> Iterator[str]:
+        """Just the text pieces (e.g. for st.write_stream)."""
+        for _, text in self:
+            yield text
@@ -4,14 +4,18 @@ React Learning Coach - Streamlit UI
 Interactive web interface for the learning coach agent.
 """
 
+import os
+
 import streamlit as st
-from dotenv import load_dotenv
+from streamlit.errors import StreamlitAPIException
 from langchain_core.messages import HumanMessage, AIMessage
-from graph import build_graph
+import runtime
+from memory import memory_stats
+from streaming import TurnStream
 import re
 
 # Load environment variables
-load_dotenv()
+runtime.load_env()
 
 # Page configuration
 st.set_page_config(
@@ -21,8 +25,16 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Dark mode monotone CSS
-st.markdown("""
+@st.cache_resource
+def warm_runtime():
+    """Once per process: the graph, LLM client, docs index and caches (runtime.py) are shared by every browser session."""
+    return runtime.warm_up()
+
+# Messages drawn at once; older ones load a page at a time on demand
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))
+
+# Dark mode monotone CSS (sent on full runs; chat fragment reruns keep it)
+CSS = """
 <style>
     /* Dark mode base */
     .main {
@@ -197,56 +209,99 @@ st.markdown("""
         border-radius: 3px;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
 
 # Initialize session state
 def init_session_state():
-    """Initialize session state variables."""
+    """
+    Initialize session state variables, resuming the thread named in ?session= if any.
+    Only per-learner data lives here; shared resources come from runtime.
+    """
+    warm_runtime()
+    if 'thread_id' not in st.session_state:
+        from checkpoints import new_thread_id
+        st.session_state.thread_id = st.query_params.get("session") or new_thread_id()
+        st.query_params["session"] = st.session_state.thread_id
     if 'state' not in st.session_state:
-        st.session_state.state = {
+        saved = runtime.get_graph().get_state(thread_config()).values
+        st.session_state.state = saved or {
             "messages": [],
+            "summary": "",
             "learner_profile": {},
             "project_spec": {"features": []},
             "stages": [],
             "current_stage_index": 0,
             "status": "onboarding",
         }
-    if 'chat_history' not in st.session_state:
-        st.session_state.chat_history = []
-    if 'graph' not in st.session_state:
-        st.session_state.graph = build_graph()
+    if 'notice' not in st.session_state:
+        # UI-only message (help, errors); the transcript itself lives in the graph state
+        st.session_state.notice = None
     if 'processing' not in st.session_state:
         st.session_state.processing = False
+    if 'chat_window' not in st.session_state:
+        st.session_state.chat_window = CHAT_PAGE_SIZE
+
+def thread_config():
+    from checkpoints import thread_config as config_for
+    return config_for(st.session_state.thread_id)
+
+def rerun_chat(full=False):
+    """Rerun only the chat fragment when called from one during a fragment run, else the whole app."""
+    if not full:
+        try:
+            st.rerun(scope="fragment")
+        except StreamlitAPIException:
+            pass
+    st.rerun()
+
+def queue_input(user_input, full=True):
+    """Queue input for the next run, where the reply streams into the chat area."""
+    st.session_state.pending_input = user_input
+    rerun_chat(full)
+
+def sidebar_signature(state):
+    """What the sidebar and stage badge show; a turn that changes it needs a full rerun."""
+    spec = state.get("project_spec", {})
+    return (
+        state.get("status"), state.get("current_stage_index"),
+        tuple(stage.get("name") for stage in state.get("stages", [])),
+        state.get("learner_profile", {}).get("assumed_level"),
+        spec.get("summary"), tuple(spec.get("features", [])),
+    )
 
 def process_user_input(user_input):
-    """Process user input through the graph."""
+    """Process user input through the graph, rendering the reply as it streams."""
     if not user_input.strip():
         return
     
-    # Add user message to state
-    st.session_state.state["messages"].append(HumanMessage(content=user_input))
-    
-    # Add to chat history for display
-    st.session_state.chat_history.append({"role": "user", "content": user_input})
-    
-    # Process through graph
-    with st.spinner("🤔 Coach is thinking..."):
+    # New threads start from the full initial state; after that only the new message is sent
+    if st.session_state.state["messages"]:
+        graph_input = {"messages": [HumanMessage(content=user_input)]}
+    else:
+        graph_input = {**st.session_state.state, "messages": [HumanMessage(content=user_input)]}
+    st.session_state.notice = None
+    prefetcher = runtime.get_prefetcher()
+    prefetcher.on_input(st.session_state.thread_id, user_input)
+    
+    with st.chat_message("user", avatar="👤"):
+        st.markdown(user_input)
+    
+    # Process through graph; the returned state is the only copy of the transcript
+    with st.chat_message("assistant", avatar="🎓"):
+        placeholder = st.empty()
+        placeholder.markdown("🤔 Coach is thinking...")
         try:
-            st.session_state.state = st.session_state.graph.invoke(st.session_state.state)
-            
-            # Extract new AI messages
-            for msg in reversed(st.session_state.state["messages"]):
-                if msg.type == "ai":
-                    # Check if this message is already in chat history
-                    if not st.session_state.chat_history or st.session_state.chat_history[-1]["content"] != msg.content:
-                        st.session_state.chat_history.append({"role": "ai", "content": msg.content})
-                    break
+            stream = TurnStream(runtime.get_graph(), graph_input, thread_config())
+            text = ""
+            for _, piece in stream:
+                text += piece
+                placeholder.markdown(text + "▌")
+            st.session_state.state = stream.state
+            # Generate the likely next quick actions while the learner reads this reply
+            prefetcher.schedule(st.session_state.thread_id, stream.state)
         except Exception as e:
             st.error(f"Error: {str(e)}")
-            st.session_state.chat_history.append({
-                "role": "ai", 
-                "content": f"❌ Sorry, I encountered an error: {str(e)}"
-            })
+            st.session_state.notice = f"❌ Sorry, I encountered an error: {str(e)}"
 
 def display_sidebar():
     """Display sidebar with project info and controls."""
@@ -295,6 +350,17 @@ def display_sidebar():
                     else:
                         st.markdown(f"⭕ {i+1}. {stage['name']}")
         
+        # Per-session memory accounting
+        stats = memory_stats(state)
+        if stats["messages"]:
+            st.caption(
+                f"🧠 {stats['turns']} recent turns kept · "
+                f"{stats['total_bytes'] / 1024:.1f} KB in memory"
+            )
+        cache = runtime.get_response_cache().stats()
+        if cache["totals"]:
+            st.caption(f"⚡ Response cache hit rate: {cache['hit_rate']:.0%}")
+        
         # Features in collapsible section
         if state.get("project_spec", {}).get("features"):
             with st.expander("✨ Features", expanded=False):
@@ -307,16 +373,13 @@ def display_sidebar():
         st.markdown("### ⚡ Quick Actions")
         
         if st.button("➡️ Continue", use_container_width=True, type="primary"):
-            process_user_input("continue")
-            st.rerun()
+            queue_input("continue")
         
         if st.button("✅ Mark Complete", use_container_width=True):
-            process_user_input("done")
-            st.rerun()
+            queue_input("done")
         
         if st.button("🏋️ Practice", use_container_width=True):
-            process_user_input("give me exercises")
-            st.rerun()
+            queue_input("give me exercises")
         
         col1, col2 = st.columns(2)
         with col1:
@@ -353,19 +416,27 @@ def show_help():
 **Other:**
 - `help` - Show this menu
 """
-    st.session_state.chat_history.append({"role": "ai", "content": help_msg})
+    st.session_state.notice = help_msg
     st.rerun()
 
 def reset_session():
-    """Reset the session state."""
+    """Reset the session state and start a new thread (the old one stays resumable by id)."""
     st.session_state.clear()
+    st.query_params.clear()
     init_session_state()
     st.rerun()
 
+def visible_messages(messages, window):
+    """(number hidden, the last `window` messages); a window of 0 shows everything."""
+    if window <= 0 or len(messages) <= window:
+        return 0, messages
+    return len(messages) - window, messages[-window:]
+
 def display_chat():
     """Display chat messages."""
+    state = st.session_state.state
     # Welcome message if no history
-    if not st.session_state.chat_history:
+    if not state["messages"] and not st.session_state.notice:
         st.markdown("""
         ### 👋 Welcome to React Learning Coach!
         
@@ -385,18 +456,35 @@ def display_chat():
         """)
         return
     
+    # Older turns are folded into the rolling summary
+    if state.get("summary"):
+        with st.expander("🗂️ Earlier in this session", expanded=False):
+            st.markdown(state["summary"])
+    
+    # Only the latest window of the history is drawn; older messages load on demand
+    hidden, messages = visible_messages(state["messages"], st.session_state.chat_window)
+    if hidden:
+        if st.button(f"⬆️ Show {min(hidden, CHAT_PAGE_SIZE)} earlier messages ({hidden} hidden)", key="btn_older"):
+            st.session_state.chat_window += CHAT_PAGE_SIZE
+            rerun_chat()
+    
     # Display chat history using Streamlit's native chat messages
-    for msg in st.session_state.chat_history:
-        if msg["role"] == "user":
+    for msg in messages:
+        if msg.type == "human":
             with st.chat_message("user", avatar="👤"):
-                st.markdown(msg["content"])
+                st.markdown(msg.content)
         else:
             with st.chat_message("assistant", avatar="🎓"):
-                st.markdown(msg["content"])
+                st.markdown(msg.content)
+    
+    if st.session_state.notice:
+        with st.chat_message("assistant", avatar="🎓"):
+            st.markdown(st.session_state.notice)
 
 def main():
     """Main application."""
     init_session_state()
+    st.markdown(CSS, unsafe_allow_html=True)
     
     # Minimal header
     st.title("🎓 React Learning Coach")
@@ -416,10 +504,25 @@ def main():
         </div>
         """, unsafe_allow_html=True)
     
+    chat_panel()
+
+@st.fragment
+def chat_panel():
+    """
+    Chat history, input and suggested actions. Sending a message reruns just
+    this fragment; the sidebar and badge are redrawn only if the turn changed them.
+    """
+    state = st.session_state.state
+    
     # Main chat area
     chat_container = st.container()
     with chat_container:
         display_chat()
+        pending = st.session_state.pop("pending_input", None)
+        if pending:
+            before = sidebar_signature(state)
+            process_user_input(pending)
+            rerun_chat(full=sidebar_signature(st.session_state.state) != before)
     
     # Spacer
     st.markdown("<br>", unsafe_allow_html=True)
@@ -431,8 +534,7 @@ def main():
     )
     
     if user_input:
-        process_user_input(user_input)
-        st.rerun()
+        queue_input(user_input, full=False)
     
     # Contextual quick suggestions based on state
     if state.get("stages"):
@@ -445,13 +547,11 @@ def main():
             
             with col1:
                 if st.button("📖 Show instructions", key="btn_continue", use_container_width=True):
-                    process_user_input("continue")
-                    st.rerun()
+                    queue_input("continue", full=False)
             
             with col2:
                 if st.button("🏋️ Get exercises", key="btn_exercises", use_container_width=True):
-                    process_user_input("give me exercises")
-                    st.rerun()
+                    queue_input("give me exercises", full=False)
             
             with col3:
                 if st.button("❓ Ask question", key="btn_question", use_container_width=True):
@@ -459,8 +559,7 @@ def main():
             
             with col4:
                 if st.button("✅ Mark done", key="btn_done", use_container_width=True):
-                    process_user_input("done")
-                    st.rerun()
+                    queue_input("done", full=False)
     else:
         # Onboarding suggestions
         st.markdown("---")
@@ -470,18 +569,15 @@ def main():
         
         with col1:
             if st.button("📝 Todo App", use_container_width=True):
-                process_user_input("I want to build a todo app with TypeScript")
-                st.rerun()
+                queue_input("I want to build a todo app with TypeScript", full=False)
         
         with col2:
             if st.button("🛒 E-commerce", use_container_width=True):
-                process_user_input("I want to build an e-commerce product catalog")
-                st.rerun()
+                queue_input("I want to build an e-commerce product catalog", full=False)
         
         with col3:
             if st.button("💬 Chat App", use_container_width=True):
-                process_user_input("I want to build a real-time chat application")
-                st.rerun()
+                queue_input("I want to build a real-time chat application", full=False)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Read at import time by the modules under test: keep the suite off the repo's
+# cache and checkpoint files, and off the network.
+_tmp = tempfile.mkdtemp(prefix="coach-tests-")
+os.environ.setdefault("LLM_CACHE_DB", os.path.join(_tmp, "llm_cache.sqlite"))
+os.environ.setdefault("CHECKPOINT_DB", os.path.join(_tmp, "checkpoints.sqlite"))
+os.environ.setdefault("OPENAI_API_KEY", "test")
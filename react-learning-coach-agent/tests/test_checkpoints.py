@@ -0,0 +1,80 @@
+import uuid
+from typing import TypedDict
+
+from langgraph.graph import END, START, StateGraph
+
+from checkpoints import (
+    _UUID_EPOCH_OFFSET,
+    _checkpoint_time,
+    list_threads,
+    open_checkpointer,
+    prune_checkpoints,
+    thread_config,
+)
+
+
+class Counter(TypedDict):
+    n: int
+
+
+def _graph(saver):
+    builder = StateGraph(Counter)
+    builder.add_node("bump", lambda state: {"n": state["n"] + 1})
+    builder.add_edge(START, "bump")
+    builder.add_edge("bump", END)
+    return builder.compile(checkpointer=saver)
+
+
+def _uuid6_at(unix_time: float) -> str:
+    ticks = int(unix_time * 1e7) + _UUID_EPOCH_OFFSET
+    fields = (ticks >> 28, (ticks >> 12) & 0xFFFF, 0x6000 | (ticks & 0x0FFF), 0x80, 0, 1)
+    return str(uuid.UUID(fields=fields))
+
+
+def _count(saver, thread_id):
+    return saver.conn.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+
+
+def test_checkpoint_time_decodes_uuid6_ids():
+    assert abs(_checkpoint_time(_uuid6_at(1_700_000_000.5)) - 1_700_000_000.5) < 1e-3
+
+
+def test_prune_keeps_the_newest_checkpoints_and_resumes_from_them(tmp_path):
+    saver = open_checkpointer(str(tmp_path / "cp.sqlite"), prune=False)
+    graph = _graph(saver)
+    for _ in range(4):
+        graph.invoke({"n": 0}, thread_config("a"))
+    graph.invoke({"n": 10}, thread_config("a"))
+    assert _count(saver, "a") > 3
+
+    stats = prune_checkpoints(saver, keep_per_thread=3, ttl_days=30)
+    assert stats["expired_threads"] == 0 and stats["checkpoints"] > 0
+    assert _count(saver, "a") == 3
+    orphaned = saver.conn.execute(
+        "SELECT COUNT(*) FROM writes w WHERE NOT EXISTS "
+        "(SELECT 1 FROM checkpoints c WHERE c.checkpoint_id = w.checkpoint_id)"
+    ).fetchone()[0]
+    assert orphaned == 0
+    assert graph.get_state(thread_config("a")).values == {"n": 11}
+    saver.conn.close()
+
+
+def test_prune_deletes_idle_threads(tmp_path):
+    path = str(tmp_path / "cp.sqlite")
+    saver = open_checkpointer(path, prune=False)
+    graph = _graph(saver)
+    graph.invoke({"n": 0}, thread_config("fresh"))
+    graph.invoke({"n": 0}, thread_config("stale"))
+    with saver.lock:
+        rows = saver.conn.execute("SELECT rowid FROM checkpoints WHERE thread_id = 'stale'").fetchall()
+        for i, (rowid,) in enumerate(rows):
+            saver.conn.execute(
+                "UPDATE checkpoints SET checkpoint_id = ? WHERE rowid = ?", (_uuid6_at(1_000_000_000 + i), rowid)
+            )
+        saver.conn.commit()
+    saver.conn.close()
+
+    saver = open_checkpointer(path, prune=True)
+    assert list(list_threads(saver)) == ["fresh"]
+    assert saver.conn.execute("SELECT COUNT(*) FROM writes WHERE thread_id = 'stale'").fetchone()[0] == 0
+    saver.conn.close()
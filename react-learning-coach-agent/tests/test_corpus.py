@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from corpus import CorpusStore, chunk_markdown
+
+DOC = """---
+link: https://react.dev/learn/state
+---
+# State
+
+Components remember things with state.
+
+```bash
+# install
+npm i
+```
+
+~~~~tsx
+## not a heading
+```
+# still code
+~~~~
+
+## Updating state
+
+Call the setter.
+"""
+
+
+def test_headings_inside_code_fences_are_content():
+    passages = chunk_markdown(DOC, "state.md", max_chars=10_000)
+    assert [p["topic"] for p in passages] == ["State", "Updating state"]
+    first = passages[0]["content"]
+    assert "# install" in first and "## not a heading" in first and "# still code" in first
+    assert passages[1]["link"] == "https://react.dev/learn/state#updating-state"
+
+
+def test_unclosed_fence_runs_to_the_end():
+    passages = chunk_markdown("# Top\n```\n# inside\n", "doc.md", max_chars=10_000)
+    assert [p["topic"] for p in passages] == ["Top"]
+    assert "# inside" in passages[0]["content"]
+
+
+def _write(path, text):
+    path.write_text(text)
+    # Same-size rewrites within one mtime tick would look unchanged
+    os.utime(path, ns=(path.stat().st_mtime_ns + 10**9,) * 2)
+
+
+def test_sync_only_touches_changed_files(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    _write(docs / "state.md", "# State\n\nuseState keeps a value.\n")
+    _write(docs / "effects.md", "# Effects\n\nuseEffect syncs with systems.\n")
+    store = CorpusStore(str(tmp_path / "store"))
+    assert store.sync(str(docs)) == {"added": 2, "removed": 0, "files_changed": 2}
+    before = store.fingerprint()
+    assert store.sync(str(docs)) == {"added": 0, "removed": 0, "files_changed": 0}
+
+    _write(docs / "state.md", "# State\n\nuseReducer handles complex state.\n")
+    assert store.sync(str(docs)) == {"added": 1, "removed": 1, "files_changed": 1}
+    added, removed = store.changes_since(before)
+    assert len(added) == len(removed) == 1
+    assert store[next(iter(added))]["content"] == "useReducer handles complex state."
+    with pytest.raises(KeyError):
+        store[next(iter(removed))]
+    assert len(store) == 2
+    store.close()
+
+
+def test_reopened_store_rebuilds_the_index_from_snapshot_and_deltas(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    _write(docs / "refs.md", "# Refs\n\nuseRef holds a mutable value.\n")
+    store = CorpusStore(str(tmp_path / "store"))
+    store.sync(str(docs))
+    store.lexical_index()
+    _write(docs / "memo.md", "# Memo\n\nuseMemo caches a calculation.\n")
+    (docs / "refs.md").unlink()
+    store.sync(str(docs), paths=["memo.md", "refs.md"])
+    expected = store.lexical_index().search("usememo caches", k=3)
+    store.close()
+
+    reopened = CorpusStore(str(tmp_path / "store"))
+    assert reopened.changes_since("elsewhere:0") is None
+    hits = reopened.lexical_index().search("usememo caches", k=3)
+    assert hits == expected
+    assert reopened[hits[0][1]]["topic"] == "Memo"
+    assert reopened.lexical_index().search("useref mutable", k=3) == []
+    reopened.close()
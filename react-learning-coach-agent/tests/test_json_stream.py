@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from json_stream import ArrayItemStream, repair_json
+
+PLAN = {"stages": [{"name": "Setup", "goal": "Scaffold"}, {"name": "State", "goal": "useState"}]}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('```json\n{"a": 1,}\n```', {"a": 1}),
+    ('Here you go: {"a": [1, 2', {"a": [1, 2]}),
+    ('{"a": "unfinished', {"a": "unfinished"}),
+    ('{"a": 1, "b":', {"a": 1}),
+    ('{"a": 1, "b', {"a": 1}),
+    ('{"a": tru', {}),
+    ('{"a": [1, nul', {"a": [1]}),
+    ('{"a": {"b": fals', {"a": {}}),
+    ('[tru', []),
+])
+def test_repair_json_partial_input(text, expected):
+    assert repair_json(text) == expected
+
+
+def test_repair_json_without_json_raises():
+    with pytest.raises(ValueError):
+        repair_json("no json here")
+
+
+def _feed(stream, text, size):
+    items = []
+    for i in range(0, len(text), size):
+        items += stream.feed(text[i:i + size])
+    return items
+
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_array_items_arrive_as_each_closes(size):
+    assert _feed(ArrayItemStream("stages"), json.dumps(PLAN), size) == PLAN["stages"]
+
+
+def test_array_item_stream_keeps_incomplete_item_back():
+    text = json.dumps(PLAN)
+    cut = text.index('{"name": "State"') + 10
+    stream = ArrayItemStream("stages")
+    assert stream.feed(text[:cut]) == PLAN["stages"][:1]
+    assert stream.feed(text[cut:]) == PLAN["stages"][1:]
+
+
+def test_array_item_stream_ignores_arrays_outside_the_key():
+    text = 'Plan [draft]:\n```json\n{"tags": [{"x": 1}], "stages": [{"name": "A", "goal": "g"}], "more": [{"y": 2}]}'
+    assert _feed(ArrayItemStream("stages"), text, 4) == [{"name": "A", "goal": "g"}]
+
+
+def test_array_item_stream_result_repairs_truncated_document():
+    stream = ArrayItemStream("stages")
+    stream.feed('{"stages": [{"name": "A", "goal": "g"}, {"name": "B"')
+    assert stream.result() == {"stages": [{"name": "A", "goal": "g"}, {"name": "B"}]}
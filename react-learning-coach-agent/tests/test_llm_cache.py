@@ -0,0 +1,46 @@
+import sqlite3
+import time
+
+import llm_cache
+from llm_cache import ResponseCache
+
+
+def _disk(path, sql, *args):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(sql, args).fetchone()[0]
+
+
+def test_size_total_tracks_stores_replacements_and_evictions(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, memory_entries=4, max_disk_bytes=1000)
+    for i in range(30):
+        cache.put(f"k{i % 12}", "x" * (50 + i * 7))
+    total = _disk(path, "SELECT bytes FROM responses_size")
+    assert total == _disk(path, "SELECT SUM(size) FROM responses") <= 1000
+    assert cache.stats()["evictions"] > 0
+    cache.clear()
+    assert _disk(path, "SELECT bytes FROM responses_size") == 0
+
+
+def test_existing_file_gets_its_size_total(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    ResponseCache(path).put("k", "abc")
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE responses_size")
+    ResponseCache(path)
+    assert _disk(path, "SELECT bytes FROM responses_size") == 3
+
+
+def test_memory_hits_refresh_disk_lru_in_batches(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    keys = [f"k{i}" for i in range(llm_cache.TOUCH_BATCH)]
+    for key in keys:
+        cache.put(key, "v")
+    stored = _disk(path, "SELECT MAX(accessed) FROM responses")
+    time.sleep(0.01)
+    for key in keys[:-1]:
+        assert cache.get(key) == "v"
+    assert _disk(path, "SELECT COUNT(*) FROM responses WHERE accessed > ?", stored) == 0
+    cache.get(keys[-1])
+    assert _disk(path, "SELECT COUNT(*) FROM responses WHERE accessed > ?", stored) == len(keys)
@@ -0,0 +1,48 @@
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+
+from memory import HistoryManager, local_summarizer, memory_stats, split_turns
+
+
+def _conversation(turns):
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"question {i}", id=f"h{i}"))
+        messages.append(AIMessage(content=f"## Answer {i}\n\ndetails", id=f"a{i}"))
+    return messages
+
+
+def test_split_turns_starts_a_turn_at_each_human_message():
+    leading = AIMessage(content="welcome", id="w")
+    turns = split_turns([leading] + _conversation(2))
+    assert [[m.id for m in turn] for turn in turns] == [["w"], ["h0", "a0"], ["h1", "a1"]]
+
+
+def test_compact_folds_all_but_the_last_turns():
+    state = {"messages": _conversation(5), "summary": "- Learner: earlier"}
+    update = HistoryManager(max_turns=2).compact(state)
+    assert all(isinstance(m, RemoveMessage) for m in update["messages"])
+    assert [m.id for m in update["messages"]] == ["h0", "a0", "h1", "a1", "h2", "a2"]
+    assert update["summary"].splitlines() == [
+        "- Learner: earlier",
+        "- Learner: question 0", "- Coach: ## Answer 0",
+        "- Learner: question 1", "- Coach: ## Answer 1",
+        "- Learner: question 2", "- Coach: ## Answer 2",
+    ]
+
+
+def test_compact_is_a_no_op_within_the_window():
+    assert HistoryManager(max_turns=3).compact({"messages": _conversation(3)}) == {}
+
+
+def test_local_summary_drops_the_oldest_lines_past_the_limit(monkeypatch):
+    monkeypatch.setattr("memory.SUMMARY_MAX_CHARS", 60)
+    summary = local_summarizer("", _conversation(4))
+    assert len(summary) <= 60
+    assert summary.splitlines()[-1] == "- Coach: ## Answer 3"
+
+
+def test_memory_stats_counts_messages_and_summary_bytes():
+    stats = memory_stats({"messages": _conversation(2), "summary": "ü"})
+    assert stats["messages"] == 4 and stats["turns"] == 2
+    assert stats["summary_bytes"] == 2
+    assert stats["total_bytes"] == stats["message_bytes"] + 2
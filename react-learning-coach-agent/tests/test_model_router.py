@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+import model_router
+from model_router import ModelRouter, load_config
+
+TIERS = ["big", "mid", "small"]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(model_router.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _router(cooldown=60.0):
+    config = load_config(json.dumps({
+        "tiers": TIERS,
+        "prices": {"big": [2.0, 8.0]},
+        "nodes": {"coaching": {"model": "big", "budget_s": 1.0, "max_tokens": 500}},
+    }))
+    return ModelRouter(config, cooldown=cooldown)
+
+
+def test_overrides_merge_over_the_defaults():
+    config = load_config('{"nodes": {"coaching": {"model": "x"}}}')
+    assert config["nodes"]["coaching"] == {"budget_s": 20, "model": "x"}
+    assert config["nodes"]["planning"] == {"budget_s": 30}
+    assert config["tiers"] == model_router.TIERS
+
+
+def test_chain_starts_at_the_declared_model():
+    router = _router()
+    assert router.chain("coaching") == TIERS
+    router.nodes["exercises"]["model"] = "mid"
+    assert router.chain("exercises") == ["mid", "small"]
+    router.nodes["exercises"]["model"] = "custom"
+    assert router.chain("exercises") == ["custom"]
+
+
+def test_node_over_budget_falls_back_one_tier_at_a_time(clock):
+    router = _router()
+    route = router.route("coaching")
+    assert (route.model, route.max_tokens, route.budget_s) == ("big", 500, 1.0)
+    router.observe(route, 0.5)
+    router.observe(route, 1.6)  # ewma 0.3 * 1.6 + 0.7 * 0.5 = 0.83, within budget
+    assert router.route("coaching").model == "big"
+    router.observe(route, 3.0)
+    assert router.route("coaching").model == "mid"
+    # A slow reply from the old tier, finishing late, doesn't demote twice
+    router.observe(route, 5.0)
+    assert router.route("coaching").model == "mid"
+    router.observe(router.route("coaching"), 2.0)
+    assert router.route("coaching").model == "small"
+    router.observe(router.route("coaching"), 9.0)
+    assert router.route("coaching").model == "small"
+    assert router.stats()["nodes"]["coaching"] == {"model": "small", "budget_s": 1.0, "fallbacks": 2}
+
+
+def test_tier_above_is_probed_again_after_the_cooldown(clock):
+    router = _router(cooldown=60)
+    router.observe(router.route("coaching"), 3.0)
+    assert router.route("coaching").model == "mid"
+    clock[0] += 59
+    assert router.route("coaching").model == "mid"
+    clock[0] += 1
+    probe = router.route("coaching")
+    assert probe.model == "big"
+    # The probe starts from fresh measurements, not the old slow average
+    router.observe(probe, 0.4)
+    assert router.route("coaching").model == "big"
+    router.observe(probe, 4.0)
+    assert router.route("coaching").model == "mid"
+
+
+def test_stats_report_cost_and_latency_per_tier(clock):
+    router = _router()
+    route = router.route("coaching")
+    router.observe(route, 0.2, {"input_tokens": 1000, "output_tokens": 500})
+    router.observe(route, 0.4, {"input_tokens": 1000, "output_tokens": 500})
+    big = router.stats()["tiers"]["big"]
+    assert big["calls"] == 2 and big["mean_ms"] == pytest.approx(300.0)
+    assert big["cost_usd"] == pytest.approx(2 * (1000 * 2.0 + 500 * 8.0) / 1_000_000)
+    assert big["p50_ms"] == 400.0
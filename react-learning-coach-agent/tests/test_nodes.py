@@ -0,0 +1,81 @@
+import asyncio
+import copy
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+import fake_llm
+import runtime
+from nodes import acoaching_node, aonboarding_node, aplanning_node, coaching_node, onboarding_node, planning_node
+
+STAGES = [{**stage, "tasks": list(stage["tasks"])} for stage in fake_llm.PLAN_JSON["stages"]]
+
+
+def _state(text, **extra):
+    state = {
+        "messages": [HumanMessage(content=text)],
+        "summary": "",
+        "learner_profile": {},
+        "project_spec": {},
+        "stages": [],
+        "plan_basis": {},
+        "current_stage_index": 0,
+        "status": "onboarding",
+    }
+    state.update(copy.deepcopy(extra))
+    return state
+
+
+def _coaching_state(text):
+    return _state(
+        text,
+        learner_profile={"assumed_level": "beginner"},
+        project_spec={"summary": "A todo app", "features": ["add todos"]},
+        stages=STAGES,
+        status="coaching",
+    )
+
+
+@pytest.fixture(autouse=True)
+def fake_model(monkeypatch):
+    # Both twins must reach the model, not the first one's cached reply
+    monkeypatch.setattr("llm_calls.CACHE_ENABLED", False)
+    runtime.set_llm_factory(fake_llm.factory())
+    yield
+    runtime.set_llm_factory(None)
+
+
+def _contents(state):
+    return [m.content for m in state["messages"]]
+
+
+def _assert_twins_agree(sync_node, async_node, state):
+    expected = sync_node(copy.deepcopy(state))
+    actual = asyncio.run(async_node(copy.deepcopy(state)))
+    assert _contents(actual) == _contents(expected)
+    assert {k: v for k, v in actual.items() if k != "messages"} == {k: v for k, v in expected.items() if k != "messages"}
+    return actual
+
+
+def test_onboarding_twins_agree():
+    state = _assert_twins_agree(onboarding_node, aonboarding_node, _state("a todo app"))
+    assert state["project_spec"]["features"] == fake_llm.ONBOARDING_JSON["features"]
+    assert state["status"] == "onboarding_complete"
+
+
+def test_planning_twins_agree():
+    onboarded = onboarding_node(_state("a todo app"))
+    state = _assert_twins_agree(planning_node, aplanning_node, onboarded)
+    assert [s["name"] for s in state["stages"]] == fake_llm.STAGE_NAMES
+    assert state["status"] == "coaching"
+
+
+@pytest.mark.parametrize("text", [
+    "continue",
+    "give me exercises",
+    "review this:\n```tsx\nuseEffect(() => { setCount(count + 1) })\n```",
+    "done",
+])
+def test_coaching_twins_agree(text):
+    state = _assert_twins_agree(coaching_node, acoaching_node, _coaching_state(text))
+    assert state["messages"][-1].type == "ai"
@@ -0,0 +1,158 @@
+import concurrent.futures
+
+import pytest
+
+import fake_llm
+import runtime
+from llm_calls import request_key
+from prefetch import Prefetcher, _Entry
+
+STATE = {
+    "messages": [],
+    "learner_profile": {"assumed_level": "beginner"},
+    "project_spec": {"summary": "A todo app", "features": ["add todos"]},
+    "stages": fake_llm.PLAN_JSON["stages"],
+    "current_stage_index": 0,
+    "status": "coaching",
+}
+
+
+def _add(prefetcher, key, text, ahead=0, session="s1", result=None, started=True):
+    """A prediction as schedule() leaves it; `result` set means its reply is already generated."""
+    entry = _Entry(session, text, ahead, "coaching")
+    entry.started = started
+    entry.future = concurrent.futures.Future()
+    if result is not None:
+        entry.future.set_running_or_notify_cancel()
+        entry.future.set_result(result)
+    prefetcher._entries[key] = entry
+    with prefetcher._lock:
+        prefetcher._session(session)
+    return entry
+
+
+def test_take_returns_generated_reply_once():
+    prefetcher = Prefetcher(enabled=True)
+    _add(prefetcher, "k", "continue", result="reply")
+    assert prefetcher.take("k") == "reply"
+    assert prefetcher.take("k") is None
+    assert prefetcher.stats()["hits"] == 1
+
+
+def test_take_cancels_prediction_not_started_yet():
+    prefetcher = Prefetcher(enabled=True)
+    entry = _add(prefetcher, "k", "continue", started=False)
+    assert prefetcher.take("k") is None
+    assert entry.future.cancelled()
+
+
+def test_take_gives_up_at_turn_deadline(monkeypatch):
+    monkeypatch.setattr("prefetch.time_left", lambda default: 0.05)
+    prefetcher = Prefetcher(enabled=True)
+    entry = _add(prefetcher, "k", "continue")
+    entry.future.set_running_or_notify_cancel()  # being generated, never finishes
+    assert prefetcher.take("k") is None
+
+
+def test_cancel_counts_unused_replies_as_waste():
+    prefetcher = Prefetcher(enabled=True, token_budget=100)
+    _add(prefetcher, "done", "continue", result="x" * 200)
+    running = _add(prefetcher, "running", "give me exercises")
+    other = _add(prefetcher, "other", "continue", session="s2")
+    prefetcher.cancel("s1")
+    assert running.future.cancelled()
+    assert prefetcher.budget_left("s1") == 100 - 50
+    assert list(prefetcher._entries) == ["other"] and not other.future.cancelled()
+    assert prefetcher.stats()["cancelled"] == 1 and prefetcher.stats()["wasted"] == 1
+
+
+def test_cancel_of_a_generation_past_cancelling_counts_its_reply_when_done():
+    prefetcher = Prefetcher(enabled=True, token_budget=100)
+    entry = _add(prefetcher, "k", "continue")
+    entry.future.set_running_or_notify_cancel()
+    prefetcher.cancel("s1")
+    assert not prefetcher.has_pending()
+    assert "cancelled" not in prefetcher.stats() and prefetcher.budget_left("s1") == 100
+    entry.future.set_result("x" * 120)
+    assert prefetcher.budget_left("s1") == 100 - 30 and prefetcher.stats()["wasted"] == 1
+
+
+def test_evicted_sessions_take_their_predictions_with_them(monkeypatch):
+    monkeypatch.setattr("prefetch.MAX_SESSIONS", 2)
+    prefetcher = Prefetcher(enabled=True)
+    first = _add(prefetcher, "a", "continue", session="s1", started=False)
+    _add(prefetcher, "b", "continue", session="s2")
+    _add(prefetcher, "c", "continue", session="s3")
+    assert list(prefetcher._sessions) == ["s2", "s3"]
+    assert set(prefetcher._entries) == {"b", "c"} and first.future.cancelled()
+    for key in ("b", "c"):
+        prefetcher._entries[key].future.cancel()
+    prefetcher.cancel("s2")
+    prefetcher.cancel("s3")
+    assert not prefetcher.has_pending()
+
+
+def test_on_input_keeps_predictions_for_predicted_text():
+    prefetcher = Prefetcher(enabled=True)
+    _add(prefetcher, "a", "continue")
+    _add(prefetcher, "b", "give me exercises")
+    prefetcher.on_input("s1", "  Continue ")
+    assert set(prefetcher._entries) == {"a", "b"}
+
+
+def test_on_input_cancels_on_unpredicted_text():
+    prefetcher = Prefetcher(enabled=True)
+    _add(prefetcher, "a", "continue")
+    prefetcher.on_input("s1", "what is a prop?")
+    assert not prefetcher._entries
+
+
+def test_on_input_done_keeps_next_stage_predictions():
+    prefetcher = Prefetcher(enabled=True)
+    _add(prefetcher, "this", "continue", ahead=0)
+    _add(prefetcher, "next", "continue", ahead=1)
+    prefetcher.on_input("s1", "done")
+    assert set(prefetcher._entries) == {"next"}
+
+
+@pytest.fixture
+def fake_model():
+    runtime.set_llm_factory(fake_llm.factory())
+    yield
+    runtime.set_llm_factory(None)
+
+
+def test_schedule_generates_what_coaching_would_request(fake_model):
+    prefetcher = Prefetcher(enabled=True)
+    predicted = prefetcher.predict(STATE)
+    assert [(text, ahead) for text, ahead, _ in predicted] == [("continue", 0), ("give me exercises", 0), ("continue", 1)]
+    assert prefetcher.schedule("s1", STATE) == 3
+
+    text, ahead, step = predicted[0]
+    route = runtime.get_router().route(step["node"])
+    key = request_key(runtime.get_llm(route.model), step["messages"], route.max_tokens)
+    prefetcher._entries[key].future.result(timeout=10)
+    assert prefetcher.take(key) == fake_llm.COACHING_TEXT
+    prefetcher.cancel("s1")
+
+
+def test_spent_budget_stops_prefetching_for_that_session(fake_model):
+    prefetcher = Prefetcher(enabled=True, token_budget=10)
+    _add(prefetcher, "old", "continue", result="x" * 80)
+    prefetcher.cancel("s1")
+    assert prefetcher.budget_left("s1") == -10
+    assert prefetcher.schedule("s1", STATE) == 0
+    assert prefetcher.predict(STATE) and not prefetcher.has_pending()
+
+
+def test_predicting_leaves_the_state_and_the_stream_alone(monkeypatch):
+    from nodes import coaching_request
+
+    emitted = []
+    monkeypatch.setattr("nodes.emit_text", emitted.append)
+    state = {**STATE, "project_spec": {"summary": "A todo app", "features": ["add todos"]}}
+    assert coaching_request(state, "add feature: dark mode") is None
+    assert coaching_request(state, "done") is None
+    assert state["project_spec"]["features"] == ["add todos"]
+    assert state["current_stage_index"] == 0 and state["messages"] == []
+    assert emitted == []
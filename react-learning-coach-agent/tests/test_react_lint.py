@@ -0,0 +1,71 @@
+import pytest
+
+from react_lint import fallback_review, lint_react, local_review, review_key, strip_comments
+
+
+def _rules(code):
+    return [(f["rule"], f["line"], f["severity"]) for f in lint_react(code)]
+
+
+@pytest.mark.parametrize("code, expected", [
+    ("useEffect(() => {\n  load();\n});", [("effect-missing-deps", 1, "warning")]),
+    ("useEffect(async () => {\n  await load();\n}, []);", [("async-effect", 1, "error")]),
+    (
+        "function Counter() {\n  const [n, setN] = useState(0);\n  setN(n + 1);\n  return <p>{n}</p>;\n}",
+        [("set-state-in-render", 3, "error")],
+    ),
+    (
+        "const [todos, setTodos] = useState([]);\nconst add = (t) => todos.push(t);",
+        [("state-mutation", 2, "error")],
+    ),
+    ("if (open) {\n  const [v] = useState(0);\n}", [("conditional-hook", 2, "error")]),
+    ('<div class="x">\n<label for="name">', [("jsx-class-attribute", 1, "error"), ("jsx-for-attribute", 2, "error")]),
+    ('<div style="color: red">', [("jsx-style-string", 1, "error")]),
+    ("<button onClick={save()}>", [("handler-called-in-render", 1, "error")]),
+    ("<button onClick={select(id)}>", [("handler-called-in-render", 1, "warning")]),
+    ("items.map(item => <li>{item}</li>)", [("missing-key", 1, "warning")]),
+])
+def test_rules(code, expected):
+    assert _rules(code) == expected
+
+
+@pytest.mark.parametrize("code", [
+    "useEffect(() => {\n  load();\n}, [id]);",
+    "function Counter() {\n  const [n, setN] = useState(0);\n  const inc = () => setN(n + 1);\n  return <p>{n}</p>;\n}",
+    "const [todos, setTodos] = useState([]);\nsetTodos([...todos, t]);",
+    "<label className=\"x\" htmlFor=\"name\" style={{ color: 'red' }}>",
+    "<button onClick={() => save()}>",
+    "items.map(item => <li key={item.id}>{item}</li>)",
+])
+def test_correct_code_is_quiet(code):
+    assert lint_react(code) == []
+
+
+def test_rules_ignore_comments_and_keep_line_numbers():
+    code = "// useEffect(() => {})\n/* <div class=\"x\">\n */\nconst s = '// not a comment';\n<div class=\"y\">"
+    assert strip_comments(code).splitlines()[3] == "const s = '// not a comment';"
+    assert _rules(code) == [("jsx-class-attribute", 5, "error")]
+
+
+def test_review_key_ignores_comments_and_whitespace_but_not_the_stage():
+    code = "const a = 1; // one\nconst b = 2;"
+    same = "/* header */\nconst a = 1;\n\n   const b = 2;"
+    assert review_key(code, "Stage 1") == review_key(same, "Stage 1")
+    assert review_key(code, "Stage 1") != review_key(code, "Stage 2")
+    assert review_key(code, "Stage 1") != review_key("const a = 2;\nconst b = 2;", "Stage 1")
+
+
+def test_local_review_answers_only_for_errors():
+    warning_only = lint_react("useEffect(() => {\n  load();\n});")
+    assert local_review(warning_only) is None
+
+    findings = lint_react("useEffect(() => {\n  load();\n});\n<div class=\"x\">")
+    review = local_review(findings)
+    assert review["source"] == "local"
+    assert review["issues"].splitlines() == [f"- Line {f['line']}: {f['message']}" for f in findings]
+    assert review["high_level_hint"].startswith("JSX is JavaScript")
+
+
+def test_fallback_review_without_findings_is_a_generic_nudge():
+    review = fallback_review([])
+    assert review["suggested_fundamentals"] == "N/A" and review["high_level_hint"]
@@ -0,0 +1,66 @@
+import json
+
+from replan import merge_replan, plan_changes, replan_messages
+
+
+def _stage(name, features=()):
+    return {"name": name, "goal": f"{name} goal", "tasks": [f"{name} task"], "fundamentals": [], "docs": [],
+            "features": list(features)}
+
+
+def _state(idx, features=("todos",), level="beginner"):
+    return {
+        "stages": [_stage("Setup"), _stage("Todos", ["todos"]), _stage("Polish")],
+        "current_stage_index": idx,
+        "learner_profile": {"assumed_level": level},
+        "project_spec": {"summary": "A todo app", "features": list(features)},
+        "plan_basis": {"level": "beginner", "features": ["todos"]},
+    }
+
+
+def test_prompt_keeps_the_project_line_before_any_stage_is_done():
+    prompt = replan_messages(_state(0, features=("todos", "dark mode")))[1].content
+    lines = prompt.splitlines()
+    assert lines[0] == "Project: A todo app"
+    assert "done" not in prompt
+    assert lines[1] == "Change: added features: dark mode"
+    assert lines[2:] == ["Remaining:", "1. Setup []", "2. Todos [todos]", "3. Polish []"]
+
+
+def test_prompt_counts_done_stages_and_lists_only_the_rest():
+    prompt = replan_messages(_state(2, level="advanced"))[1].content
+    assert prompt.splitlines() == [
+        "Project: A todo app",
+        "Stages 1-2 done.",
+        "Change: level beginner -> advanced (adjust depth of remaining stages)",
+        "Remaining:",
+        "3. Polish []",
+    ]
+
+
+def test_plan_changes_diffs_against_the_plan_basis():
+    changes = plan_changes(_state(0, features=("dark mode",)))
+    assert changes == {"added_features": ["dark mode"], "removed_features": ["todos"], "level": None}
+
+
+def test_merge_keeps_done_stages_and_overlays_changed_ones():
+    state = _state(1, features=("todos", "dark mode"))
+    reply = json.dumps({"stages": [2, {"name": "polish", "goal": "Theme it", "features": ["dark mode"]}]})
+    stages = merge_replan(state, reply)
+    assert stages[:2] == state["stages"][:2]
+    assert stages[2]["goal"] == "Theme it" and stages[2]["features"] == ["dark mode"]
+    assert stages[2]["tasks"] == ["Polish task"]
+
+
+def test_merge_ignores_numbers_of_done_stages_and_keeps_by_name():
+    state = _state(1)
+    stages = merge_replan(state, json.dumps({"stages": [1, {"name": "Todos", "keep": True}, 3]}))
+    assert [s["name"] for s in stages] == ["Setup", "Todos", "Polish"]
+
+
+def test_unparseable_reply_keeps_the_old_stages_and_places_added_features():
+    state = _state(1, features=("todos", "dark mode"))
+    stages = merge_replan(state, "not json at all")
+    assert [s["name"] for s in stages] == ["Setup", "Todos", "Polish"]
+    assert stages[-1]["features"] == ["dark mode"]
+    assert state["stages"][-1]["features"] == []
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failures=3, reset_after=10)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record(False)
+    assert breaker.state == "closed"
+    breaker.record(False)
+    assert breaker.state == "open" and breaker.opens == 1
+    assert not breaker.allow()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failures=2, reset_after=10)
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == "closed"
+
+
+def test_half_open_allows_one_trial_call(clock):
+    breaker = CircuitBreaker(failures=1, reset_after=10)
+    breaker.record(False)
+    clock[0] += 10
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_successful_trial_closes(clock):
+    breaker = CircuitBreaker(failures=1, reset_after=10)
+    breaker.record(False)
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_trial_reopens_for_another_period(clock):
+    breaker = CircuitBreaker(failures=1, reset_after=10)
+    breaker.record(False)
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open" and not breaker.allow()
+    assert breaker.opens == 1  # reopening is not a new opening
+    clock[0] += 10
+    assert breaker.allow()
+
+
+class ClientError(Exception):
+    status_code = 400
+
+
+def _flaky(failures, exc=RuntimeError):
+    calls = []
+
+    def attempt(cancelled):
+        calls.append(1)
+        if len(calls) <= failures:
+            raise exc("boom")
+        return "reply"
+
+    return attempt, calls
+
+
+def test_transient_failures_are_retried():
+    res = resilience.Resilience(enabled=True, retries=2, backoff=0, hedge=False)
+    attempt, calls = _flaky(2)
+    assert res.call("coaching", "m", attempt) == "reply"
+    assert len(calls) == 3
+    assert res.stats()["retries"] == 2
+
+
+def test_retries_run_out():
+    res = resilience.Resilience(enabled=True, retries=1, backoff=0, hedge=False)
+    attempt, calls = _flaky(5)
+    with pytest.raises(resilience.BackendUnavailable):
+        res.call("coaching", "m", attempt)
+    assert len(calls) == 2
+
+
+def test_client_errors_are_not_retried():
+    res = resilience.Resilience(enabled=True, retries=3, backoff=0, hedge=False)
+    attempt, calls = _flaky(1, exc=ClientError)
+    with pytest.raises(ClientError):
+        res.call("coaching", "m", attempt)
+    assert len(calls) == 1
+    assert res.breaker("m").state == "closed"
+
+
+def test_slow_attempt_times_out():
+    res = resilience.Resilience(enabled=True, retries=0, attempt_timeout=0.05, hedge=False)
+
+    def attempt(cancelled):
+        cancelled.wait(5)
+        return "late"
+
+    with pytest.raises(resilience.BackendUnavailable):
+        res.call("coaching", "m", attempt)
+    assert res.stats()["timeouts"] == 1
+
+
+def test_async_calls_retry_too():
+    res = resilience.Resilience(enabled=True, retries=2, backoff=0, hedge=False)
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return "reply"
+
+    assert asyncio.run(res.acall("coaching", "m", attempt)) == "reply"
+    assert len(calls) == 2
+
+
+def test_time_left_is_capped_by_the_default_outside_a_turn():
+    assert resilience.time_left(7.0) == 7.0
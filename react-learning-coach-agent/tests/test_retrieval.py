@@ -0,0 +1,51 @@
+import math
+
+import pytest
+
+from retrieval import BM25Index, fuse_rankings, tokenize
+
+DOCS = [
+    "useState hook keeps local state in a component",
+    "useEffect runs side effects after render",
+    "props pass data from parent to child components",
+    "state state state: lifting state up to a shared parent",
+]
+
+
+def test_tokenize_lowercases_and_strips_plurals():
+    assert tokenize("React Hooks, props & glass") == ["react", "hook", "prop", "glass"]
+
+
+def test_bm25_score_matches_the_formula():
+    index = BM25Index.from_texts(DOCS)
+    [(score, doc_id)] = index.search("effects", k=1)
+    assert doc_id == 1
+    n, df = len(DOCS), 1
+    avgdl = sum(len(tokenize(d)) for d in DOCS) / n
+    idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+    dl, k1, b = len(tokenize(DOCS[1])), 1.5, 0.75
+    assert score == pytest.approx(idf * (k1 + 1) / (1 + k1 * (1 - b + b * dl / avgdl)))
+
+
+def test_term_frequency_ranks_higher_and_unmatched_docs_are_skipped():
+    hits = BM25Index.from_texts(DOCS).search("state", k=10)
+    assert [doc_id for _, doc_id in hits] == [3, 0]
+
+
+def test_remove_and_add_match_a_rebuild():
+    index = BM25Index.from_texts(DOCS)
+    index.remove(3, DOCS[3])
+    index.add(3, "context avoids passing props down")
+    rebuilt = BM25Index.from_texts(DOCS[:3] + ["context avoids passing props down"])
+    for query in ("props", "state", "context render"):
+        assert index.search(query, 4) == rebuilt.search(query, 4)
+
+
+def test_empty_index_and_k_zero():
+    assert BM25Index().search("state") == []
+    assert BM25Index.from_texts(DOCS).search("state", k=0) == []
+
+
+def test_fuse_rankings_rewards_agreement():
+    fused = fuse_rankings([[(9.0, 1), (8.0, 2)], [(0.9, 2), (0.8, 3)]], k=3)
+    assert [doc_id for _, doc_id in fused] == [2, 1, 3]
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import pytest
+
+import review
+from review import extract_code_blocks, merge_reviews, review_chunks, split_code
+
+
+def _component(name, body_lines):
+    return "\n".join([f"function {name}() {{"] + ["  step();"] * body_lines + ["}"])
+
+
+FILE = "\n".join([
+    "import { useState } from 'react';",
+    _component("Header", 3),
+    "const formatDate = (d) => {",
+    "  return d.toISOString();",
+    "};",
+    _component("TodoList", 4),
+    "export default function App() {",
+    "  return <TodoList />;",
+    "}",
+])
+
+
+def test_fenced_blocks_are_extracted_in_order():
+    text = "first:\n```tsx\nconst a = 1;\n```\nempty:\n```\n\n```\nthen:\n```js\nconst b = 2;\n```"
+    assert extract_code_blocks(text) == ["const a = 1;", "const b = 2;"]
+
+
+def test_short_code_is_one_piece():
+    assert split_code(FILE, max_lines=100) == [("Header, TodoList, App", FILE)]
+
+
+def test_long_code_is_cut_at_top_level_declarations():
+    chunks = split_code(FILE, max_lines=8)
+    assert "\n".join(code for _, code in chunks) == FILE
+    assert all(len(code.splitlines()) <= 8 for _, code in chunks)
+    assert [label for label, _ in chunks] == ["Header", "formatDate", "TodoList", "App"]
+    # Nested code never starts a piece
+    assert all(not code.startswith(" ") for _, code in chunks)
+
+
+def test_pieces_pack_consecutive_declarations():
+    chunks = split_code(FILE, max_lines=12)
+    # Labels name the components a piece holds, helpers only when there are none
+    assert [label for label, _ in chunks] == ["Header", "TodoList, App"]
+    assert chunks[0][1].count("\n") + 1 == 9 and "formatDate" in chunks[0][1]
+
+
+def test_review_chunks_label_each_block():
+    text = f"```tsx\n{FILE}\n```\nand\n```tsx\nconst x = 1;\n```\n```css\n.a {{ color: red; }}\n```"
+    labels = [label for label, _ in review_chunks(text, max_lines=12)]
+    assert labels == ["Block 1: Header", "Block 1: TodoList, App", "Block 2: x", "Block 3: snippet"]
+
+
+def _review(issues, fundamentals, source="llm"):
+    return {"issues": issues, "suggested_fundamentals": fundamentals, "high_level_hint": f"hint {issues}",
+            "source": source}
+
+
+def test_merge_lists_every_piece_and_the_skipped_ones():
+    chunks = [("Block 1: A", ""), ("Block 1: B", ""), ("Block 2: C", "")]
+    merged = merge_reviews(chunks, [
+        _review("a bad", "props, state"), None, _review("c bad", "state, effects", source="local"),
+    ])
+    assert merged["issues"] == (
+        "**Block 1: A**\na bad\n\n**Block 2: C**\nc bad\n\n_Not reviewed (timed out or failed): Block 1: B_"
+    )
+    assert merged["suggested_fundamentals"] == "props, state, effects"
+    assert merged["high_level_hint"] == "hint a bad"
+    assert merged["source"] == "llm+local"
+
+
+def test_merge_of_one_piece_is_that_review_and_of_none_raises():
+    only = _review("x", "y")
+    assert merge_reviews([("Block 1: A", "")], [only]) is only
+    with pytest.raises(RuntimeError):
+        merge_reviews([("Block 1: A", ""), ("Block 2: B", "")], [None, None])
+
+
+def _slow_on_b(code, stage_info):
+    if "B" in code:
+        time.sleep(1)
+    return _review(code, "f")
+
+
+async def _aslow_on_b(code, stage_info):
+    if "B" in code:
+        await asyncio.sleep(1)
+    return _review(code, "f")
+
+
+TWO_BLOCKS = "```\nconst A = 1;\n```\n```\nconst B = 2;\n```"
+
+
+def test_pieces_past_the_deadline_are_not_reviewed(monkeypatch):
+    monkeypatch.setattr(review, "analyze_code_snippet", _slow_on_b)
+    merged = review.review_code(TWO_BLOCKS, "stage", deadline=0.2)
+    assert merged["issues"].endswith("_Not reviewed (timed out or failed): Block 2: B_")
+
+
+def test_async_pieces_past_the_deadline_are_not_reviewed(monkeypatch):
+    monkeypatch.setattr(review, "aanalyze_code_snippet", _aslow_on_b)
+    merged = asyncio.run(review.areview_code(TWO_BLOCKS, "stage", deadline=0.2))
+    assert merged["issues"].endswith("_Not reviewed (timed out or failed): Block 2: B_")
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from starlette.testclient import TestClient
+
+from server import RETRY_AFTER_SECONDS, SessionLocks, WorkerPool, create_app
+
+
+@pytest.fixture
+def client(tmp_path):
+    with TestClient(create_app(str(tmp_path / "checkpoints.sqlite"), workers=1, max_queue=0)) as client:
+        yield client
+
+
+def test_full_pool_answers_429_with_retry_after(client):
+    pool = client.app.state.pool
+    assert pool.admit()  # the one place there is, as taken by a running turn
+    for path in ("/sessions/s1/messages", "/sessions/s1/stream"):
+        resp = client.post(path, json={"message": "hi"})
+        assert resp.status_code == 429
+        assert resp.headers["Retry-After"] == str(RETRY_AFTER_SECONDS)
+    assert pool.rejected == 2
+
+
+def test_bad_body_is_refused_before_admission(client):
+    resp = client.post("/sessions/s1/messages", json={"text": "hi"})
+    assert resp.status_code == 400
+    assert client.app.state.pool.rejected == 0
+
+
+def test_turns_of_one_session_run_one_at_a_time():
+    locks = SessionLocks()
+    events = []
+
+    async def turn(session, name):
+        async with locks.hold(session):
+            events.append(f"start {name}")
+            await asyncio.sleep(0.02)
+            events.append(f"end {name}")
+
+    async def run():
+        await asyncio.gather(turn("a", "a1"), turn("a", "a2"), turn("b", "b1"))
+
+    asyncio.run(run())
+    a = [e for e in events if e.endswith(("a1", "a2"))]
+    assert a == ["start a1", "end a1", "start a2", "end a2"]
+    # Another session's turn overlaps them
+    assert events.index("start b1") < events.index("end a1")
+    assert len(locks) == 0
+
+
+def test_queued_follow_up_does_not_hold_a_worker():
+    async def run():
+        pool, locks = WorkerPool(workers=2, max_queue=1), SessionLocks()
+        release = asyncio.Event()
+        seen = {}
+
+        async def turn(session, name):
+            assert pool.admit()
+            async with pool.slot(locks.hold(session)):
+                seen[name] = pool.active
+                await release.wait()
+
+        first = asyncio.create_task(turn("a", "a1"))
+        await asyncio.sleep(0)
+        follow_up = asyncio.create_task(turn("a", "a2"))
+        other = asyncio.create_task(turn("b", "b1"))
+        await asyncio.sleep(0.01)
+        assert seen == {"a1": 1, "b1": 2} and pool.waiting == 1
+        assert not pool.admit()  # 2 running + 1 queued
+        release.set()
+        await asyncio.gather(first, follow_up, other)
+        return pool
+
+    pool = asyncio.run(run())
+    assert (pool.active, pool.waiting, pool.rejected) == (0, 0, 1)
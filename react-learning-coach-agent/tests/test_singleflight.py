@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one():
+    flight = SingleFlight(enabled=True)
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "reply"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", "exercises", fn))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while flight.stats()["coalesced"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results, key=lambda r: not r[1]) == [("reply", True)] + [("reply", False)] * 4
+    assert flight.stats()["nodes"]["exercises"] == {"flights": 1, "coalesced": 4}
+    assert flight.in_flight() == 0
+
+
+def test_followers_see_the_leaders_error():
+    flight = SingleFlight(enabled=True)
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("model down")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("k", "coaching", fail)
+        except RuntimeError as exc:
+            errors.append(str(exc))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.stats()["coalesced"] < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert errors == ["model down", "model down"]
+
+
+def test_async_calls_coalesce():
+    flight = SingleFlight(enabled=True)
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "reply"
+
+    async def run():
+        return await asyncio.gather(*(flight.ado("k", "coaching", fn) for _ in range(4)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [r for r, _ in results] == ["reply"] * 4
+    assert sum(led for _, led in results) == 1
+
+
+def test_calls_after_a_flight_lands_start_a_new_one():
+    flight = SingleFlight(enabled=True)
+    assert flight.do("k", "coaching", lambda: 1) == (1, True)
+    assert flight.do("k", "coaching", lambda: 2) == (2, True)
+
+
+@pytest.mark.parametrize("enabled, key", [(False, "k"), (True, None)])
+def test_disabled_or_unkeyed_calls_run_directly(enabled, key):
+    flight = SingleFlight(enabled=enabled)
+    assert flight.do(key, "coaching", lambda: "x") == ("x", True)
+    assert flight.stats()["flights"] == 0
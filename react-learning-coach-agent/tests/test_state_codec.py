@@ -0,0 +1,42 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import fake_llm
+from state_codec import CompactSerializer, decode_state, encode_state
+
+
+def _state():
+    return {
+        "messages": [
+            HumanMessage(content="a todo app", id="h1"),
+            AIMessage(content="## Plan", id="a1", response_metadata={"cache_hit": True}),
+            ToolMessage(content="docs", tool_call_id="t1", id="t1"),
+        ],
+        "summary": "- Learner: hi",
+        "learner_profile": {"assumed_level": "beginner"},
+        "project_spec": {"summary": "A todo app", "features": ["add todos", "filter todos"]},
+        "stages": fake_llm.PLAN_JSON["stages"],
+        "plan_basis": {"level": "beginner", "features": ["add todos"]},
+        "current_stage_index": 1,
+        "status": "coaching",
+    }
+
+
+def test_encode_decode_round_trip():
+    state = _state()
+    assert decode_state(encode_state(state)) == state
+
+
+def test_round_trip_keeps_message_types_and_fields():
+    messages = decode_state(encode_state(_state()))["messages"]
+    assert [type(m).__name__ for m in messages] == ["HumanMessage", "AIMessage", "ToolMessage"]
+    assert messages[1].response_metadata == {"cache_hit": True}
+    assert messages[2].tool_call_id == "t1"
+
+
+def test_compact_checkpoint_round_trip_and_legacy_reads():
+    checkpoint = {"v": 1, "id": "1", "ts": "now", "channel_values": _state(), "channel_versions": {}, "versions_seen": {}}
+    compact, legacy = CompactSerializer(), CompactSerializer(compact=False)
+    written = compact.dumps_typed(checkpoint)
+    assert written[0] == "coach-state"
+    assert compact.loads_typed(written) == checkpoint
+    assert compact.loads_typed(legacy.dumps_typed(checkpoint)) == checkpoint
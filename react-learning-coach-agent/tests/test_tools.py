@@ -0,0 +1,74 @@
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+
+import tools
+
+STAGE = "Stage: Effects"
+ERROR_CODE = 'useEffect(async () => {\n  await load();\n}, []);'
+WARNING_CODE = "useEffect(() => {\n  load();\n});"
+CLEAN_CODE = "const total = items.length;"
+LLM_REVIEW = {"issues": "Loads on every render.", "suggested_fundamentals": "data fetching", "high_level_hint": "When?"}
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Stands in for the reviewer model; records the prompts it was sent."""
+    calls = []
+    reply = [json.dumps(LLM_REVIEW)]
+
+    def call_llm(node, messages, **kwargs):
+        calls.append(messages)
+        return AIMessage(content=reply[0])
+
+    monkeypatch.setattr(tools, "call_llm", call_llm)
+    monkeypatch.setattr(tools, "_review_memo", type(tools._review_memo)())
+    return calls, reply
+
+
+def test_definite_bug_is_reviewed_without_the_model(model):
+    calls, _ = model
+    review = tools.analyze_code_snippet(ERROR_CODE, STAGE)
+    assert calls == []
+    assert review["source"] == "local"
+    assert "async" in review["issues"]
+
+
+def test_missing_deps_warning_still_goes_to_the_model(model):
+    calls, _ = model
+    review = tools.analyze_code_snippet(WARNING_CODE, STAGE)
+    assert len(calls) == 1
+    assert "Already flagged" in calls[0][1].content
+    assert review["source"] == "local+llm"
+    assert review["issues"].endswith(LLM_REVIEW["issues"])
+    assert review["suggested_fundamentals"] == "useEffect dependencies, data fetching"
+
+
+def test_reviews_are_memoized_per_normalized_code_and_stage(model):
+    calls, _ = model
+    first = tools.analyze_code_snippet(CLEAN_CODE, STAGE)
+    again = tools.analyze_code_snippet("// same\nconst   total = items.length;", STAGE)
+    assert again == first and len(calls) == 1
+    again["issues"] = "edited by the caller"
+    assert tools.analyze_code_snippet(CLEAN_CODE, STAGE) == first
+    tools.analyze_code_snippet(CLEAN_CODE, "Stage: Lists")
+    assert len(calls) == 2
+
+
+def test_unusable_reply_falls_back_to_the_findings_and_is_not_memoized(model):
+    calls, reply = model
+    reply[0] = "sorry, no JSON today"
+    review = tools.analyze_code_snippet(WARNING_CODE, STAGE)
+    assert review["source"] == "local" and "dependency array" in review["issues"]
+    reply[0] = json.dumps(LLM_REVIEW)
+    assert tools.analyze_code_snippet(WARNING_CODE, STAGE)["source"] == "local+llm"
+    assert len(calls) == 2
+
+
+def test_memo_evicts_the_least_recently_used(model, monkeypatch):
+    monkeypatch.setattr(tools, "REVIEW_MEMO_ENTRIES", 2)
+    calls, _ = model
+    for code in ("const a = 1;", "const b = 2;", "const a = 1;", "const c = 3;", "const a = 1;"):
+        tools.analyze_code_snippet(code, STAGE)
+    assert len(calls) == 3
@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pytest
+
+import vector_index
+from vector_index import CURRENT_FILE, VectorIndex, build_index, read_meta, update_index
+
+TEXTS = [
+    "useState hook keeps local component state",
+    "useEffect runs side effects after render",
+    "props pass data from parent to child",
+    "context shares values without prop drilling",
+    "keys help React match list items between renders",
+]
+
+
+def test_int8_scores_close_to_float32(tmp_path):
+    build_index(TEXTS, str(tmp_path / "f"), dtype="float32")
+    build_index(TEXTS, str(tmp_path / "q"), dtype="int8")
+    exact, quantized = VectorIndex.load(str(tmp_path / "f")), VectorIndex.load(str(tmp_path / "q"))
+    assert quantized.matrix.dtype == np.int8
+    for query in ("effects after render", "state hook", "list keys"):
+        a, b = exact.search(query, 2), quantized.search(query, 2)
+        assert [i for _, i in a] == [i for _, i in b]
+        assert [s for s, _ in a] == pytest.approx([s for s, _ in b], abs=0.02)
+
+
+def test_int8_scoring_in_row_chunks_matches_one_pass(tmp_path, monkeypatch):
+    build_index(TEXTS, str(tmp_path), dtype="int8")
+    index = VectorIndex.load(str(tmp_path))
+    whole = index.search("state and props", 5)
+    monkeypatch.setattr(vector_index, "SCORE_ROWS", 2)
+    assert index.search("state and props", 5) == whole
+
+
+def test_rebuild_swaps_version_and_removes_the_old_one(tmp_path):
+    path = str(tmp_path)
+    build_index(TEXTS, path, fingerprint="a")
+    first = open(os.path.join(path, CURRENT_FILE)).read()
+    build_index(TEXTS[:3], path, fingerprint="b")
+    second = open(os.path.join(path, CURRENT_FILE)).read()
+    assert first != second and not os.path.exists(os.path.join(path, first))
+    assert read_meta(path)["fingerprint"] == "b" and len(VectorIndex.load(path)) == 3
+
+
+def test_missing_index(tmp_path):
+    assert read_meta(str(tmp_path)) is None
+    with pytest.raises(FileNotFoundError):
+        VectorIndex.load(str(tmp_path))
+
+
+def test_update_keeps_unchanged_rows(tmp_path):
+    path = str(tmp_path)
+    build_index(TEXTS, path, ids=list(range(5)))
+    before = VectorIndex.load(path)
+    kept = np.array(before.matrix[[0, 2, 3, 4]])
+    update_index(path, ["suspense shows a fallback while loading"], [9], removed=[1])
+    after = VectorIndex.load(path)
+    assert list(after.ids) == [0, 2, 3, 4, 9]
+    assert np.array_equal(np.asarray(after.matrix[:4]), kept)
+    assert after.meta["updated_rows"] == 2
+    assert after.search("suspense fallback", 1)[0][1] == 9
@@ -1,60 +1,182 @@
-from typing import List, Dict
-import json
+from collections import OrderedDict
+from typing import Any, List, Dict, Optional
+import os
+import threading
+import time
 
-from dotenv import load_dotenv
+from corpus import passage_text
+from json_stream import repair_json
+from react_lint import (
+    Finding, fallback_review, format_findings, lint_react, local_review, review_key, strip_comments,
+)
+from retrieval import fuse_rankings
+from llm_calls import acall_llm, call_llm
+from runtime import get_corpus, get_metrics, get_vector_index, load_env
+from langchain_core.messages import SystemMessage, HumanMessage
 
-load_dotenv()
+load_env()
 
-from docs_store import DOCS
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
+DOCS_DIR = os.getenv("DOCS_DIR")  # markdown/JSONL docs to ingest; unset = built-in docs_store.DOCS
+_HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS_STORE_DIR = os.getenv("CORPUS_STORE_DIR", os.path.join(_HERE, ".corpus_store"))
+# Dense index lives on disk and is memory-mapped, so worker processes share its pages.
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join(_HERE, ".vector_index"))
+# Share of rows patched in (not refitted) before the dense index is rebuilt from scratch
+VECTOR_REFIT_FRACTION = float(os.getenv("VECTOR_REFIT_FRACTION", "0.2"))
+SEARCH_MODE = os.getenv("DOCS_SEARCH_MODE", "lexical")  # "lexical" | "vector" | "hybrid"
+REVIEW_MEMO_ENTRIES = int(os.getenv("REVIEW_MEMO_ENTRIES", "256"))  # reviews memoized by normalized code + stage
+_review_memo: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+_review_memo_lock = threading.Lock()
 
-code_llm = ChatOpenAI(model="gpt-4o-mini")
 
+def open_corpus():
+    """
+    The passages fetch_docs searches: a sharded CorpusStore synced from
+    DOCS_DIR (only changed files are re-ingested), or the built-in DOCS.
+    Opened once per process by runtime.get_corpus().
+    """
+    from corpus import CorpusStore, ListCorpus
 
-def fetch_docs(query: str, k: int = 3) -> List[Dict[str, str]]:
+    if DOCS_DIR:
+        store = CorpusStore(CORPUS_STORE_DIR)
+        store.sync(DOCS_DIR)
+        return store
+    from docs_store import DOCS
+    return ListCorpus(DOCS)
+
+
+def open_vector_index(corpus, fingerprint: str):
     """
-    Very simple semantic-ish search over the in-memory DOCS list.
-    Scores by keyword overlap.
+    Open the memory-mapped dense index, building it first if missing or
+    stale (see runtime.get_vector_index). A CorpusStore that knows what
+    changed since the index was built has just those passages embedded,
+    until VECTOR_REFIT_FRACTION of the rows were changed that way (the idf
+    is fitted on full builds only).
     """
-    q = query.lower()
-    scored = []
-    for doc in DOCS:
-        text = (doc["topic"] + " " + doc["content"]).lower()
-        score = 0
-        for word in q.split():
-            if word in text:
-                score += 1
-        if score > 0:
-            scored.append((score, doc))
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [d for _, d in scored[:k]]
+    from vector_index import VectorIndex, build_index, read_meta, update_index
 
+    meta = read_meta(VECTOR_INDEX_DIR)
+    if meta is not None and meta.get("fingerprint") == fingerprint:
+        return VectorIndex.load(VECTOR_INDEX_DIR)
+    delta = None
+    if meta is not None and meta.get("embedder", {}).get("type") == "hashing" and hasattr(corpus, "changes_since"):
+        delta = corpus.changes_since(meta.get("fingerprint", ""))
+    if delta is not None:
+        added, removed = delta
+        added = sorted(added - removed)
+        if meta.get("updated_rows", 0) + len(added) + len(removed) <= VECTOR_REFIT_FRACTION * max(len(corpus), 1):
+            update_index(VECTOR_INDEX_DIR, [passage_text(corpus[i]) for i in added], added, removed,
+                         fingerprint=fingerprint)
+            return VectorIndex.load(VECTOR_INDEX_DIR)
+    ids = list(corpus.live_ids())
+    build_index([passage_text(corpus[i]) for i in ids], VECTOR_INDEX_DIR, fingerprint=fingerprint, ids=ids)
+    return VectorIndex.load(VECTOR_INDEX_DIR)
 
-def analyze_code_snippet(code: str, stage_info: str) -> Dict[str, str]:
+
+def fetch_docs(query: str, k: int = 3, mode: str = None) -> List[Dict[str, str]]:
     """
-    Uses the LLM to give structured feedback on a code snippet.
-    Returns JSON with issues, suggested fundamentals, and a high-level hint.
+    Search the docs corpus. Returns up to k docs, best match first.
+    mode: "lexical" (BM25), "vector" (local embeddings) or "hybrid"
+    (both, merged by reciprocal rank fusion). Defaults to DOCS_SEARCH_MODE.
     """
-    system = SystemMessage(
-        content=(
-            "You are a React/TypeScript code reviewer. "
-            "Do NOT rewrite the full solution. "
-            "Identify likely issues and concepts to revisit, and respond ONLY in valid JSON."
-        )
-    )
-    human = HumanMessage(
-        content=(
-            f"User code:\n```\n{code}\n```\n\n"
-            f"Stage context:\n{stage_info}\n\n"
-            "Return JSON:\n"
-            "{\n"
-            '  "issues": "string describing issues found",\n'
-            '  "suggested_fundamentals": "string with concepts to review",\n'
-            '  "high_level_hint": "string with coaching hint"\n'
-            "}\n"
-        )
+    mode = mode or SEARCH_MODE
+    start = time.perf_counter()
+    corpus = get_corpus()
+    if mode == "lexical":
+        hits = corpus.lexical_index().search(query, k)
+    elif mode == "vector":
+        hits = get_vector_index().search(query, k)
+    elif mode == "hybrid":
+        depth = max(k * 4, 10)
+        hits = fuse_rankings([corpus.lexical_index().search(query, depth), get_vector_index().search(query, depth)], k)
+    else:
+        raise ValueError(f"Unknown search mode: {mode}")
+    docs = [corpus[doc_id] for _, doc_id in hits]
+    get_metrics().observe_retrieval(mode, time.perf_counter() - start, len(docs))
+    return docs
+
+
+def _review_messages(code: str, stage_info: str, findings: List[Finding]) -> List[Any]:
+    """Slim review prompt: comment-free code, plus local findings so the model skips them."""
+    system = SystemMessage(content=(
+        "React/TS code reviewer. Don't rewrite the solution. "
+        'JSON only: {"issues": str, "suggested_fundamentals": str, "high_level_hint": str}'
+    ))
+    lines = [line.rstrip() for line in strip_comments(code).splitlines() if line.strip()]
+    known = f"\n\nAlready flagged (don't repeat):\n{format_findings(findings)}" if findings else ""
+    human = HumanMessage(content=f"```\n{chr(10).join(lines)}\n```\n{stage_info}{known}")
+    return [system, human]
+
+
+def _merge_review(findings: List[Finding], data: Dict[str, str]) -> Dict[str, str]:
+    if not findings:
+        return dict(data, source="llm")
+    fundamentals = [f["fundamental"] for f in findings] + str(data.get("suggested_fundamentals", "")).split(",")
+    return dict(
+        data,
+        issues="\n".join(filter(None, [format_findings(findings), data.get("issues", "")])),
+        suggested_fundamentals=", ".join(dict.fromkeys(filter(None, (f.strip() for f in fundamentals)))),
+        source="local+llm",
     )
-    resp = code_llm.invoke([system, human])
-    data = json.loads(resp.content)
-    return data
+
+
+def _llm_review(findings: List[Finding], content: str) -> Optional[Dict[str, str]]:
+    """The model's review merged with the findings; None when the reply holds no review object."""
+    try:
+        data = repair_json(content)
+    except ValueError:
+        return None
+    return _merge_review(findings, data) if isinstance(data, dict) else None
+
+
+def _memo_get(key: str) -> Optional[Dict[str, str]]:
+    with _review_memo_lock:
+        review = _review_memo.get(key)
+        if review is not None:
+            _review_memo.move_to_end(key)
+        return review
+
+
+def _memo_put(key: str, review: Dict[str, str]) -> None:
+    with _review_memo_lock:
+        _review_memo[key] = review
+        while len(_review_memo) > REVIEW_MEMO_ENTRIES:
+            _review_memo.popitem(last=False)
+
+
+def analyze_code_snippet(code: str, stage_info: str) -> Dict[str, str]:
+    """
+    Structured feedback on a code snippet: issues, suggested fundamentals
+    and a high-level hint. Local lint findings answer on their own when
+    they include a definite bug; otherwise they go to the LLM with a slim
+    prompt. Results are memoized per normalized code + stage.
+    """
+    key = review_key(code, stage_info)
+    review = _memo_get(key)
+    if review is None:
+        findings = lint_react(code)
+        review = local_review(findings)
+        if review is None:
+            resp = call_llm("code_review", _review_messages(code, stage_info, findings))
+            review = _llm_review(findings, resp.content)
+        if review is None:
+            # Unusable (or degraded) reply: answer from the warnings, but don't memoize that
+            return fallback_review(findings)
+        _memo_put(key, review)
+    return dict(review)
+
+
+async def aanalyze_code_snippet(code: str, stage_info: str) -> Dict[str, str]:
+    """Async analyze_code_snippet."""
+    key = review_key(code, stage_info)
+    review = _memo_get(key)
+    if review is None:
+        findings = lint_react(code)
+        review = local_review(findings)
+        if review is None:
+            resp = await acall_llm("code_review", _review_messages(code, stage_info, findings))
+            review = _llm_review(findings, resp.content)
+        if review is None:
+            return fallback_review(findings)
+        _memo_put(key, review)
+    return dict(review)
@@ -0,0 +1,313 @@
+"""
+Dense-vector retrieval over the docs corpus.
+
+The embedding matrix is written once to an .npy file and opened with
+numpy's memmap, so every worker process maps the same read-only pages from
+the OS page cache instead of loading its own copy. A query is one
+matrix-vector product plus an argpartition top-k; int8 matrices are
+scored SCORE_ROWS rows at a time, so only that many are ever upcast. `update_index` patches
+an index for added and removed passages without re-embedding the rest.
+
+Each build is written to its own version directory inside the index path,
+and the CURRENT file naming it is swapped with os.replace, so readers find
+either the previous index or the new one, never none or a partial one.
+"""
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from retrieval import tokenize
+
+MATRIX_FILE = "embeddings.npy"
+SCALES_FILE = "scales.npy"
+IDF_FILE = "idf.npy"
+IDS_FILE = "ids.npy"
+META_FILE = "meta.json"
+# Names the version directory (inside the index path) readers open
+CURRENT_FILE = "CURRENT"
+VERSION_PREFIX = "v-"
+# A version directory without meta this old was left by a crashed build
+ABANDONED_SECONDS = 3600
+# int8 rows converted to float32 at a time when scoring a query
+SCORE_ROWS = 16384
+
+
+class Embedder(Protocol):
+    """Anything that turns texts into an (n, dim) float32 array of unit vectors."""
+
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray: ...
+
+
+class HashingEmbedder:
+    """
+    Offline TF-IDF embedder using the hashing trick: tokens and bigrams are
+    hashed into `dim` signed buckets, weighted by sublinear tf (and idf once
+    fitted), then L2-normalized. crc32 keeps buckets stable across processes.
+    """
+
+    def __init__(self, dim: int = 512, idf: Optional[np.ndarray] = None):
+        self.dim = dim
+        self.idf = idf
+
+    def _features(self, text: str) -> Dict[int, float]:
+        tokens = tokenize(text)
+        feats: Dict[int, float] = {}
+        for term in tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]:
+            h = zlib.crc32(term.encode("utf-8"))
+            bucket = h % self.dim
+            sign = 1.0 if (h >> 31) & 1 else -1.0
+            feats[bucket] = feats.get(bucket, 0.0) + sign
+        return feats
+
+    def fit(self, texts: Sequence[str]) -> "HashingEmbedder":
+        """Learn per-bucket idf weights from the corpus."""
+        df = np.zeros(self.dim, dtype=np.float32)
+        for text in texts:
+            df[list(self._features(text))] += 1
+        self.idf = np.log((1 + len(texts)) / (1 + df)).astype(np.float32) + 1.0
+        return self
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for bucket, value in self._features(text).items():
+                if value:
+                    out[row, bucket] = math.copysign(1.0 + math.log(abs(value)), value)
+        if self.idf is not None:
+            out *= self.idf
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+    def save(self, path: str) -> Dict[str, Any]:
+        if self.idf is not None:
+            np.save(os.path.join(path, IDF_FILE), self.idf)
+        return {"type": "hashing", "dim": self.dim}
+
+    @classmethod
+    def load(cls, path: str, config: Dict[str, Any]) -> "HashingEmbedder":
+        idf_path = os.path.join(path, IDF_FILE)
+        idf = np.load(idf_path) if os.path.exists(idf_path) else None
+        return cls(dim=config["dim"], idf=idf)
+
+
+class LangChainEmbedder:
+    """Adapter for any LangChain `Embeddings` (e.g. OpenAIEmbeddings) as an Embedder."""
+
+    def __init__(self, embeddings: Any, dim: int):
+        self.embeddings = embeddings
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if len(texts) == 1:
+            vecs = [self.embeddings.embed_query(texts[0])]
+        else:
+            vecs = self.embeddings.embed_documents(list(texts))
+        out = np.asarray(vecs, dtype=np.float32)
+        return out / np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+
+
+def _quantize(vecs: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows as stored (int8 with per-row scales, or float32 with scale 1) and their scales."""
+    if dtype == "int8":
+        row_scale = np.maximum(np.abs(vecs).max(axis=1), 1e-12) / 127.0
+        return np.round(vecs / row_scale[:, None]).astype(np.int8), row_scale.astype(np.float32)
+    return vecs, np.ones(len(vecs), dtype=np.float32)
+
+
+def _write_index(path: str, embedder: Embedder, dtype: str, count: int,
+                 chunks: Iterable[Tuple[np.ndarray, np.ndarray]], ids: Optional[Sequence[int]],
+                 meta: Dict[str, Any]) -> None:
+    """Write `count` stored rows, given as (rows, scales) chunks, with ids and meta to a new version, then publish it."""
+    os.makedirs(path, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=path, prefix=VERSION_PREFIX)
+    try:
+        matrix = np.lib.format.open_memmap(
+            os.path.join(tmp, MATRIX_FILE), mode="w+", dtype=dtype, shape=(count, embedder.dim)
+        )
+        scales = np.ones(count, dtype=np.float32)
+        start = 0
+        for rows, row_scales in chunks:
+            matrix[start:start + len(rows)] = rows
+            scales[start:start + len(rows)] = row_scales
+            start += len(rows)
+        matrix.flush()
+        del matrix
+        if dtype == "int8":
+            np.save(os.path.join(tmp, SCALES_FILE), scales)
+        if ids is not None:
+            np.save(os.path.join(tmp, IDS_FILE), np.asarray(ids, dtype=np.int64))
+
+        embedder_config = embedder.save(tmp) if hasattr(embedder, "save") else {"type": "custom", "dim": embedder.dim}
+        with open(os.path.join(tmp, META_FILE), "w") as f:
+            json.dump({"count": count, "dim": embedder.dim, "dtype": dtype, "embedder": embedder_config, **meta}, f)
+        _publish(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def _resolve(path: str) -> Optional[str]:
+    """The directory of the current version (the one CURRENT names), None if nothing was published."""
+    try:
+        with open(os.path.join(path, CURRENT_FILE)) as f:
+            return os.path.join(path, f.read().strip())
+    except OSError:
+        return None
+
+
+def _publish(version: str, path: str) -> None:
+    """Point CURRENT at a complete version directory, then delete the one it replaced."""
+    previous = _resolve(path)
+    pointer = os.path.join(path, f".{CURRENT_FILE}-{os.path.basename(version)}")
+    with open(pointer, "w") as f:
+        f.write(os.path.basename(version))
+    os.replace(pointer, os.path.join(path, CURRENT_FILE))
+    # Readers that already opened the old files keep their memmaps; new ones resolve CURRENT.
+    if previous is not None and previous != version:
+        shutil.rmtree(previous, ignore_errors=True)
+    now = time.time()
+    for entry in os.scandir(path):
+        if (entry.is_dir() and entry.name.startswith(VERSION_PREFIX) and entry.path != version
+                and not os.path.exists(os.path.join(entry.path, META_FILE))
+                and now - entry.stat().st_mtime > ABANDONED_SECONDS):
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def build_index(
+    texts: Sequence[str],
+    path: str,
+    embedder: Optional[Embedder] = None,
+    dtype: str = "float32",
+    fingerprint: str = "",
+    batch_size: int = 1024,
+    ids: Optional[Sequence[int]] = None,
+) -> None:
+    """
+    Embed `texts` and write the matrix to `path` (float32, or int8 with
+    per-row scales). Written to a temp dir and swapped in, so readers never
+    see a half-built index. `ids` maps rows to corpus doc ids (default: row number).
+    """
+    if dtype not in ("float32", "int8"):
+        raise ValueError(f"Unsupported dtype: {dtype}")
+    if embedder is None:
+        embedder = HashingEmbedder().fit(texts)
+    chunks = (
+        _quantize(embedder.embed(texts[start:start + batch_size]), dtype)
+        for start in range(0, len(texts), batch_size)
+    )
+    _write_index(path, embedder, dtype, len(texts), chunks, ids, {"fingerprint": fingerprint, "updated_rows": 0})
+
+
+def update_index(
+    path: str,
+    texts: Sequence[str],
+    ids: Sequence[int],
+    removed: Iterable[int],
+    fingerprint: str = "",
+    batch_size: int = 1024,
+) -> None:
+    """
+    Patch a built index (one with doc ids, from the hashing embedder):
+    drop the rows of `removed` ids and embed only `texts` as new rows `ids`.
+    The embedder's idf stays as fitted; meta["updated_rows"] counts the
+    rows changed since, so callers can rebuild once it drifts too far.
+    """
+    old = VectorIndex.load(path)
+    if old.ids is None:
+        raise ValueError("Only an index built with ids can be updated")
+    dtype = old.meta["dtype"]
+    keep = np.flatnonzero(~np.isin(old.ids, np.fromiter(removed, dtype=np.int64)))
+
+    def chunks() -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        for start in range(0, len(keep), batch_size):
+            rows = keep[start:start + batch_size]
+            yield old.matrix[rows], (old.scales[rows] if old.scales is not None else np.ones(len(rows), np.float32))
+        for start in range(0, len(texts), batch_size):
+            yield _quantize(old.embedder.embed(texts[start:start + batch_size]), dtype)
+
+    new_ids = np.concatenate([np.asarray(old.ids)[keep], np.asarray(ids, dtype=np.int64)])
+    updated = old.meta.get("updated_rows", 0) + (len(old) - len(keep)) + len(texts)
+    _write_index(path, old.embedder, dtype, len(new_ids), chunks(), new_ids,
+                 {"fingerprint": fingerprint, "updated_rows": updated})
+
+
+def _read_meta(version: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(version, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_meta(path: str) -> Optional[Dict[str, Any]]:
+    """The current version's meta, None if there is no index at `path`."""
+    version = _resolve(path)
+    return _read_meta(version) if version is not None else None
+
+
+class VectorIndex:
+    """Read-only view over a built index; the matrix stays on disk as a memmap."""
+
+    def __init__(self, matrix: np.ndarray, embedder: Embedder, scales: Optional[np.ndarray] = None,
+                 ids: Optional[np.ndarray] = None, meta=None):
+        self.matrix = matrix
+        self.embedder = embedder
+        self.scales = scales
+        self.ids = ids
+        self.meta = meta or {}
+
+    @classmethod
+    def load(cls, path: str, embedder: Optional[Embedder] = None) -> "VectorIndex":
+        try:
+            return cls._load(path, embedder)
+        except FileNotFoundError:
+            # A newer build replaced the version between resolving and opening it
+            return cls._load(path, embedder)
+
+    @classmethod
+    def _load(cls, index_path: str, embedder: Optional[Embedder]) -> "VectorIndex":
+        path = _resolve(index_path)
+        meta = _read_meta(path) if path is not None else None
+        if meta is None:
+            raise FileNotFoundError(f"No vector index at {index_path}")
+        if embedder is None:
+            if meta["embedder"].get("type") != "hashing":
+                raise ValueError("Index was built with a custom embedder; pass it to VectorIndex.load")
+            embedder = HashingEmbedder.load(path, meta["embedder"])
+        matrix = np.load(os.path.join(path, MATRIX_FILE), mmap_mode="r")
+        scales = np.load(os.path.join(path, SCALES_FILE)) if meta["dtype"] == "int8" else None
+        ids_path = os.path.join(path, IDS_FILE)
+        ids = np.load(ids_path, mmap_mode="r") if os.path.exists(ids_path) else None
+        return cls(matrix, embedder, scales, ids, meta)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[float, int]]:
+        """Top-k (cosine score, doc_id) pairs, best first."""
+        n = len(self)
+        if n == 0 or k <= 0:
+            return []
+        q = self.embedder.embed([query])[0]
+        if self.scales is None:
+            scores = self.matrix @ q
+        else:
+            # int8 @ float32 would upcast the whole memmap at once
+            scores = np.empty(n, dtype=np.float32)
+            for start in range(0, n, SCORE_ROWS):
+                scores[start:start + SCORE_ROWS] = self.matrix[start:start + SCORE_ROWS].astype(np.float32) @ q
+            scores *= self.scales
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        ids = self.ids if self.ids is not None else np.arange(n)
+        return [(float(scores[i]), int(ids[i])) for i in top if scores[i] > 0]